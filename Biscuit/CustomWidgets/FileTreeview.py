@@ -1,17 +1,73 @@
+from bisect import bisect_right
+import errno
 import os.path as op
 import os
 
 from .EnhancedTreeview import EnhancedTreeview
+from Biscuit.utils.watcher import get_watcher, PollingWatcher
+
+# Tag given to the placeholder children of folders which haven't been loaded.
+PLACEHOLDER_TAG = 'PLACEHOLDER'
 
 
 class FileTreeview(EnhancedTreeview):
-    def __init__(self, master, directory, *args, **kwargs):
+    """A treeview showing the contents of a folder.
+
+    Parameters
+    ----------
+    master : instance of tkinter.Widget
+        Parent widget.
+    directory : str
+        The root folder shown in the treeview.
+    lazy : bool
+        If True only the direct contents of each folder are listed, and the
+        contents of a folder are only listed once it is opened (or one of its
+        children is requested by path or with `get_children`). Until then each
+        folder has a placeholder child so that it can be opened.
+    watch : bool
+        Whether to watch the loaded folders for changes so that `refresh` only
+        needs to list the folders which have changed. If False every folder
+        is listed on each refresh.
+    """
+    def __init__(self, master, directory, *args, lazy=False, watch=True,
+                 **kwargs):
         self.master = master
         super(FileTreeview, self).__init__(self.master, *args, **kwargs)
 
         self.root_path = op.normpath(directory)
+        self.lazy = lazy
 
+        # Index of the items in the treeview so that they can be found without
+        # asking the treeview. These are kept up to date as items are added,
+        # renamed and removed.
+        # path of each item -> sid
         self.index_cache = dict()
+        # sid -> (path, extension, text)
+        self._items = dict()
+        # text -> list of sid's
+        self._text_index = dict()
+        # sid -> sid of the parent
+        self._parents = dict()
+        # sid of each folder (and '' for the root) -> set of child sid's
+        self._children = {'': set()}
+        # sid's of the folders which haven't been loaded and the sid of
+        # their placeholder child
+        self._unloaded = dict()
+        self._placeholders = set()
+        # paths of the folders whose contents have been loaded
+        self._loaded_folders = set()
+        # sort keys of the children of each folder, in the same order as the
+        # children, used to find where new items should be inserted
+        self._sort_keys = dict()
+
+        self.watcher = None
+        if watch:
+            self.watcher = get_watcher(self.root_path)
+        # whether every folder needs to be listed on the next refresh as
+        # changes may have been missed
+        self._rescan = False
+
+        self.bind('<<TreeviewOpen>>', self._on_open, add='+')
 
 #region public methods
 
@@ -36,96 +92,174 @@ class FileTreeview(EnhancedTreeview):
         if dir_ == "":
             return
 
-        # create a mapping of full paths to id's
-        curr_children = self.get_children(parent)
-        file_list = dict(
-            zip([self.item(child)['values'][1] for child in
-                 curr_children], curr_children))
+        if parent == '' and op.normpath(dir_) != self.root_path:
+            # the root folder has been changed
+            self._loaded_folders.discard(self.root_path)
+            if self.watcher is not None:
+                self.watcher.remove(self.root_path)
+            self.index_cache.pop(self.root_path, None)
+            self.root_path = op.normpath(dir_)
 
-        # we want to put folders above files (it looks nicer!!)
-        for file in os.listdir(dir_):
-            try:
-                fullpath = op.normpath(op.join(dir_, file))
-
-                # need to check to see whether or not the file/folder already
-                # exists in the tree:
-                exists_id = file_list.get(fullpath, None)
-                if op.isdir(fullpath):
-                    if exists_id is None:
-                        exists_id = self.ordered_insert(parent,
-                                                        values=['', fullpath],
-                                                        text=file,
-                                                        open=False)
-                    self.generate(exists_id, directory=fullpath)
-                else:
-                    fname, ext = op.splitext(file)
-                    if exists_id is None:
-                        self.insert(parent, 'end',
-                                    values=[ext, fullpath],
-                                    text=fname, open=False,
-                                    tags=(ext))
-            except PermissionError:
-                # user doesn't have sufficient permissions to open folder so it
-                # won't be included
-                pass
+        if self.lazy:
+            self._load_folder(parent, dir_)
+            return
+
+        # Each folder is listed once with os.scandir, which also tells us
+        # which entries are folders without needing to stat them. The folders
+        # are processed iteratively so very deep trees are fine.
+        folders = [(parent, dir_)]
+        while folders:
+            parent, dir_ = folders.pop()
+            folders.extend(
+                self._load_folder(parent, dir_, placeholders=False))
+
+    def all_children(self, item=''):
+        """
+        This is a generator that will yield the ids of all the children
+        of the treeview recursively.
+        The contents of folders which haven't been loaded aren't included.
+        """
+        children = super(FileTreeview, self).get_children(item)
+        for sid in children:
+            if sid not in self._placeholders:
+                for child in self.all_children(sid):
+                    yield child
+        yield item
+
+    def delete(self, *items):
+        """Delete the items and all their descendants."""
+        for sid in items:
+            if not self.exists(sid):
+                # already deleted along with one of its ancestors
+                continue
+            keys = self._sort_keys.get(self.parent(sid))
+            if keys is not None and sid not in self._placeholders:
+                del keys[super(FileTreeview, self).index(sid)]
+            if sid in self._items:
+                self._unindex(sid)
+            super(FileTreeview, self).delete(sid)
+
+    def destroy(self):
+        if self.watcher is not None:
+            self.watcher.close()
+        super(FileTreeview, self).destroy()
+
+    def get_children(self, item=None):
+        """Return the children of an item, loading the contents of the folder
+        first if it hasn't been loaded yet."""
+        if item in self._unloaded:
+            self.load(item)
+        return super(FileTreeview, self).get_children(item)
 
     def get_filepath(self, sid):
         """ Return the file path corresponding to the provided sid """
-        return self.item(sid)['values'][1]
+        return self._items[sid][0]
 
     def get_text(self, sid):
         """ Return the text corresponding to the provided sid """
-        return self.item(sid)['text']
+        return self._items[sid][2]
 
     def index(self):
-        """ Create a cache of the file information in a flattened way to allow
-        fast comparison of existing and new data """
-        for sid in self.all_children():
-            if sid != '':
-                self.index_cache[self.item(sid)['values'][1]] = sid
-            else:
-                self.index_cache[self.root_path] = ''
+        """ Add the root folder to the cache of the file paths.
+        All the other items are added to the cache as they are inserted so
+        the treeview doesn't need to be searched """
+        self.index_cache[self.root_path] = ''
+
+    def insert_folder(self, parent, fpath):
+        """Insert a folder which isn't in the treeview yet, such as one which
+        has just been created.
+
+        The contents of the folder are listed (and the folder is watched for
+        changes) straight away, or once it is opened if the treeview is lazy.
+
+        Parameters
+        ----------
+        parent : str
+            The sid of the parent in the treeview ('' if the root).
+        fpath : str
+            The path of the folder.
 
-    def ordered_insert(self, parent, *args, **kwargs):
+        Returns
+        -------
+        sids : list of str
+            The sid of the folder followed by those of its contents.
+        """
+        fpath = op.normpath(fpath)
+        if parent in self._unloaded:
+            # the folder is listed along with the rest of the parent
+            self.load(parent)
+            return [self.index_cache[fpath]]
+        # folders are shown the same as when the tree is generated
+        sid = self.ordered_insert(parent, values=['', fpath],
+                                  text=op.basename(fpath), open=False,
+                                  folder=True)
+        if self.lazy:
+            self._add_placeholder(sid)
+            return [sid]
+        self.generate(sid, fpath)
+        return [sid] + list(self.all_children(sid))[:-1]
+
+    def load(self, sid):
+        """Load the contents of a folder which hasn't been loaded yet.
+
+        Parameters
+        ----------
+        sid : str
+            The sid of the folder.
+        """
+        placeholder = self._unloaded.pop(sid, None)
+        if placeholder is None:
+            return
+        self.delete(placeholder)
+        self._placeholders.discard(placeholder)
+        self._load_folder(sid, self.get_filepath(sid))
+
+    def move(self, item, parent, index):
+        """Move an item to a new position in the treeview."""
+        # the children may no longer be sorted so the keys will be found again
+        prev_parent = self.parent(item)
+        self._sort_keys.pop(prev_parent, None)
+        self._sort_keys.pop(parent, None)
+        if item in self._items and parent != prev_parent:
+            self._children[prev_parent].discard(item)
+            self._children.setdefault(parent, set()).add(item)
+            self._parents[item] = parent
+        super(FileTreeview, self).move(item, parent, index)
+
+    def ordered_insert(self, parent, *args, folder=None, **kwargs):
         """
         Allows for objects to be inserted in the correct location
-        alphabetically. They will be sorted by their text fields.
-        This should be extended so that it is sorted by text > then any values
-        in order.
+        alphabetically. They will be sorted by their text fields, with any
+        folders placed above the files.
+
+        The position is found by a binary search of the sort keys of the
+        children of `parent`, so no requests need to be made to the treeview.
+        The object is added to the index using the extension and file path
+        in its values.
+
+        Parameters
+        ----------
+        parent : str
+            The sid of the parent in the treeview ('' if the root).
+        folder : bool
+            Whether the object is a folder. If not provided this is determined
+            from the file path in the values.
 
         Returns the id of the object that has been inserted
         """
-        sort_text = kwargs.get('text', None).lower()
-        if sort_text is not None:
-            child_folders = [i for i in self.get_children(parent) if
-                             op.isdir(self.item(i)['values'][1])]
-            child_files = [i for i in self.get_children(parent) if
-                           not op.isdir(self.item(i)['values'][1])]
-            if op.isdir(kwargs['values'][1]):
-                # first iterate over the children that are folders
-                if len(child_folders) != 0:
-                    for i, child in enumerate(child_folders):
-                        if sort_text < self.item(child)['text'].lower():
-                            index = i
-                            break
-                    else:
-                        index = i + 1
-                else:
-                    index = 0
-            else:
-                folder_num = len(child_folders)
-                if len(child_files) != 0:
-                    for i, child in enumerate(child_files):
-                        if sort_text < self.item(child)['text'].lower():
-                            index = i + folder_num
-                            break
-                    else:
-                        index = i + folder_num + 1
-                else:
-                    index = folder_num
-
-            return self.insert(parent, index, *args, **kwargs)
-        raise ValueError("No 'text' argument provided.")
+        text = kwargs.get('text', None)
+        if text is None:
+            raise ValueError("No 'text' argument provided.")
+        if folder is None:
+            folder = op.isdir(kwargs['values'][1])
+        keys = self._get_sort_keys(parent)
+        key = self._sort_key(text, folder)
+        index = bisect_right(keys, key)
+        sid = self.insert(parent, index, *args, **kwargs)
+        keys.insert(index, key)
+        ext, fpath = kwargs['values'][:2]
+        self._index_item(sid, parent, fpath, ext, text, folder)
+        return sid
 
     def refresh(self):
         """
@@ -144,38 +278,85 @@ class FileTreeview(EnhancedTreeview):
         # (ie. BIDSTree, Project, Subject, Session), and if so then
         # instantiate the folder as the child object and add it.
         for fullpath in added_files:
+            if fullpath in self.index_cache:
+                # already added along with the folder containing it
+                continue
             base, file = op.split(fullpath)
             parent = self.sid_from_filepath(base)
+            if op.isdir(fullpath):
+                added_sids.extend(self.insert_folder(parent, fullpath))
+                continue
             fname, ext = op.splitext(file)
-
-            #if op.isdir(fullpath):
             sid = self.ordered_insert(parent,
                                       values=[ext, fullpath],
                                       text=fname,
-                                      open=False)
-            self.index_cache[fullpath] = sid
+                                      open=False,
+                                      folder=False)
             added_sids.append(sid)
         # remove any removed files from the filetree
         for fpath in removed_files:
-            sid = self.index_cache[fpath]
+            sid = self.index_cache.get(fpath)
+            if sid is None:
+                # already removed along with the folder containing it
+                continue
             self.delete(sid)
-            del self.index_cache[fpath]
             # TODO: remove from main.preloaded_data somehow??
-        if curr_selection not in self.index_cache.values():
+        if curr_selection and curr_selection not in self._items:
             self.selection_set([''])
         return added_sids
 
+    def rename(self, sid, fpath):
+        """Update an item (and the paths of its contents) after the file or
+        folder has been renamed.
+
+        Parameters
+        ----------
+        sid : str
+            The sid of the renamed item.
+        fpath : str
+            The new path of the file or folder.
+        """
+        fpath = op.normpath(fpath)
+        parent = self._parents[sid]
+        folder = sid in self._children
+        name = op.basename(fpath)
+        if folder:
+            text, ext = name, ''
+        else:
+            text, ext = op.splitext(name)
+        # move the item so that the folder stays sorted
+        keys = self._sort_keys.get(parent)
+        if keys is not None:
+            del keys[super(FileTreeview, self).index(sid)]
+            key = self._sort_key(text, folder)
+            index = bisect_right(keys, key)
+            keys.insert(index, key)
+            super(FileTreeview, self).move(sid, parent, index)
+        self.item(sid, text=text, values=[ext, fpath])
+        old_path = self._items[sid][0]
+        self._reindex(sid, fpath, ext, text)
+        # the contents of a folder now have different paths
+        children = list(self._children.get(sid, ()))
+        while children:
+            child = children.pop()
+            child_path, child_ext, child_text = self._items[child]
+            new_path = fpath + child_path[len(old_path):]
+            self.item(child, values=[child_ext, new_path])
+            self._reindex(child, new_path, child_ext, child_text)
+            children.extend(self._children.get(child, ()))
+
     def sid_from_filepath(self, fpath, search=True):
         """ Return the sid in the treeview with the given filepath
 
+        A KeyError is raised if the file path isn't in the treeview.
+
         Parameters
         ----------
         fpath : str
             Filepath to match
         search : bool
-            Whether to force a search for the file path.
-            This is required when we do a refresh as the file path may not have
-            been added to the index_cache.
+            No longer used. Every item is added to the index_cache when it is
+            inserted so the treeview never needs to be searched.
 
         """
         # Normalise the path just to ensure there are no issues.
@@ -183,24 +364,10 @@ class FileTreeview(EnhancedTreeview):
         try:
             return self.index_cache[fpath]
         except KeyError:
-            if not search:
-                raise
-            # In this case the file isn't in the cache, however it may still
-            # be in the tree. Recurse up the base paths until an object is
-            # found then follow it back down.
-            temp_fpath = op.dirname(fpath)
-            while True:
-                if temp_fpath in self.index_cache:
-                    sid = self.index_cache[temp_fpath]
-                    for child in self.all_children(item=sid):
-                        if self.item(child)['values'][1] == fpath:
-                            return child
-                _temp_fpath = op.dirname(temp_fpath)
-                # ensure we cannot get stuck in an infinte loop
-                if _temp_fpath != temp_fpath:
-                    temp_fpath = _temp_fpath
-                else:
-                    raise
+            if self.lazy:
+                # the folders containing the file may not have been loaded
+                return self._load_path(fpath)
+            raise
 
     def sid_from_text(self, text, _all=False):
         """ Return the sid(s) in the treeview with the given text
@@ -213,17 +380,213 @@ class FileTreeview(EnhancedTreeview):
             Whether or not to return all the results or just the first
 
         """
-        rtn_list = []
-        for sid in self.all_children():
-            if self.item(sid)['text'] == text:
-                if _all:
-                    rtn_list.append(sid)
-                else:
-                    return [sid]
-        return rtn_list
+        sids = self._text_index.get(text, [])
+        if _all:
+            return list(sids)
+        return sids[:1]
 
 #region private methods
 
+    def _add_placeholder(self, sid):
+        """Give an unloaded folder a child so that it can be opened."""
+        placeholder = self.insert(sid, 'end', text='', values=['', ''],
+                                  tags=(PLACEHOLDER_TAG,))
+        self._unloaded[sid] = placeholder
+        self._placeholders.add(placeholder)
+
+    def _get_sort_keys(self, parent):
+        """Return the sort keys of the children of `parent`, finding them from
+        the order of the children in the treeview if they aren't known."""
+        keys = self._sort_keys.get(parent)
+        if keys is None:
+            keys = [self._sort_key(self._items[child][2],
+                                   child in self._children) for child in
+                    super(FileTreeview, self).get_children(parent) if
+                    child not in self._placeholders]
+            self._sort_keys[parent] = keys
+        return keys
+
+    def _index_item(self, sid, parent, fpath, ext, text, folder):
+        """Add a new item to the index."""
+        self.index_cache[fpath] = sid
+        self._items[sid] = (fpath, ext, text)
+        self._text_index.setdefault(text, []).append(sid)
+        self._parents[sid] = parent
+        self._children.setdefault(parent, set()).add(sid)
+        if folder:
+            self._children.setdefault(sid, set())
+
+    def _load_folder(self, parent, directory, placeholders=True):
+        """Add the direct contents of a folder to the treeview.
+
+        The entries are sorted once (folders first) and inserted in order.
+        Only if the folder already has children in the treeview are they
+        inserted individually in the correct location.
+
+        Parameters
+        ----------
+        parent : str
+            The sid of the folder in the treeview.
+        directory : str
+            The path of the folder.
+        placeholders : bool
+            Whether to give each sub-folder a placeholder child so that it is
+            loaded when opened.
+
+        Returns
+        -------
+        folders : list of tuple
+            The (sid, path) of each sub-folder.
+        """
+        directory = op.normpath(directory)
+        self._loaded_folders.add(directory)
+        # start watching before listing the folder so no changes are missed
+        self._watch(directory)
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            # user doesn't have sufficient permissions to open folder so it
+            # won't be included
+            return []
+        existing = dict((self._items[child][0], child) for child in
+                        self._children.get(parent, ()))
+        if not existing:
+            keys = self._sort_keys[parent] = []
+        sub_folders = []
+        folders = []
+        files = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            fullpath = op.normpath(entry.path)
+            if fullpath in existing:
+                if is_dir:
+                    sub_folders.append((existing[fullpath], fullpath))
+                continue
+            if is_dir:
+                folders.append((self._sort_key(entry.name, True),
+                                entry.name, fullpath))
+            else:
+                files.append((self._sort_key(op.splitext(entry.name)[0],
+                                             False),
+                              entry.name, fullpath))
+        # we want to put folders above files (it looks nicer!!)
+        for key, name, fullpath in sorted(folders):
+            if existing:
+                sid = self.ordered_insert(parent, values=['', fullpath],
+                                          text=name, open=False, folder=True)
+            else:
+                sid = self.insert(parent, 'end', values=['', fullpath],
+                                  text=name, open=False)
+                keys.append(key)
+                self._index_item(sid, parent, fullpath, '', name, True)
+            if placeholders:
+                self._add_placeholder(sid)
+            sub_folders.append((sid, fullpath))
+        for key, name, fullpath in sorted(files):
+            fname, ext = op.splitext(name)
+            if existing:
+                sid = self.ordered_insert(parent, values=[ext, fullpath],
+                                          text=fname, open=False,
+                                          tags=(ext), folder=False)
+            else:
+                sid = self.insert(parent, 'end', values=[ext, fullpath],
+                                  text=fname, open=False, tags=(ext))
+                keys.append(key)
+                self._index_item(sid, parent, fullpath, ext, fname, False)
+        return sub_folders
+
+    def _load_path(self, fpath):
+        """Load the folders containing a path and return its sid.
+
+        A KeyError is raised if the path isn't in the treeview.
+        """
+        missing = []
+        temp_fpath = fpath
+        while temp_fpath not in self.index_cache:
+            _temp_fpath = op.dirname(temp_fpath)
+            # ensure we cannot get stuck in an infinte loop
+            if _temp_fpath == temp_fpath:
+                raise KeyError(fpath)
+            missing.append(temp_fpath)
+            temp_fpath = _temp_fpath
+        for path in reversed(missing):
+            self.load(self.index_cache[op.dirname(path)])
+            if path not in self.index_cache:
+                raise KeyError(fpath)
+        return self.index_cache[fpath]
+
+    def _unindex(self, sid):
+        """Remove an item and all its descendants from the index."""
+        for child in self._children.pop(sid, ()):
+            self._unindex(child)
+        fpath, _, text = self._items.pop(sid)
+        siblings = self._children.get(self._parents.pop(sid))
+        if siblings is not None:
+            siblings.discard(sid)
+        if self.index_cache.get(fpath) == sid:
+            del self.index_cache[fpath]
+        self._remove_text(sid, text)
+        self._sort_keys.pop(sid, None)
+        self._placeholders.discard(self._unloaded.pop(sid, None))
+        if fpath in self._loaded_folders:
+            self._loaded_folders.discard(fpath)
+            if self.watcher is not None:
+                self.watcher.remove(fpath)
+
+    def _watch(self, folder):
+        """Start watching a folder for changes."""
+        if self.watcher is None:
+            return
+        try:
+            self.watcher.add(folder)
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                # the folder can't be listed either so won't be shown
+                return
+            # Most likely the limit on the number of inotify watches has been
+            # reached. Check the modification times of the folders instead.
+            self.watcher.close()
+            self.watcher = PollingWatcher()
+            for loaded_folder in self._loaded_folders:
+                self.watcher.add(loaded_folder)
+            self._rescan = True
+
+    def _on_open(self, event):
+        """Load the contents of a folder when it is opened."""
+        self.load(self.focus())
+
+    def _reindex(self, sid, fpath, ext, text):
+        """Update the path and text of an item in the index."""
+        old_path, _, old_text = self._items[sid]
+        if self.index_cache.get(old_path) == sid:
+            del self.index_cache[old_path]
+        self.index_cache[fpath] = sid
+        if text != old_text:
+            self._remove_text(sid, old_text)
+            self._text_index.setdefault(text, []).append(sid)
+        self._items[sid] = (fpath, ext, text)
+        if old_path in self._loaded_folders:
+            self._loaded_folders.discard(old_path)
+            self._loaded_folders.add(fpath)
+            if self.watcher is not None:
+                self.watcher.remove(old_path)
+            self._watch(fpath)
+
+    def _remove_text(self, sid, text):
+        sids = self._text_index[text]
+        sids.remove(sid)
+        if not sids:
+            del self._text_index[text]
+
+    @staticmethod
+    def _sort_key(text, folder):
+        """The key the children of a folder are sorted by."""
+        return (not folder, text.lower())
+
     def _find_added_files(self):
         """ Return a list of all files paths in the folder that don't currently
         exist in the current file treeview
@@ -249,6 +612,13 @@ class FileTreeview(EnhancedTreeview):
         Returns:
         (List of added files/folders, List of removed files/folders)
         """
+        if self.watcher is not None and not self._rescan:
+            changed = self.watcher.changes()
+            if changed is not None:
+                return self._find_changed_diff(changed)
+        self._rescan = False
+        if self.lazy:
+            return self._find_loaded_diff()
         contained_files = set()
         for root, dirs, files in os.walk(self.root_path):
             # add all the new files
@@ -263,3 +633,53 @@ class FileTreeview(EnhancedTreeview):
         removed_files = (prev_files - contained_files) - set([self.root_path])
         added_files = contained_files - prev_files
         return (list(added_files), list(removed_files))
+
+    def _find_changed_diff(self, folders):
+        """ The same as _find_folder_diff but only considering the contents
+        of the given folders (and any new folders within them) """
+        added_files = set()
+        removed_files = set()
+        for folder in folders:
+            if folder == self.root_path:
+                sid = ''
+            else:
+                sid = self.index_cache.get(folder)
+            if folder not in self._loaded_folders or sid is None:
+                # the folder is no longer in the treeview
+                self.watcher.remove(folder)
+                self._loaded_folders.discard(folder)
+                continue
+            # the folder may have been removed and created again, in which
+            # case it needs to be watched again
+            self._watch(folder)
+            try:
+                with os.scandir(folder) as it:
+                    contained_files = set(op.normpath(entry.path) for
+                                          entry in it)
+            except OSError:
+                # the folder has been removed, which will be found from the
+                # folder containing it
+                continue
+            prev_files = set(self._items[child][0] for child in
+                             self._children.get(sid, ()))
+            added_files.update(contained_files - prev_files)
+            # the contents of any removed folders are removed with them
+            removed_files.update(prev_files - contained_files)
+        return (list(added_files), list(removed_files))
+
+    def _find_loaded_diff(self):
+        """ The same as _find_folder_diff but only considering the contents
+        of the folders which have been loaded """
+        contained_files = set()
+        for folder in list(self._loaded_folders):
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        contained_files.add(op.normpath(entry.path))
+            except OSError:
+                # the folder has been removed
+                continue
+        prev_files = set(self.index_cache.keys())
+        removed_files = (prev_files - contained_files) - set([self.root_path])
+        added_files = contained_files - prev_files
+        return (list(added_files), list(removed_files))
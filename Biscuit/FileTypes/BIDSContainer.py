@@ -136,6 +136,9 @@ class BIDSContainer(FileInfo):
                 self.associated_tab.bids_gen_btn.config({"state": ACTIVE})
             else:
                 self.associated_tab.bids_gen_btn.config({"state": DISABLED})
+            # keep the conversion plan up to date with any changes
+            if hasattr(self.associated_tab, 'update_plan'):
+                self.associated_tab.update_plan()
 
     def prepare(self):
         """Prepare all the data in the object to be ready for bids export"""
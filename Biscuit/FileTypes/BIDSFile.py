@@ -49,6 +49,8 @@ class BIDSFile(FileInfo):
 
         self.raw = None
         self.container = None
+        # timing information about how the raw was produced
+        self.stage_records = []
 
         # Set all BIDS files to be saved by default
         self.requires_save = True
@@ -7,6 +7,7 @@ import os.path as path
 import re
 
 from Biscuit.Management import OptionsVar
+from Biscuit.utils.instrument import StageTimer
 from .BIDSFile import BIDSFile
 from .BIDSContainer import BIDSContainer
 
@@ -48,8 +49,10 @@ class FIFData(BIDSContainer, BIDSFile):
             self.mainfile_name = orig_name
             self.requires_save = False
         else:
+            timer = StageTimer()
             try:
-                self.raw = read_raw_fif(self.file, verbose='ERROR')
+                with timer.stage('read_raw_fif', reads=[self.file]):
+                    self.raw = read_raw_fif(self.file, verbose='ERROR')
             except ValueError as e:
                 if 'Internal Active Shielding' in str(e):
                     if not self.loaded_from_save:
@@ -58,8 +61,9 @@ class FIFData(BIDSContainer, BIDSFile):
                             "The selected file contains active shielding "
                             "data.\nIt can be converted but you should "
                             "process the data.")
-                    self.raw = read_raw_fif(self.file, verbose='ERROR',
-                                            allow_maxshield=True)
+                    with timer.stage('read_raw_fif', reads=[self.file]):
+                        self.raw = read_raw_fif(self.file, verbose='ERROR',
+                                                allow_maxshield=True)
                     self.info['Has Active Shielding'] = "True"
             finally:
                 if self.raw is None:
@@ -68,6 +72,8 @@ class FIFData(BIDSContainer, BIDSFile):
                     self.loaded = True
                     # in this case the reading of the raw file
                     raise IOError
+            # only keep the time of the successful read
+            self.stage_records = timer.records[-1:]
             self.info['Channels'] = self.raw.info['nchan']
             rec_date = self.raw.info['meas_date']
             if isinstance(rec_date, ndarray):
@@ -151,6 +157,11 @@ class FIFData(BIDSContainer, BIDSFile):
     # TODO: update this for using current mne_bids
     def prepare(self):
         BIDSContainer.prepare(self)
+        if self.raw is None:
+            # the raw is released after conversion to free up memory
+            self.raw = read_raw_fif(
+                self.file, verbose='ERROR',
+                allow_maxshield=self.info['Has Active Shielding'] == "True")
         ch_name_map = dict()
         ch_type_map = dict()
         # find any changed names or specified types and set them
@@ -6,6 +6,8 @@ from mne.io.constants import FIFF
 
 from Biscuit.Management import OptionsVar
 from Biscuit.utils.utils import get_object_class
+from Biscuit.utils.instrument import StageTimer
+from Biscuit.utils.rawcache import raw_cache, kit_key
 from .BIDSContainer import BIDSContainer
 from .generic_file import generic_file
 from .BIDSFile import BIDSFile
@@ -203,15 +205,28 @@ class KITData(BIDSContainer):
                 #         'file at a time at the moment... Using first one.')
                 if len(hpi) == 0:
                     raise ValueError('Con file has no associated mrk file.')
-                raw = read_raw_kit(
-                    con_file.file,
-                    # Construct a list of the file paths.
-                    # here.
-                    mrk=hpi[0],
-                    elp=self.contained_files['.elp'][0].file,
-                    hsp=self.contained_files['.hsp'][0].file,
-                    stim=trigger_channels, stim_code=stim_code,
-                    slope=slope)
+                elp = self.contained_files['.elp'][0].file
+                hsp = self.contained_files['.hsp'][0].file
+                timer = StageTimer()
+                key = kit_key(con_file.file, hpi[0], elp, hsp,
+                              trigger_channels, stim_code, slope)
+                # Only read the data if it hasn't been read already.
+                with timer.stage('raw_cache'):
+                    raw = raw_cache.get(key)
+                if raw is None:
+                    with timer.stage('read_raw_kit',
+                                     reads=[con_file.file, hpi[0], elp, hsp]):
+                        raw = read_raw_kit(
+                            con_file.file,
+                            # Construct a list of the file paths.
+                            # here.
+                            mrk=hpi[0],
+                            elp=elp,
+                            hsp=hsp,
+                            stim=trigger_channels, stim_code=stim_code,
+                            slope=slope)
+                    raw_cache.put(key, raw)
+                con_file.stage_records = timer.records
                 bads = con_file.bad_channels()
                 # Set the bads.
                 raw.info['bads'] = bads
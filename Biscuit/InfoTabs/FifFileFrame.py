@@ -1,11 +1,12 @@
-from tkinter import (StringVar, BooleanVar, DISABLED, NORMAL, Entry,
-                     messagebox, IntVar)
+from tkinter import (StringVar, BooleanVar, DISABLED, NORMAL, Entry, IntVar,
+                     LEFT)
 from tkinter.ttk import Frame, Label, Separator, Button, Combobox
 
 from Biscuit.CustomWidgets.InfoEntries import (InfoEntry, InfoLabel, InfoCheck,
                                                InfoChoice)
 from Biscuit.CustomWidgets import WidgetTable, DateEntry
-from Biscuit.Management import OptionsVar, convert, ToolTipManager
+from Biscuit.Management import OptionsVar, queue_conversion, ToolTipManager
+from Biscuit.Management.BIDSConvert import plan_container, format_plan
 
 # assign the tool tip manager
 ttm = ToolTipManager()
@@ -20,13 +21,13 @@ class FifFileFrame(Frame):
 
         self._file = None
         self.widgets_created = False
+        # summary of what converting the file would write
+        self.plan = StringVar()
 
         self.require_verification = []
 
         self._create_widgets()
 
-        self.current_job_thread = None
-
     def _create_widgets(self):
         # recording information
         Label(self, text="Recording Information:").grid(column=0, row=0,
@@ -158,7 +159,19 @@ class FifFileFrame(Frame):
                                    command=self.convert_to_bids,
                                    state=DISABLED)
         self.bids_gen_btn.grid(column=0, row=16)
-        ttm.register(self.bids_gen_btn, "Convert session data to BIDS format")
+        ttm.register(self.bids_gen_btn, "Add the session data to the queue to "
+                     "be converted to BIDS format")
+
+        Separator(self, orient='horizontal').grid(column=0, row=17,
+                                                  columnspan=5, sticky='ew')
+        plan_lbl = Label(self, text="Conversion plan:")
+        plan_lbl.grid(column=0, row=18, sticky='nw', pady=2)
+        ttm.register(plan_lbl,
+                     "The files that will be written when the file is "
+                     "converted to BIDS format,\nand the approximate amount "
+                     "of data written for each.")
+        Label(self, textvariable=self.plan, justify=LEFT).grid(
+            column=1, row=18, columnspan=4, sticky='w', pady=2)
 
         self.grid()
 
@@ -174,20 +187,20 @@ class FifFileFrame(Frame):
             self.bids_gen_btn.config(state=DISABLED)
 
     def convert_to_bids(self):
-        if self.current_job_thread is None:
-            self.current_job_thread = convert(self.file, self.settings,
-                                              self.parent)
-        else:
-            if self.current_job_thread.is_alive():      # pylint: disable=E1101
-                messagebox.showerror("Job Already Running",
-                                     "You already have one job running.\n"
-                                     "Please wait until it has finished before"
-                                     " starting a new one.")
-            else:
-                # in this case the job has ended so we nullify the current
-                # job thread then re-run this function
-                self.current_job_thread = None
-                self.convert_to_bids()
+        # the queue ensures only one conversion writes to a project at a time
+        queue_conversion(self.file, self.settings, self.parent)
+        self.parent.open_queue()
+
+    def update_plan(self):
+        """Update the summary of what the conversion will write."""
+        if self.file is None:
+            return
+        try:
+            self.plan.set(format_plan(plan_container(self.file,
+                                                     self.settings)))
+        except OSError:
+            # the file has been moved or deleted
+            self.plan.set('')
 
     def update_widgets(self):
         # update info
@@ -229,4 +242,7 @@ class FifFileFrame(Frame):
             self.update_widgets()
             for widget in self.require_verification:
                 widget.check_valid()
+            # this also updates the conversion plan
             self.file.validate()
+        else:
+            self.plan.set('')
@@ -1,9 +1,10 @@
-from tkinter import DISABLED, StringVar
+from tkinter import DISABLED, LEFT, StringVar
 from tkinter.ttk import Label, Separator, Button, Frame
 
 from Biscuit.CustomWidgets.InfoEntries import InfoEntry, InfoChoice
 from Biscuit.CustomWidgets import DateEntry
-from Biscuit.Management import OptionsVar, convert, ToolTipManager
+from Biscuit.Management import OptionsVar, queue_conversion, ToolTipManager
+from Biscuit.Management.BIDSConvert import plan_container, format_plan
 
 # assign the tool tip manager
 ttm = ToolTipManager()
@@ -17,6 +18,8 @@ class SessionInfoFrame(Frame):
         super(SessionInfoFrame, self).__init__(self.master, *args, **kwargs)
 
         self._file = None
+        # summary of what converting the session would write
+        self.plan = StringVar()
 
         # a list of widgets that will require verification
         self.require_verification = []
@@ -91,7 +94,19 @@ class SessionInfoFrame(Frame):
                                    state=DISABLED)
         self.bids_gen_btn.grid(column=3, row=7)
         ttm.register(self.bids_gen_btn,
-                     ("Convert session data to BIDS format"))
+                     ("Add the session data to the queue to be converted "
+                      "to BIDS format"))
+
+        Separator(self, orient='horizontal').grid(column=0, row=8,
+                                                  columnspan=5, sticky='ew')
+        plan_lbl = Label(self, text="Conversion plan:")
+        plan_lbl.grid(column=0, row=9, sticky='nw', pady=2)
+        ttm.register(plan_lbl,
+                     "The files that will be written when the session is "
+                     "converted to BIDS format,\nand the approximate amount "
+                     "of data written for each.")
+        Label(self, textvariable=self.plan, justify=LEFT).grid(
+            column=1, row=9, columnspan=4, sticky='w', pady=2)
         self.grid()
 
     def update_widgets(self):
@@ -103,8 +118,20 @@ class SessionInfoFrame(Frame):
         self.sub_group_entry.value = self.file.subject_group
         self.dewar_position_entry.value = self.file.dewar_position
 
+    def update_plan(self):
+        """Update the summary of what the conversion will write."""
+        if self.file is None:
+            return
+        try:
+            self.plan.set(format_plan(plan_container(self.file,
+                                                     self.settings)))
+        except OSError:
+            # a file has been moved or deleted
+            self.plan.set('')
+
     def convert_to_bids(self):
-        convert(self.file, self.settings, self.parent)
+        queue_conversion(self.file, self.settings, self.parent)
+        self.parent.open_queue()
 
     @property
     def file(self):
@@ -122,3 +149,4 @@ class SessionInfoFrame(Frame):
         if not self.file.validation_initialised:
             self.file.init_validation()
         self.file._set_bids_button_state()
+        self.update_plan()
@@ -1,39 +1,215 @@
-from contextlib import redirect_stdout
-from time import sleep
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import os
 import os.path as op
-from tkinter import StringVar
 from datetime import date
 import shutil
+import tempfile
 from warnings import warn
 
 from bidshandler import Session
 
 from mne_bids import write_raw_bids, make_bids_basename, make_bids_folders
 
-from Biscuit.Management import StreamedVar
-from Biscuit.utils.bids_postprocess import (update_sidecar, write_readme,
-                                            update_participants,
-                                            modify_dataset_description,
-                                            clean_emptyroom, update_markers)
-from Biscuit.Windows import ProgressPopup
-from Biscuit.utils.utils import threaded, assign_bids_data, assign_bids_folder
+from Biscuit.utils.bids_postprocess import (update_sidecar, clean_emptyroom,
+                                            update_markers, merge_tsv,
+                                            clone_raw_data, DatasetUpdater)
+from Biscuit.utils.utils import (assign_bids_data, assign_bids_folder,
+                                 get_fsize)
 from Biscuit.utils.timeutils import get_chunk_num, get_year
+from Biscuit.utils.instrument import (StageTimer, format_records, write_log,
+                                      path_size)
+from Biscuit.utils.fingerprint import ConversionManifest, job_fingerprint
+from Biscuit.utils.rawcache import estimate_raw_size
+from Biscuit.utils.copyutils import copy
+from Biscuit.Management.ConversionQueue import EntryStatus
 
+# Reasons a job is not written.
+SKIP_JUNK = 'junk'
+SKIP_NO_DATE = 'empty room with no recording date'
 
-@threaded
-def convert(container, settings, parent=None):
+# Top-level files which are produced for every job by mne-bids and which will
+# be re-written once all the jobs are complete.
+SHARED_FILES = ['dataset_description.json', 'README', 'README.txt', 'CHANGES']
+
+
+def queue_conversion(container, settings, parent):
+    """Add a container to the conversion queue of the main window.
+
+    The conversion is run in the background by the queue once any other
+    conversions into the same project folder have finished.
+    """
+    target_folder = op.join(get_bids_folder(settings),
+                            container.proj_name.get())
+    name = '{0} (sub-{1}, ses-{2})'.format(container.proj_name.get(),
+                                           container.subject_ID.get(),
+                                           container.session_ID.get())
+    return parent.conversion_queue.submit(container.file, target_folder,
+                                          name)
+
+
+def run_queued(entry, status, parent):
+    """Convert the container of an entry of the conversion queue.
+
+    Parameters
+    ----------
+    entry : dict
+        The queue entry.
+    status : instance of EntryStatus
+        Used to show the progress of the conversion. The time taken by each
+        stage is stored in the 'timings' of the entry once it is complete.
+    parent : instance of MainWindow
+        The main window containing the data.
     """
-    Main function to take all the data from some container (IC or fif file
-    currently) and call the bids conversion function (from mne_bids).
-    parent is the main GUI object
+    # Only look the path up in the index: sid_from_filepath can load folders
+    # into the tree, which must only be changed by the UI thread. Any
+    # container with saved information has been shown so is in the index.
+    sid = parent.file_treeview.index_cache.get(op.normpath(entry['path']))
+    if sid is None:
+        raise FileNotFoundError("{0} no longer exists".format(entry['path']))
+    container = parent.preloaded_data.get(sid, None)
+    if container is None:
+        raise ValueError("No information has been saved for {0}".format(
+            entry['path']))
+    if not container.loaded:
+        container.load_data()
+    if not container.check_valid():
+        raise ValueError("{0} is missing required information".format(
+            entry['path']))
+    bids_folder_path = get_bids_folder(parent.settings)
+    bidstree_folder_exists = op.exists(bids_folder_path)
+    timings = EntryStatus(status.queue, entry, key='timings')
+    convert_container(container, parent.settings, status=status,
+                      timings=timings)
+    # This is run in one of the threads of the queue, and several
+    # conversions can finish at once, so the file tree is only ever updated
+    # from the UI thread.
+    parent.after(0, _show_converted, parent, bids_folder_path,
+                 bidstree_folder_exists)
+
+
+def convert_container(container, settings, status=None, job_name=None,
+                      timings=None):
+    """Convert all the jobs in a container to BIDS format.
+
+    This contains no GUI code so that it can be used both by the conversion
+    queue and for headless batch conversion.
+
+    Parameters
+    ----------
+    container : instance of BIDSContainer
+        The container (KIT folder or .fif file) to convert.
+    settings : dict
+        The main Biscuit settings.
+    status : instance of tkinter.StringVar | None
+        Variable which is set to a message as each job is written.
+    job_name : instance of tkinter.StringVar | None
+        Variable which is set to the name of the job currently being written.
+    timings : instance of tkinter.StringVar | None
+        Variable which is set to a summary of the time taken by each stage of
+        the conversion once it is complete.
+
+    Returns
+    -------
+    target_folder : str
+        The path to the project folder the data was written to.
+
+    Notes
+    -----
+    Any jobs which haven't changed since they were last converted into the
+    same folder are not written again.
+    Any files copied by Biscuit itself (markers and extra files) are copied
+    using the method specified by the 'OUTPUT_STRATEGY' setting. If this is
+    'auto' or 'reflink' the .con/.sqd files written by mne-bids are replaced
+    by reflink clones of the original files where the file system supports
+    it.
+    If the 'CONVERT_MEMORY' setting is non-zero the Raw of each job is
+    released once it has been written and jobs are only written at the same
+    time while their estimated memory use fits within this many megabytes.
     """
-
     # first, make sure that the container obejct is ready for conversion
+    if status is not None:
+        status.set("Reading data")
     container.prepare()
 
-    # Construct a name for storing 2 weeks worth of BIDS formatted data.
-    # We chunk into 2 week blocks for ease of uploading to the MEG_RAW archive.
+    target_folder = op.join(get_bids_folder(settings),
+                            container.proj_name.get())
+
+    memory_budget = get_memory_budget(settings)
+    manifest = ConversionManifest(target_folder)
+    strategy = settings.get('OUTPUT_STRATEGY', 'auto')
+    jobs = get_jobs(container, release=memory_budget is not None,
+                    strategy=strategy)
+    changed_jobs = get_changed_jobs(jobs, manifest)
+    if status is not None and len(changed_jobs) != len(jobs):
+        status.set("Skipping {0} unchanged jobs".format(
+            len(jobs) - len(changed_jobs)))
+    results = write_jobs([(job_params, target_folder) for job_params in
+                          changed_jobs],
+                         workers=settings.get('CONVERT_WORKERS', 1),
+                         status=status, job_name=job_name,
+                         memory_budget=memory_budget)
+    timer = StageTimer()
+    errors = []
+    for job_params, result in zip(changed_jobs, results):
+        if result['error'] is not None:
+            errors.append(result['error'])
+            continue
+        timer.records.extend(result['stages'])
+        manifest.update(job_params['bids_name'], job_params['fingerprint'],
+                        result['files'])
+    # The output of every job which succeeded has been written, so record
+    # them all before raising the first error so that they aren't written
+    # again by the next conversion.
+    manifest.save()
+    if errors:
+        raise errors[0]
+    updater = DatasetUpdater(target_folder)
+    update_dataset_files(updater, jobs, container)
+    write_dataset_files(updater, timer)
+    copy_extra_files(container, target_folder, timer, strategy=strategy)
+
+    write_log(timer.records, container=container.file,
+              target=target_folder)
+    if timings is not None:
+        timings.set(format_records(timer.records))
+    return target_folder
+
+
+def copy_extra_files(container, target_folder, timer=None,
+                     strategy='buffered'):
+    """Copy any extra files associated with the container into the project
+    folder.
+
+    The method used to copy each file (see
+    `Biscuit.utils.copyutils.copydata`) is recorded in its stage record.
+    """
+    if timer is None:
+        timer = StageTimer()
+    subject_id = container.subject_ID.get()
+    sess_id = container.session_ID.get()
+    for file in container.extra_files:
+        ext = op.splitext(file)[1]
+        if ext in ['.m', '.py']:
+            dst = op.join(target_folder, 'code')
+        else:
+            dst = op.join(target_folder,
+                          'sub-{0}'.format(subject_id),
+                          'ses-{0}'.format(sess_id), 'extras')
+        if not op.exists(dst):
+            os.makedirs(dst)
+        with timer.stage('copy_extra_files', reads=[file],
+                         writes=[op.join(dst, op.basename(file))]) as record:
+            copy(file, dst, strategy=strategy,
+                 report=lambda fsrc, fdst, method: record.update(
+                     method=method))
+
+
+def get_bids_folder(settings):
+    """Return the path of the BIDS folder new data is currently written to.
+
+    Construct a name for storing 2 weeks worth of BIDS formatted data.
+    We chunk into 2 week blocks for ease of uploading to the MEG_RAW archive.
+    """
     chunk_length = settings.get('CHUNK_FREQ', 14)
     if chunk_length == 0:
         subfolder_name = ''
@@ -41,135 +217,521 @@ def convert(container, settings, parent=None):
         curr_date = date.today()
         subfolder_name = 'BIDS-{0}-{1}'.format(
             get_year(curr_date), get_chunk_num(curr_date, chunk_length))
+    return op.join(settings['DATA_PATH'], 'BIDS', subfolder_name)
 
-    # Find the SID of the BIDS folder.
-    bids_root_folder_path = op.join(settings['DATA_PATH'], 'BIDS')
-    bids_folder_path = op.join(bids_root_folder_path, subfolder_name)
-
-    # Determine if the BIDS-YYYY-FF folder exists already:
-    bidstree_folder_exists = op.exists(bids_folder_path)
-
-    # Create variables for the dynamic displaying of the process.
-    # We unfortunately cannot get particularly granular or precise progress
-    # tracking due to the fact that the conversion is done externally.
-    progress = StreamedVar(['Writing', 'Conversion done'],
-                           {'Writing': _shorten_path})
-    job_name = StringVar()
 
-    has_error = False
+def get_changed_jobs(jobs, manifest):
+    """Return the jobs which have changed since they were last written.
 
-    p = ProgressPopup(parent, progress, job_name)
-
-    target_folder = op.join(bids_folder_path,
+    Parameters
+    ----------
+    jobs : list of dict
+        The job parameters as returned by `get_jobs`.
+    manifest : instance of ConversionManifest
+        The manifest of the folder the jobs are to be written to.
+    """
+    return [job_params for job_params in jobs if not
+            manifest.is_current(job_params['bids_name'],
+                                job_params['fingerprint'])]
+
+
+def get_jobs(container, release=False, strategy='buffered'):
+    """Return the parameters for each job in the container to be written.
+
+    Parameters
+    ----------
+    container : instance of BIDSContainer
+        The container whose jobs are to be written.
+    release : bool
+        Whether to remove the Raw from each job once its parameters have been
+        extracted so that the Raw is only referenced by the parameters and
+        can be freed as soon as the job is written.
+    strategy : str
+        Method used to copy any extra files written for each job (see
+        `Biscuit.utils.copyutils.copydata`).
+    """
+    jobs = []
+    for job in container.jobs:
+        job_params = _get_job_params(job, container)
+        if job_params is not None:
+            job_params['strategy'] = strategy
+            jobs.append(job_params)
+        if release:
+            job.raw = None
+    return jobs
+
+
+def plan_container(container, settings):
+    """Determine what converting a container would write.
+
+    Nothing is read from or written to the output folder and the data files
+    aren't read, so this is fast enough to be run whenever the container
+    changes.
+
+    Parameters
+    ----------
+    container : instance of BIDSContainer
+        The container (KIT folder or .fif file) to be converted.
+    settings : dict
+        The main Biscuit settings.
+
+    Returns
+    -------
+    plan : dict
+        The project folder the data would be written to ('target_folder'),
+        a list of the jobs to be written ('jobs') as dicts containing the
+        source file ('file'), the BIDS basename ('bids_name') and the
+        expected number of bytes to be written ('bytes'), a list of
+        (source file, reason) for each job which won't be written
+        ('skipped') and the total expected number of bytes written
+        ('bytes').
+    """
+    target_folder = op.join(get_bids_folder(settings),
                             container.proj_name.get())
-
-    # redict the stout to the StreamedVar as a way of capturing progress
-    with redirect_stdout(progress):
-        for job in container.jobs:
-            if job.is_junk.get():
-                continue
-
-            extra_data = job.extra_data
-
-            emptyroom_path = ''
-            rec_date = None
-            if 'Measurement date' in job.info:
-                date_vals = job.info['Measurement date'].split('/')
-                date_vals.reverse()
-                rec_date = ''.join(date_vals)
-
-            # also check to see if the file is meant to have an associated
-            # empty room file
-            if job.has_empty_room.get() is True:
-                # we will auto-construct a file path based on the date of
-                # creation of the con file
-                # TODO: make this more robust?
-                emptyroom_path = ('sub-emptyroom/ses-{0}/meg/'
-                                  'sub-emptyroom_ses-{0}_task-'
-                                  'noise_meg.con'.format(rec_date))
-
-            # get the variables for the raw_to_bids conversion function:
-            if job.is_empty_room.get():
-                if rec_date is None:
-                    warn('Recording date is not known. Emptry room cannot be '
-                         'exported.')
+    # the digitisation data is copied with each KIT job
+    dig_files = []
+    for ext in ['.elp', '.hsp']:
+        dig_files.extend(fobj.file for fobj in
+                         getattr(container, 'contained_files',
+                                 dict()).get(ext, [])[:1])
+    jobs = []
+    skipped = []
+    for job in sorted(container.jobs, key=lambda job: job.file):
+        ids, reason = _get_job_ids(job, container)
+        if ids is None:
+            skipped.append((job.file, reason))
+            continue
+        sources = ([job.file] + [mrk.file for mrk in (job.hpi or [])] +
+                   dig_files)
+        jobs.append({'file': job.file,
+                     'bids_name': ids['bids_name'],
+                     'bytes': path_size(sources)})
+    total = (sum(job_plan['bytes'] for job_plan in jobs) +
+             path_size(container.extra_files))
+    return {'target_folder': target_folder,
+            'jobs': jobs,
+            'skipped': skipped,
+            'bytes': total}
+
+
+def format_plan(plan):
+    """Return a summary of a plan produced by `plan_container`."""
+    lines = ['Target: {0}'.format(plan['target_folder'])]
+    for job_plan in plan['jobs']:
+        lines.append('  {0} ({1})'.format(job_plan['bids_name'],
+                                          get_fsize(job_plan['bytes'])))
+    for fname, reason in plan['skipped']:
+        lines.append('  Skipped {0} ({1})'.format(op.basename(fname), reason))
+    lines.append('Total: {0}'.format(get_fsize(plan['bytes'])))
+    return '\n'.join(lines)
+
+
+def get_memory_budget(settings):
+    """Return the memory budget for a conversion in bytes.
+
+    None is returned if the memory used by the conversion is unbounded.
+    """
+    budget = settings.get('CONVERT_MEMORY', 0)
+    if not budget:
+        return None
+    return budget * 1024 ** 2
+
+
+def write_jobs(tasks, workers=1, status=None, job_name=None,
+               memory_budget=None):
+    """Write a number of jobs to their BIDS folders.
+
+    Parameters
+    ----------
+    tasks : list of tuple
+        List of (job parameters, target folder) pairs to be written.
+    workers : int
+        Number of processes to write the jobs with. If this is less than 2
+        each job is written in this thread one after the other.
+    status : instance of tkinter.StringVar | None
+        Variable which is set to a message as each job is written.
+    job_name : instance of tkinter.StringVar | None
+        Variable which is set to the name of the job currently being written.
+    memory_budget : int | None
+        Maximum estimated memory in bytes to be used by the jobs being written
+        at the same time. If this is not None the Raw of each job is released
+        once the job has been written.
+
+    Returns
+    -------
+    results : list of dict
+        For each job, the exception raised while writing it ('error', None if
+        it was written successfully), the timing information of each stage
+        of the job ('stages') and the files written, relative to the target
+        folder ('files').
+    """
+    if workers > 1 and len(tasks) > 1:
+        return _write_jobs_parallel(tasks, workers, status, job_name,
+                                    memory_budget)
+    results = []
+    for job_params, target_folder in tasks:
+        if job_name is not None:
+            job_name.set("Task: {0}, Run: {1}".format(job_params['task'],
+                                                      job_params['run']))
+        try:
+            _, stages, files = _write_job(job_params, target_folder)
+        except Exception as e:
+            results.append({'error': e, 'stages': [], 'files': []})
+        else:
+            results.append({'error': None, 'stages': stages,
+                            'files': files})
+        if memory_budget is not None:
+            job_params['raw'] = None
+    return results
+
+
+def _get_job_params(job, container):
+    """Extract all the information required to write a job.
+
+    The returned dictionary contains no tkinter objects so that it can be
+    passed to another process to be written.
+    If the job is not to be written None is returned.
+    """
+    ids, reason = _get_job_ids(job, container)
+    if ids is None:
+        if reason == SKIP_NO_DATE:
+            warn('Recording date is not known. Emptry room cannot be '
+                 'exported.')
+        return None
+
+    extra_data = dict(job.extra_data)
+    if ids['subject'] == 'emptyroom':
+        job.raw.info['subject_info'] = None
+    elif ids['emptyroom_path'] != '':
+        extra_data['AssociatedEmptyRoom'] = ids['emptyroom_path']
+
+    # TODO: change this to just use the event_info property
+    trigger_channels, descriptions = job.get_event_data()
+
+    # assume there is only one for now??
+    event_ids = dict(zip(descriptions,
+                         [int(i) for i in trigger_channels]))
+
+    return {'raw': job.raw,
+            'filenames': [fname for fname in job.raw.filenames if fname],
+            'memory': _estimate_job_memory(job.raw),
+            'bids_name': ids['bids_name'],
+            'fingerprint': job_fingerprint(job, container),
+            'subject': ids['subject'],
+            'session': ids['session'],
+            'group': ids['group'],
+            'task': ids['task'],
+            'run': ids['run'],
+            'event_ids': event_ids,
+            'extra_data': extra_data,
+            'hpi': [mrk.file for mrk in (job.hpi or [])],
+            'stages': list(job.stage_records)}
+
+
+def _get_job_ids(job, container):
+    """Determine the BIDS identifiers of a job.
+
+    This only uses the information entered for the job and container so is
+    cheap enough to be used for planning a conversion.
+
+    Returns
+    -------
+    ids : dict | None
+        The BIDS basename ('bids_name'), 'subject', 'session', 'group', 'task'
+        and 'run' of the job, and the path to its associated empty room data
+        ('emptyroom_path', '' if there is none). None if the job is not to be
+        written.
+    reason : str | None
+        Why the job is not to be written.
+    """
+    if job.is_junk.get():
+        return None, SKIP_JUNK
+
+    emptyroom_path = ''
+    rec_date = None
+    if 'Measurement date' in job.info:
+        date_vals = job.info['Measurement date'].split('/')
+        date_vals.reverse()
+        rec_date = ''.join(date_vals)
+
+    # also check to see if the file is meant to have an associated
+    # empty room file
+    if job.has_empty_room.get() is True:
+        # we will auto-construct a file path based on the date of
+        # creation of the con file
+        # TODO: make this more robust?
+        emptyroom_path = ('sub-emptyroom/ses-{0}/meg/'
+                          'sub-emptyroom_ses-{0}_task-'
+                          'noise_meg.con'.format(rec_date))
+
+    # get the variables for the raw_to_bids conversion function:
+    if job.is_empty_room.get():
+        if rec_date is None:
+            return None, SKIP_NO_DATE
+        subject_id = 'emptyroom'
+        sess_id = rec_date
+        subject_group = 'n/a'
+        task = 'noise'
+        run = None
+    else:
+        subject_id = container.subject_ID.get()
+        sess_id = container.session_ID.get()
+        if sess_id == '':
+            sess_id = None
+        subject_group = container.subject_group.get()
+        task = job.task.get()
+        if task == 'None':
+            task = None
+        run = job.run.get()
+        if run == '':
+            run = None
+
+    bids_name = make_bids_basename(subject=subject_id, session=sess_id,
+                                   task=task, run=run)
+    return {'bids_name': bids_name,
+            'subject': subject_id,
+            'session': sess_id,
+            'group': subject_group,
+            'task': task,
+            'run': run,
+            'emptyroom_path': emptyroom_path}, None
+
+
+def _estimate_job_memory(raw):
+    """Return the estimated peak memory used to write a Raw in bytes.
+
+    Writing may require all the data to be read so the size of the data files
+    is used as an upper bound.
+    """
+    size = estimate_raw_size(raw)
+    for fname in raw.filenames:
+        if fname and op.isfile(fname):
+            size += op.getsize(fname)
+    return size
+
+
+def _write_job(job_params, output_path):
+    """Write a single job to the BIDS folder at `output_path`.
+
+    This only writes the files specific to the job. Any dataset-level files
+    are handled separately by `update_dataset_files`.
+    This is a module-level function so that it can be run in a separate
+    process.
+
+    Returns
+    -------
+    bids_name : str
+        The BIDS basename of the job.
+    stages : list of dict
+        The timing information for each stage of writing the job.
+    files : list of str
+        The paths of all the files written for the job, relative to
+        `output_path`.
+    """
+    bids_name = job_params['bids_name']
+    timer = StageTimer(bids_name)
+    for record in job_params['stages']:
+        timer.add(record)
+
+    bids_path = make_bids_folders(
+        subject=job_params['subject'],
+        session=job_params['session'],
+        kind='meg',
+        output_path=output_path,
+        make_dir=False)
+
+    def job_outputs():
+        if not op.isdir(bids_path):
+            return []
+        return [op.join(bids_path, fname) for fname in os.listdir(bids_path)
+                if fname.startswith(bids_name)]
+
+    with timer.stage('write_raw_bids', reads=job_params['raw'].filenames,
+                     writes=job_outputs):
+        write_raw_bids(
+            raw=job_params['raw'],
+            bids_basename=bids_name,
+            output_path=output_path,
+            event_id=job_params['event_ids'],
+            overwrite=True,
+            verbose=True)
+
+    raw_fname = (job_params['filenames'] or [''])[0]
+    if (job_params['strategy'] in ('auto', 'reflink') and
+            op.splitext(raw_fname)[1] in ('.con', '.sqd')):
+        # mne-bids copies KIT data unchanged so the copy can share its data
+        # with the original
+        with timer.stage('clone_raw', reads=[raw_fname]) as record:
+            method = clone_raw_data(raw_fname, bids_path, bids_name)
+            record['method'] = method or 'write_raw_bids'
+
+    update_sidecar(op.join(bids_path, '{0}_meg.json'.format(bids_name)),
+                   job_params['extra_data'])
+    with timer.stage('update_markers', reads=job_params['hpi'][1:]) as record:
+        method = update_markers(job_params['hpi'], bids_path, bids_name,
+                                strategy=job_params['strategy'])
+        if method is not None:
+            record['method'] = method
+    if job_params['subject'] == 'emptyroom':
+        clean_emptyroom(bids_path)
+    files = []
+    for path in job_outputs():
+        if op.isdir(path):
+            for root, _, fnames in os.walk(path):
+                files.extend(op.join(root, fname) for fname in fnames)
+        else:
+            files.append(path)
+    return (bids_name, timer.records,
+            [op.relpath(fname, output_path) for fname in files])
+
+
+def _write_jobs_parallel(tasks, workers, status=None, job_name=None,
+                         memory_budget=None):
+    """Write all the jobs concurrently using a pool of processes.
+
+    Each job is written to its own staging folder so that the workers never
+    write to the same files at the same time. Once all the jobs are written
+    the staging folders of the successful jobs are merged into their target
+    folders one at a time.
+    If a memory budget is given a job is only started if the estimated memory
+    of all the jobs being written fits within it. A job is always started if
+    no others are being written so that a job larger than the budget is
+    still written (on its own).
+    """
+    # Keep the staging folders on the same drive as the output so that
+    # moving the written files into place is cheap.
+    output_root = op.commonpath([op.dirname(target_folder) for _,
+                                 target_folder in tasks])
+    os.makedirs(output_root, exist_ok=True)
+    staging_root = tempfile.mkdtemp(prefix='.staging-', dir=output_root)
+    results = [{'error': None, 'stages': [], 'files': []} for _ in tasks]
+    try:
+        staging_folders = [op.join(staging_root, str(i)) for i in
+                           range(len(tasks))]
+        if job_name is not None:
+            job_name.set("Writing {0} jobs using {1} processes".format(
+                len(tasks), workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = list(range(len(tasks)))
+            running = dict()
+            in_use = 0
+            done = 0
+            while pending or running:
+                # start as many jobs as the workers and budget allow
+                while pending and len(running) < workers:
+                    job_params = tasks[pending[0]][0]
+                    if (memory_budget is not None and running and
+                            in_use + job_params['memory'] > memory_budget):
+                        break
+                    i = pending.pop(0)
+                    future = executor.submit(_write_job, job_params,
+                                             staging_folders[i])
+                    running[future] = i
+                    in_use += job_params['memory']
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = running.pop(future)
+                    job_params = tasks[i][0]
+                    in_use -= job_params['memory']
+                    if memory_budget is not None:
+                        job_params['raw'] = None
+                    done += 1
+                    try:
+                        bids_name, stages, files = future.result()
+                    except Exception as e:
+                        results[i]['error'] = e
+                        continue
+                    results[i]['stages'] = stages
+                    results[i]['files'] = files
+                    if status is not None:
+                        status.set("Written {0} ({1}/{2})".format(
+                            bids_name, done, len(tasks)))
+        _merge_staged([(staging_folders[i], target_folder) for
+                       i, (_, target_folder) in enumerate(tasks) if
+                       results[i]['error'] is None])
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+    return results
+
+
+def _merge_staged(staged):
+    """Move the contents of the staging folders into their target folders.
+
+    The participants.tsv and scans.tsv files (which are shared by multiple
+    runs) have the rows from all the staging folders merged and are written
+    once each. The shared dataset-level files are only kept if they don't
+    exist yet.
+
+    Parameters
+    ----------
+    staged : list of tuple
+        List of (staging folder, target folder) pairs.
+    """
+    shared_tsvs = dict()
+    for staging, target_folder in staged:
+        for root, _, files in os.walk(staging):
+            dst_root = op.normpath(op.join(target_folder,
+                                           op.relpath(root, staging)))
+            os.makedirs(dst_root, exist_ok=True)
+            for fname in files:
+                src = op.join(root, fname)
+                dst = op.join(dst_root, fname)
+                if (fname == 'participants.tsv' or
+                        fname.endswith('_scans.tsv')):
+                    shared_tsvs.setdefault(dst, []).append(src)
+                elif fname in SHARED_FILES and op.exists(dst):
                     continue
-                subject_id = 'emptyroom'
-                sess_id = rec_date
-                subject_group = 'n/a'
-                task = 'noise'
-                run = None
-                job.raw.info['subject_info'] = None
-            else:
-                subject_id = container.subject_ID.get()
-                sess_id = container.session_ID.get()
-                if sess_id == '':
-                    sess_id = None
-                subject_group = container.subject_group.get()
-                task = job.task.get()
-                if task == 'None':
-                    task = None
-                run = job.run.get()
-                if run == '':
-                    run = None
-                if emptyroom_path != '':
-                    extra_data['AssociatedEmptyRoom'] = emptyroom_path
-
-            # TODO: change this to just use the event_info property
-            trigger_channels, descriptions = job.get_event_data()
-
-            # assume there is only one for now??
-            event_ids = dict(zip(descriptions,
-                                 [int(i) for i in trigger_channels]))
-
-            job_name.set("Task: {0}, Run: {1}".format(task, run))
-
-            try:
-                bids_name = make_bids_basename(
-                    subject=subject_id,
-                    session=sess_id,
-                    task=task,
-                    run=run)
-
-                write_raw_bids(
-                    raw=job.raw,
-                    bids_basename=bids_name,
-                    output_path=target_folder,
-                    event_id=event_ids,
-                    overwrite=True,
-                    verbose=True)
-                bids_path = make_bids_folders(
-                    subject=subject_id,
-                    session=sess_id,
-                    kind='meg',
-                    output_path=target_folder,
-                    make_dir=False)
-
-                update_sidecar(op.join(bids_path,
-                                       '{0}_meg.json'.format(bids_name)),
-                               extra_data)
-                update_participants(op.join(target_folder,
-                                            'participants.tsv'),
-                                    ('sub-{0}'.format(subject_id),
-                                        subject_group))
-                write_readme(op.join(target_folder, 'README.txt'),
-                             container.readme)
-                modify_dataset_description(
-                    op.join(target_folder, 'dataset_description.json'),
-                    container.proj_name.get())
-                update_markers(job, bids_path, bids_name)
-                if subject_id == 'emptyroom':
-                    clean_emptyroom(bids_path)
-
-            except:  # noqa
-                # We want to actually just catch any error and print a
-                # message.
-                progress.curr_value.set("An error occurred during the "
-                                        "conversion process.\nPlease check "
-                                        "the python console to see the error.")
-                has_error = True
-                raise
-
+                else:
+                    os.replace(src, dst)
+    for dst, srcs in shared_tsvs.items():
+        merge_tsv(srcs, dst)
+
+
+def update_dataset_files(updater, jobs, container):
+    """Add the information from the jobs of a container to the changes to be
+    made to the dataset-level files.
+
+    Nothing is written until `write_dataset_files` is called so that the
+    dataset-level files are only written once, however many jobs and
+    containers are converted into the same folder.
+
+    Parameters
+    ----------
+    updater : instance of DatasetUpdater
+        The changes to the dataset-level files of the project folder.
+    jobs : list of dict
+        The job parameters as returned by `get_jobs`.
+    container : instance of BIDSContainer
+        The container the jobs belong to.
+    """
+    for job_params in jobs:
+        updater.add_participant('sub-{0}'.format(job_params['subject']),
+                                job_params['group'])
+    if isinstance(container.readme, str):
+        updater.readme = container.readme
+    updater.name = container.proj_name.get()
+
+
+def write_dataset_files(updater, timer=None):
+    """Write the changes to the dataset-level files to disk."""
+    if timer is None:
+        timer = StageTimer()
+    participants = op.join(updater.folder, 'participants.tsv')
+    with timer.stage('update_participants', reads=[participants],
+                     writes=[participants]):
+        updater.flush_participants()
+    readme = op.join(updater.folder, 'README.txt')
+    description = op.join(updater.folder, 'dataset_description.json')
+    with timer.stage('dataset_files', reads=[description],
+                     writes=[readme, description]):
+        updater.flush_description()
+
+
+def _show_converted(parent, bids_folder_path, bidstree_folder_exists):
+    """Add the converted data to the file tree and select it.
+
+    This must be called from the UI thread.
+    """
     new_sids = parent.file_treeview.refresh()
 
     if not bidstree_folder_exists:
@@ -190,31 +752,3 @@ def convert(container, settings, parent=None):
             parent.file_treeview.selection_set((sid,))
             break
 
-    if not has_error:
-        # copy over any extra files:
-        for file in container.extra_files:
-            ext = op.splitext(file)[1]
-            if ext in ['.m', '.py']:
-                dst = op.join(target_folder, 'code')
-            else:
-                dst = op.join(target_folder,
-                              'sub-{0}'.format(subject_id),
-                              'ses-{0}'.format(sess_id), 'extras')
-            if not op.exists(dst):
-                os.makedirs(dst)
-            shutil.copy(file, dst)
-        progress.curr_value.set("Conversion done! Closing window in 3...")
-        sleep(1)
-        progress.curr_value.set("Conversion done! Closing window in 2...")
-        sleep(1)
-        progress.curr_value.set("Conversion done! Closing window in 1...")
-        sleep(1)
-        p._exit()
-
-    # This is essentially useless but it suppresses pylint:E1111
-    return True
-
-
-def _shorten_path(fname):
-    """ strip just the final part of the path """
-    return op.basename(fname).split("'")[0]
@@ -0,0 +1,332 @@
+"""
+Headless batch conversion of all the data within the data folder.
+
+This allows the conversion to be run without the GUI (eg. overnight on a lab
+server):
+
+    python -m Biscuit convert --workers 8
+
+Only data which has had its information entered and saved in Biscuit (and
+is therefore valid) will be converted.
+"""
+
+import argparse
+import os
+import os.path as op
+import pickle
+import tkinter
+from time import perf_counter
+
+from Biscuit.FileTypes import KITData, FIFData
+from Biscuit.Management.BIDSConvert import (get_bids_folder, get_jobs,
+                                            get_memory_budget,
+                                            plan_container, format_plan,
+                                            get_changed_jobs, write_jobs,
+                                            update_dataset_files,
+                                            write_dataset_files,
+                                            copy_extra_files)
+from Biscuit.Management.SaveManager import SaveManager
+from Biscuit.utils.constants import OSCONST
+from Biscuit.utils.instrument import StageTimer, format_records, write_log
+from Biscuit.utils.fingerprint import ConversionManifest
+from Biscuit.utils.bids_postprocess import DatasetUpdater
+from Biscuit.utils.utils import get_fsize
+
+
+class HeadlessTree():
+    """A minimal replacement for the FileTreeview used when there is no GUI.
+
+    This provides the methods of the FileTreeview which are used by the
+    various FileInfo objects. The id of each entry is simply its normalised
+    path.
+
+    Parameters
+    ----------
+    directory : str
+        The root data directory.
+    """
+    def __init__(self, directory):
+        self.root_path = op.normpath(directory)
+
+    def add_tags(self, id_, tags):
+        # There is nothing to show the tags on.
+        pass
+
+    def get_children(self, item=''):
+        path = item or self.root_path
+        try:
+            entries = sorted(os.listdir(path), key=str.lower)
+        except OSError:
+            return tuple()
+        return tuple(op.normpath(op.join(path, fname)) for fname in entries)
+
+    def item(self, item, option=None, **kwargs):
+        if kwargs:
+            # Setting any item options (eg. tags) does nothing.
+            return None
+        path = item or self.root_path
+        if op.isdir(path):
+            text, ext = op.basename(path), ''
+        else:
+            text, ext = op.splitext(op.basename(path))
+        data = {'text': text, 'values': [ext, path], 'tags': ''}
+        if option is not None:
+            return data[option]
+        return data
+
+    def parent(self, item):
+        if item == '' or op.normpath(item) == self.root_path:
+            return ''
+        return op.dirname(op.normpath(item))
+
+    def remove_tags(self, id_, tags):
+        pass
+
+    def sid_from_filepath(self, fpath, search=True):
+        fpath = op.normpath(fpath)
+        if not op.exists(fpath):
+            raise KeyError(fpath)
+        return fpath
+
+
+class HeadlessParent():
+    """Stand-in for the MainWindow providing the data the FileInfo objects
+    require."""
+    def __init__(self, settings, proj_settings):
+        self.settings = settings
+        self.proj_settings = proj_settings
+        self.file_treeview = HeadlessTree(settings['DATA_PATH'])
+        self.preloaded_data = dict()
+
+
+def load_settings():
+    """Load the settings and project settings saved by Biscuit."""
+    from Biscuit.Windows.MainWindow import DEFAULTSETTINGS
+    settings = dict(DEFAULTSETTINGS)
+    try:
+        with open(op.join(OSCONST.USRDIR, 'settings.pkl'), 'rb') as f:
+            settings.update(pickle.load(f))
+    except FileNotFoundError:
+        pass
+    try:
+        with open(op.join(OSCONST.USRDIR, 'proj_settings.pkl'), 'rb') as f:
+            proj_settings = pickle.load(f)
+    except FileNotFoundError:
+        proj_settings = []
+    return settings, proj_settings
+
+
+def discover_containers(parent):
+    """Find all the KIT folders and .fif files within the data folder.
+
+    Returns
+    -------
+    containers : list of BIDSContainer
+        All the containers which have saved information.
+    skipped : list of tuple
+        (path, reason) for each container which cannot be converted.
+    """
+    tree = parent.file_treeview
+    bids_root = op.join(tree.root_path, 'BIDS')
+    containers = []
+    skipped = []
+    for root, dirs, files in os.walk(tree.root_path):
+        root = op.normpath(root)
+        # don't go looking through the output data
+        dirs[:] = sorted(d for d in dirs if op.join(root, d) != bids_root)
+        if root != tree.root_path and KITData.generate_file_list(
+                root, tree, validate=True):
+            obj = parent.preloaded_data.get(root, None)
+            if not isinstance(obj, KITData):
+                obj = KITData(root, root, parent.proj_settings, parent)
+                obj.initial_processing()
+                parent.preloaded_data[root] = obj
+            containers.append(obj)
+        for fname in sorted(files):
+            if op.splitext(fname)[1] != '.fif':
+                continue
+            fpath = op.join(root, fname)
+            obj = parent.preloaded_data.get(fpath, None)
+            if isinstance(obj, FIFData):
+                containers.append(obj)
+            else:
+                skipped.append((fpath, 'no saved information'))
+    valid = []
+    for container in containers:
+        if container.check_valid():
+            valid.append(container)
+        else:
+            skipped.append((container.file, 'missing required information'))
+    return valid, skipped
+
+
+def batch_convert(parent, workers=1):
+    """Convert all the valid data in the data folder in one go.
+
+    All the jobs of all the containers are written by the same pool of
+    processes. Jobs which haven't changed since they were last converted are
+    not written again.
+    If a memory budget is set ('CONVERT_MEMORY') the Raw of each job is
+    released as soon as it has been written.
+
+    Returns
+    -------
+    summary : dict
+        Information about what was converted and how long it took.
+    """
+    t_start = perf_counter()
+    settings = parent.settings
+    containers, skipped = discover_containers(parent)
+    memory_budget = get_memory_budget(settings)
+    strategy = settings.get('OUTPUT_STRATEGY', 'auto')
+    failed = []
+    tasks = []
+    owners = []
+    manifests = dict()
+    updaters = dict()
+    all_jobs = []
+    unchanged = 0
+    for container in containers:
+        try:
+            container.prepare()
+        except Exception as e:
+            failed.append((container.file, e))
+            continue
+        target_folder = op.join(get_bids_folder(settings),
+                                container.proj_name.get())
+        if target_folder not in manifests:
+            manifests[target_folder] = ConversionManifest(target_folder)
+            updaters[target_folder] = DatasetUpdater(target_folder)
+        jobs = get_jobs(container, release=memory_budget is not None,
+                        strategy=strategy)
+        all_jobs.append((container, target_folder, jobs))
+        changed_jobs = get_changed_jobs(jobs, manifests[target_folder])
+        unchanged += len(jobs) - len(changed_jobs)
+        for job_params in changed_jobs:
+            tasks.append((job_params, target_folder))
+            owners.append(container)
+
+    results = write_jobs(tasks, workers=workers,
+                         memory_budget=memory_budget)
+
+    timer = StageTimer()
+    written_bytes = 0
+    converted = 0
+    container_errors = dict()
+    for (job_params, target_folder), container, result in zip(tasks, owners,
+                                                              results):
+        if result['error'] is not None:
+            failed.append((job_params['filenames'][0], result['error']))
+            container_errors[container] = True
+            continue
+        converted += 1
+        timer.records.extend(result['stages'])
+        manifests[target_folder].update(job_params['bids_name'],
+                                        job_params['fingerprint'],
+                                        result['files'])
+        written_bytes += sum(op.getsize(fname) for fname in
+                             job_params['filenames'])
+    # The dataset-level files of each folder are only written once all the
+    # information for every container going into it has been collected.
+    for container, target_folder, jobs in all_jobs:
+        if not container_errors.get(container, False):
+            update_dataset_files(updaters[target_folder], jobs, container)
+    for updater in updaters.values():
+        write_dataset_files(updater, timer)
+    for container in set(owners):
+        if not container_errors.get(container, False):
+            copy_extra_files(container,
+                             op.join(get_bids_folder(settings),
+                                     container.proj_name.get()),
+                             timer, strategy=strategy)
+    for manifest in manifests.values():
+        manifest.save()
+    write_log(timer.records, container=settings['DATA_PATH'],
+              target=get_bids_folder(settings))
+
+    return {'containers': len(containers),
+            'jobs': len(tasks),
+            'converted': converted,
+            'unchanged': unchanged,
+            'stages': timer.records,
+            'bytes': written_bytes,
+            'time': perf_counter() - t_start,
+            'skipped': skipped,
+            'failed': failed}
+
+
+def print_plan(parent):
+    """Print what would be written by `batch_convert` without writing
+    anything."""
+    containers, skipped = discover_containers(parent)
+    for container in containers:
+        print(format_plan(plan_container(container, parent.settings)))
+    for path, reason in skipped:
+        print("Skipped: {0} ({1})".format(path, reason))
+
+
+def print_summary(summary):
+    """Print the summary produced by `batch_convert`."""
+    duration = max(summary['time'], 1e-6)
+    print("Converted {0} of {1} jobs from {2} containers in {3:.1f}s".format(
+        summary['converted'], summary['jobs'], summary['containers'],
+        summary['time']))
+    if summary['unchanged'] != 0:
+        print("{0} unchanged jobs were skipped".format(summary['unchanged']))
+    if summary['bytes'] != 0:
+        print("Throughput: {0} at {1:.2f}Mb/s, {2:.2f} jobs/min".format(
+            get_fsize(summary['bytes']),
+            summary['bytes'] / (1024 ** 2) / duration,
+            60 * summary['converted'] / duration))
+    if summary['stages']:
+        print(format_records(summary['stages']))
+    for path, reason in summary['skipped']:
+        print("Skipped: {0} ({1})".format(path, reason))
+    for path, error in summary['failed']:
+        print("Failed: {0}: {1!r}".format(path, error))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m Biscuit convert',
+        description='Convert all the saved data in the data folder to BIDS '
+                    'format.')
+    parser.add_argument('--data-path', default=None,
+                        help='Folder to search for data. Defaults to the data '
+                             'folder set in Biscuit.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes to write the data with. '
+                             'Defaults to the value set in Biscuit.')
+    parser.add_argument('--memory', type=int, default=None,
+                        help='Memory budget in MB for the jobs being written '
+                             'at the same time. 0 means no limit. Defaults '
+                             'to the value set in Biscuit.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only show what would be written.')
+    args = parser.parse_args(argv)
+
+    # The FileInfo objects store their data in tkinter Variables which need
+    # an interpreter, but not a display.
+    tkinter._default_root = tkinter.Tcl()
+
+    settings, proj_settings = load_settings()
+    if args.data_path is not None:
+        settings['DATA_PATH'] = args.data_path
+    if not op.isdir(settings['DATA_PATH']):
+        parser.error("The data path {0!r} doesn't exist".format(
+            settings['DATA_PATH']))
+    workers = args.workers or settings.get('CONVERT_WORKERS', 1)
+    if args.memory is not None:
+        settings['CONVERT_MEMORY'] = args.memory
+
+    parent = HeadlessParent(settings, proj_settings)
+    parent.save_handler = SaveManager(parent)
+    parent.save_handler.load()
+
+    if args.dry_run:
+        print_plan(parent)
+        return 0
+
+    summary = batch_convert(parent, workers=workers)
+    print_summary(summary)
+    return 1 if summary['failed'] else 0
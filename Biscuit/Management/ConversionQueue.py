@@ -0,0 +1,237 @@
+"""
+A persistent queue of conversions which are run in the background.
+
+Each entry in the queue is stored as a plain dictionary so that the queue can
+be saved to disk and resumed the next time Biscuit is opened.
+"""
+
+from datetime import datetime
+import os
+import os.path as op
+import pickle
+from threading import Lock, Thread
+import traceback
+from uuid import uuid4
+
+QUEUED = 'Queued'
+RUNNING = 'Running'
+DONE = 'Done'
+FAILED = 'Failed'
+CANCELLED = 'Cancelled'
+# Entries with one of these statuses will not be run (again).
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class EntryStatus():
+    """Provides a `set` method like a tkinter.StringVar which sets the
+    message (or another value given by `key`) of a queue entry, so that it
+    can be passed as the `status` of a conversion."""
+    def __init__(self, queue, entry, key='message'):
+        self.queue = queue
+        self.entry = entry
+        self.key = key
+
+    def set(self, value):
+        with self.queue.lock:
+            self.entry[self.key] = value
+
+
+class ConversionQueue():
+    """A queue of conversions which are run in background threads.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file the queue is saved to.
+    runner : function
+        Function called (in a separate thread) to run each entry. It is
+        passed the entry and an `EntryStatus` which can be used to set the
+        message shown for the entry. Any exception raised marks the entry as
+        failed.
+    max_running : int
+        Maximum number of entries to be run at the same time.
+
+    Notes
+    -----
+    Two entries with the same target folder are never run at the same time
+    so that the files shared by the whole project (eg. participants.tsv) are
+    never written by more than one conversion at once.
+    """
+    def __init__(self, fname, runner, max_running=1):
+        self.fname = fname
+        self.runner = runner
+        self.max_running = max_running
+        self.entries = []
+        self.lock = Lock()
+        self._running = False
+
+#region public methods
+
+    def cancel(self, id_):
+        """Cancel a queued entry.
+
+        Entries which are already running cannot be cancelled.
+
+        Returns
+        -------
+        cancelled : bool
+            Whether the entry was cancelled.
+        """
+        with self.lock:
+            entry = self._get_entry(id_)
+            if entry is None or entry['status'] != QUEUED:
+                return False
+            entry['status'] = CANCELLED
+            entry['message'] = ''
+            self._save()
+        return True
+
+    def clear_finished(self):
+        """Remove all the entries which have finished."""
+        with self.lock:
+            self.entries = [entry for entry in self.entries if
+                            entry['status'] not in FINISHED]
+            self._save()
+
+    def load(self):
+        """Load the saved queue.
+
+        Any entries which were running when Biscuit was closed are queued
+        again. Entries which had finished are not kept.
+        """
+        try:
+            with open(self.fname, 'rb') as f:
+                entries = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            entries = []
+        with self.lock:
+            self.entries = []
+            for entry in entries:
+                if entry['status'] in FINISHED:
+                    continue
+                entry['status'] = QUEUED
+                entry['message'] = 'Resumed'
+                self.entries.append(entry)
+
+    def move(self, id_, offset):
+        """Change the priority of an entry by moving it `offset` places
+        within the queue. Negative values move the entry forward."""
+        with self.lock:
+            entry = self._get_entry(id_)
+            if entry is None:
+                return
+            idx = self.entries.index(entry)
+            new_idx = min(max(idx + offset, 0), len(self.entries) - 1)
+            self.entries.insert(new_idx, self.entries.pop(idx))
+            self._save()
+
+    def snapshot(self):
+        """Return a copy of the entries which is safe to use while the queue
+        is being run."""
+        with self.lock:
+            return [dict(entry) for entry in self.entries]
+
+    def start(self):
+        """Start running the queued entries."""
+        self._running = True
+        self._schedule()
+
+    def stop(self):
+        """Stop any more entries from being started.
+
+        Entries which are already running are left to finish.
+        """
+        self._running = False
+
+    def submit(self, path, target, name):
+        """Add an entry to the end of the queue.
+
+        Parameters
+        ----------
+        path : str
+            Path of the container to be converted.
+        target : str
+            Path of the folder the container will be written to.
+        name : str
+            Name shown for the entry.
+
+        Returns
+        -------
+        id_ : str
+            The id of the entry. If the container is already waiting to be
+            converted the id of the existing entry is returned.
+        """
+        with self.lock:
+            for entry in self.entries:
+                if entry['path'] == path and entry['status'] == QUEUED:
+                    return entry['id']
+            entry = {'id': uuid4().hex,
+                     'path': path,
+                     'target': target,
+                     'name': name,
+                     'status': QUEUED,
+                     'message': '',
+                     'timings': '',
+                     'submitted': datetime.now().strftime(
+                         '%Y-%m-%d %H:%M:%S')}
+            self.entries.append(entry)
+            self._save()
+        self._schedule()
+        return entry['id']
+
+#region private methods
+
+    def _get_entry(self, id_):
+        for entry in self.entries:
+            if entry['id'] == id_:
+                return entry
+        return None
+
+    def _run(self, entry):
+        try:
+            self.runner(entry, EntryStatus(self, entry))
+        except Exception as e:
+            traceback.print_exc()
+            with self.lock:
+                entry['status'] = FAILED
+                entry['message'] = str(e) or type(e).__name__
+        else:
+            with self.lock:
+                entry['status'] = DONE
+                entry['message'] = ''
+        with self.lock:
+            self._save()
+        self._schedule()
+
+    def _save(self):
+        # This must be called with the lock held.
+        if not op.exists(op.dirname(self.fname)):
+            os.makedirs(op.dirname(self.fname))
+        temp_fname = self.fname + '_temp'
+        with open(temp_fname, 'wb') as f:
+            pickle.dump(self.entries, f)
+        os.replace(temp_fname, self.fname)
+
+    def _schedule(self):
+        """Start as many of the queued entries as possible."""
+        if not self._running:
+            return
+        to_start = []
+        with self.lock:
+            running = [entry for entry in self.entries if
+                       entry['status'] == RUNNING]
+            busy = set(entry['target'] for entry in running)
+            for entry in self.entries:
+                if len(running) + len(to_start) >= self.max_running:
+                    break
+                if entry['status'] != QUEUED or entry['target'] in busy:
+                    continue
+                entry['status'] = RUNNING
+                entry['message'] = ''
+                entry['timings'] = ''
+                busy.add(entry['target'])
+                to_start.append(entry)
+            if to_start:
+                self._save()
+        for entry in to_start:
+            Thread(target=self._run, args=(entry,), daemon=True).start()
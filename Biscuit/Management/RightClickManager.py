@@ -262,9 +262,8 @@ class RightClick():
                     # we have clicked outside the tree. Set the parent as the
                     # root
                     parent = ''
-                self.parent.file_treeview.ordered_insert(
-                    parent, values=['', str(full_path)], text=folder_name,
-                    open=False)
+                self.parent.file_treeview.insert_folder(parent,
+                                                        str(full_path))
                 print('folder created!!')
             else:
                 print('Folder already exists!')
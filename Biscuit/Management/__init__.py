@@ -3,5 +3,5 @@ from .ClickContext import ClickContext  # noqa
 from .CustomVars import OptionsVar, StreamedVar, RangeVar  # noqa
 #from .SaveManager import SaveManager  # noqa
 from .wckToolTips import ToolTipManager  # noqa
-from .BIDSConvert import convert  # noqa
+from .BIDSConvert import queue_conversion  # noqa
 #from .RightClickManager import RightClick  # noqa
\ No newline at end of file
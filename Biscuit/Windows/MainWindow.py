@@ -24,8 +24,11 @@ from Biscuit.Management import ClickContext
 from Biscuit.Management.RightClickManager import RightClick
 from Biscuit.Management.InfoManager import InfoManager
 from Biscuit.Management.SaveManager import SaveManager
+from Biscuit.Management.ConversionQueue import ConversionQueue
+from Biscuit.Management.BIDSConvert import run_queued
 from Biscuit.Windows import (ProjectListWindow, ProgressPopup, CheckSavePopup,
-                             CreditsPopup, SettingsWindow, SendFilesWindow)
+                             CreditsPopup, SettingsWindow, SendFilesWindow,
+                             QueueWindow)
 from Biscuit.utils.utils import threaded, get_object_class, assign_bids_data
 from Biscuit.utils.constants import OSCONST
 
@@ -33,7 +36,12 @@ from Biscuit.utils.constants import OSCONST
 DEFAULTSETTINGS = {"DATA_PATH": "",
                    "SHOW_ASSOC_MESSAGE": True,
                    "ARCHIVE_PATH": OSCONST.SVR_PATH,
-                   "CHUNK_FREQ": 14}
+                   "CHUNK_FREQ": 14,
+                   "CONVERT_WORKERS": 1,
+                   "CONVERT_MEMORY": 0,
+                   "OUTPUT_STRATEGY": "auto",
+                   "CONVERT_CONCURRENT": 1,
+                   "LAZY_TREE": False}
 
 
 class MainWindow(Frame):
@@ -113,6 +121,17 @@ class MainWindow(Frame):
 
         self.save_handler.load()
 
+        # Conversions are run in the background by the conversion queue.
+        # Any conversions which hadn't finished when Biscuit was last closed
+        # are resumed.
+        self.conversion_queue = ConversionQueue(
+            op.join(OSCONST.USRDIR, 'conversion_queue.pkl'),
+            lambda entry, status: run_queued(entry, status, self),
+            max_running=self.settings.get('CONVERT_CONCURRENT', 1))
+        self.conversion_queue.load()
+        self.conversion_queue.start()
+        self.queue_window = None
+
         self.master.deiconify()
         self.focus_set()
 
@@ -200,6 +219,8 @@ class MainWindow(Frame):
 
         self.tools_menu.add_command(label="Import BIDS data",
                                     command=self._import_bids_data)
+        self.tools_menu.add_command(label="Conversion queue",
+                                    command=self.open_queue)
 
         # Info menu
         self.info_menu = Menu(self.menu_bar, tearoff=0)
@@ -226,6 +247,7 @@ class MainWindow(Frame):
         treeview_frame = Frame(self.pw)
         self.file_treeview = FileTreeview(treeview_frame,
                                           self.settings["DATA_PATH"],
+                                          lazy=self.settings["LAZY_TREE"],
                                           columns=["dtype", "filepath"],
                                           selectmode='extended',
                                           displaycolumns=["dtype"])
@@ -555,6 +577,8 @@ class MainWindow(Frame):
     def _open_settings(self):
         # this will modify self.settings with any changed values
         SettingsWindow(self, self.settings)
+        self.conversion_queue.max_running = self.settings.get(
+            'CONVERT_CONCURRENT', 1)
 
     def _open_settings_folder(self):
         if OSCONST.os != 'LNX':
@@ -564,6 +588,13 @@ class MainWindow(Frame):
             from subprocess import Popen
             Popen(['xdg-open', OSCONST.USRDIR])
 
+    def open_queue(self):
+        """Show the conversion queue window (if it isn't shown already)."""
+        if self.queue_window is not None and self.queue_window.winfo_exists():
+            self.queue_window.lift()
+        else:
+            self.queue_window = QueueWindow(self)
+
     def get_selection_info(self):
         data = []
         for sid in self.file_treeview.selection():
@@ -0,0 +1,133 @@
+from tkinter import Toplevel
+from tkinter.ttk import Frame, Button, Treeview, Scrollbar, Label
+
+from Biscuit.Management import ToolTipManager
+
+ttm = ToolTipManager()
+
+# How often the status of the queue is re-drawn (ms)
+REFRESH_INTERVAL = 500
+
+
+class QueueWindow(Toplevel):
+    """
+    A window showing the status of all the conversions in the conversion
+    queue.
+
+    Parameters
+    ----------
+    master : instance of MainWindow
+        The main window containing the conversion queue.
+    """
+    def __init__(self, master):
+        self.master = master
+        self.queue = master.conversion_queue
+        Toplevel.__init__(self, self.master)
+        self.withdraw()
+
+        self.title('Conversion Queue')
+
+        self.protocol("WM_DELETE_WINDOW", self._exit)
+
+        self._create_widgets()
+        self._refresh()
+
+        self.deiconify()
+        self.focus_set()
+
+    def _create_widgets(self):
+        frame = Frame(self)
+        frame.grid(sticky='nsew')
+
+        self.tree = Treeview(frame, columns=('status', 'message', 'submitted'),
+                             selectmode='browse')
+        self.tree.heading('#0', text='Session')
+        self.tree.heading('status', text='Status')
+        self.tree.heading('message', text='Progress')
+        self.tree.heading('submitted', text='Submitted')
+        self.tree.column('#0', width=250)
+        self.tree.column('status', width=80)
+        self.tree.column('message', width=300)
+        self.tree.column('submitted', width=140)
+        self.tree.grid(column=0, row=0, sticky='nsew')
+        scrollbar = Scrollbar(frame, orient='vertical',
+                              command=self.tree.yview)
+        scrollbar.grid(column=1, row=0, sticky='ns')
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        # time taken by each stage of the selected conversion
+        self.timings = Label(frame, justify='left')
+        self.timings.grid(column=0, row=1, columnspan=2, sticky='w')
+
+        btn_frame = Frame(frame)
+        up_btn = Button(btn_frame, text="Move up",
+                        command=lambda: self._move(-1))
+        up_btn.grid(column=0, row=0)
+        down_btn = Button(btn_frame, text="Move down",
+                          command=lambda: self._move(1))
+        down_btn.grid(column=1, row=0)
+        cancel_btn = Button(btn_frame, text="Cancel", command=self._cancel)
+        cancel_btn.grid(column=2, row=0)
+        ttm.register(cancel_btn,
+                     "Cancel the selected conversion.\nConversions which have "
+                     "already started cannot be cancelled.")
+        clear_btn = Button(btn_frame, text="Clear finished",
+                           command=self._clear_finished)
+        clear_btn.grid(column=3, row=0)
+        close_btn = Button(btn_frame, text="Close", command=self._exit)
+        close_btn.grid(column=4, row=0)
+        btn_frame.grid(column=0, row=2, columnspan=2, pady=2)
+
+        frame.grid_columnconfigure(0, weight=1)
+        frame.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+    def _cancel(self):
+        for id_ in self.tree.selection():
+            self.queue.cancel(id_)
+        self._draw()
+
+    def _clear_finished(self):
+        self.queue.clear_finished()
+        self._draw()
+
+    def _draw(self):
+        """Re-draw the entries of the queue, keeping the selection."""
+        selection = self.tree.selection()
+        entries = self.queue.snapshot()
+        ids = [entry['id'] for entry in entries]
+        for id_ in self.tree.get_children():
+            if id_ not in ids:
+                self.tree.delete(id_)
+        for idx, entry in enumerate(entries):
+            values = (entry['status'], entry['message'], entry['submitted'])
+            if self.tree.exists(entry['id']):
+                self.tree.item(entry['id'], values=values)
+                self.tree.move(entry['id'], '', idx)
+            else:
+                self.tree.insert('', idx, iid=entry['id'], text=entry['name'],
+                                 values=values)
+        self.tree.selection_set([id_ for id_ in selection if
+                                 self.tree.exists(id_)])
+        timings = ''
+        for entry in entries:
+            if entry['id'] in self.tree.selection():
+                timings = entry.get('timings', '')
+        self.timings.configure(text=timings)
+
+    def _move(self, offset):
+        for id_ in self.tree.selection():
+            self.queue.move(id_, offset)
+        self._draw()
+
+    def _refresh(self):
+        self._draw()
+        self._after_id = self.after(REFRESH_INTERVAL, self._refresh)
+
+    def _exit(self):
+        self.after_cancel(self._after_id)
+        self.withdraw()
+        self.update_idletasks()
+        self.master.focus_set()
+        self.destroy()
@@ -1,13 +1,32 @@
 from tkinter import Toplevel, IntVar, StringVar, BooleanVar
-from tkinter.ttk import Frame, Label, Button, Progressbar, Checkbutton
+from tkinter.ttk import (Frame, Label, Button, Progressbar, Checkbutton,
+                         Spinbox, Combobox)
+import logging
 import os
 import os.path as op
+from threading import Event
+from time import perf_counter
 
 from bidshandler import BIDSTree
 
-from Biscuit.Management import RangeVar, ToolTipManager
+from Biscuit.Management import ToolTipManager
 from Biscuit.utils.utils import get_fsize, threaded
 from Biscuit.utils.BIDSCopy import BIDSCopy
+from Biscuit.utils.hashing import ALGORITHMS, DEFAULT_ALGORITHM
+from Biscuit.utils.instrument import write_log
+from Biscuit.utils.manifest import ChecksumManifest
+from Biscuit.utils.progress import ProgressSampler, ProgressValue
+from Biscuit.utils.scan import scandir_files
+from Biscuit.utils.transferjournal import TransferJournal
+from Biscuit.utils.constants import OSCONST
+
+# Log of all the transfers made, stored in the user folder.
+TRANSFER_LOG = 'transfer_log.jsonl'
+# Journal of the files copied so that interrupted transfers can be resumed.
+TRANSFER_JOURNAL = 'transfer_journal.json'
+# Number of copied files which can be verified while the next files are
+# copied.
+VERIFY_WINDOW = 2
 
 ttm = ToolTipManager()
 
@@ -49,38 +68,60 @@ class SendFilesWindow(Toplevel):
 
         # define some variables we need
         self.force_override = BooleanVar(value=False)
+        # whether to compare checksums when checking for unchanged files
+        self.checksum = BooleanVar(value=False)
+        # number of files to copy at the same time
+        self.workers = IntVar(value=4)
         if opt_verify:
             self.verify = BooleanVar(value=False)
         else:
             self.verify = BooleanVar(value=True)
-        # total number of files to transfer
-        self.file_count_var = StringVar(value="Number of files: {0}")
-        self.total_file_size = StringVar(value="Total file size: {0}")
+        # hash algorithm used to verify the data
+        self.algorithm = StringVar(value=DEFAULT_ALGORITHM)
+        # total number of files to transfer and their size. These are found
+        # by scanning the sources in the background so that the window
+        # appears straight away.
+        self.file_count_var = StringVar()
+        self.total_file_size = StringVar()
         self.file_count = 0
-        total_file_size = 0
-        for src in self.srcs:
-            for root, _, files in os.walk(src.path):
-                self.file_count += len(files)
-                for file in files:
-                    fpath = op.join(root, file)
-                    fsize = os.stat(fpath).st_size
-                    total_file_size += fsize
-        fsize = get_fsize(total_file_size)
-        self.file_count_var.set(
-            self.file_count_var.get().format(self.file_count))
-        self.total_file_size.set(self.total_file_size.get().format(fsize))
+        self.total_bytes = 0
+        # os.stat_result of each file found by the scan. These are reused by
+        # the transfer so the files don't need to be stat'ed again.
+        self.src_stats = dict()
+        self.scan_done = Event()
+        self._closing = False
         # current name of file being transferred
         self.curr_file = StringVar(value="None")
         # number of files that have been transferred
         self.transferred_count = IntVar()
         # internal progress variable
-        self.curr_file_progress = RangeVar(
-            max_val=0, max_val_callback=self._update_file_progress)
+        self.curr_file_progress = IntVar()
+        # The progress is published to these by the transfer threads and
+        # sampled by the UI so the transfer never waits on Tk.
+        self.file_name_progress = ProgressValue("None")
+        self.file_num_progress = ProgressValue(0, max=self.file_count)
+        self.file_progress = ProgressValue(0)
+        self.file_count_progress = ProgressValue()
+        self.total_size_progress = ProgressValue()
+        self._publish_scan(scanning=True)
 
         self.protocol("WM_DELETE_WINDOW", self._exit)
 
         self._create_widgets()
 
+        self.sampler = ProgressSampler(self)
+        self.sampler.bind(self.file_name_progress, self.curr_file)
+        self.sampler.bind(self.file_count_progress, self.file_count_var)
+        self.sampler.bind(self.total_size_progress, self.total_file_size)
+        self.sampler.bind(
+            self.file_num_progress, self.transferred_count,
+            lambda max_: self.total_prog.config(maximum=max_))
+        self.sampler.bind(
+            self.file_progress, self.curr_file_progress,
+            lambda max_: self.file_prog.config(maximum=max_))
+        self.sampler.start()
+        self._scan()
+
         self.deiconify()
         self.focus_set()
 
@@ -110,45 +151,166 @@ class SendFilesWindow(Toplevel):
         # info about total progress
         label3 = Label(frame, text="Overall progress:")
         label3.grid(column=0, row=3, sticky='w')
-        total_prog = Progressbar(frame, variable=self.transferred_count,
-                                 maximum=self.file_count)
-        total_prog.grid(column=1, row=3)
+        self.total_prog = Progressbar(frame, variable=self.transferred_count,
+                                      maximum=self.file_count)
+        self.total_prog.grid(column=1, row=3)
 
         # buttons
         btn_frame = Frame(frame)
         force_check = Checkbutton(btn_frame, text="Force",
                                   variable=self.force_override)
         force_check.grid(column=0, row=0, sticky='e')
+        checksum_check = Checkbutton(btn_frame, text="Checksum",
+                                     variable=self.checksum)
+        checksum_check.grid(column=1, row=0, sticky='e')
+        ttm.register(checksum_check,
+                     "Also compare the checksums of files which appear to be "
+                     "unchanged before skipping them.\nThis is slower as the "
+                     "files need to be read.")
         verify_check = Checkbutton(btn_frame, text="Verify",
                                    variable=self.verify)
+        algorithm_box = Combobox(btn_frame, textvariable=self.algorithm,
+                                 values=list(ALGORITHMS), state='readonly',
+                                 width=8)
+        ttm.register(algorithm_box,
+                     "The algorithm used to check that the data was copied "
+                     "correctly.\ncrc32 is the fastest, md5 is compatible "
+                     "with previous transfers.")
         if self.opt_verify:
-            verify_check.grid(column=1, row=0, sticky='e')
+            verify_check.grid(column=2, row=0, sticky='e')
+        algorithm_box.grid(column=3, row=0, sticky='w')
         ttm.register(force_check,
                      ("Whether to force the overwriting of current data.\n"
-                      "This should only be done if there was an error and the "
+                      "By default files which already exist at the "
+                      "destination with the same size\nare skipped. Forcing "
+                      "should only be done if there was an error and the "
                       "data needs to be re-sent."))
+        workers_lbl = Label(btn_frame, text="Parallel copies:")
+        workers_lbl.grid(column=4, row=0, sticky='e')
+        ttm.register(workers_lbl,
+                     "The number of files to copy at the same time.\n"
+                     "Copying multiple files at once is faster when sending "
+                     "many small files\nover a network.")
+        workers_spin = Spinbox(btn_frame, from_=1, to=16, width=3,
+                               textvariable=self.workers)
+        workers_spin.grid(column=5, row=0, sticky='w')
         btn_start = Button(btn_frame, text="Begin", command=self._transfer)
-        btn_start.grid(column=2, row=0, sticky='e')
+        btn_start.grid(column=6, row=0, sticky='e')
+        btn_check = Button(btn_frame, text="Check archive",
+                           command=self._check_archive)
+        btn_check.grid(column=7, row=0, sticky='e')
+        ttm.register(btn_check,
+                     "Re-hash the data at the destination and compare it to "
+                     "the checksums recorded\nwhen it was transferred. The "
+                     "source data isn't needed.")
         btn_exit = Button(btn_frame, text="Exit", command=self._exit)
-        btn_exit.grid(column=3, row=0, sticky='w')
+        btn_exit.grid(column=8, row=0, sticky='w')
         btn_frame.grid(column=0, row=4, columnspan=2)
 
     @threaded
     def _transfer(self):
         """Transfer all the files in each of the sources to the destination."""
+        journal = TransferJournal(op.join(OSCONST.USRDIR, TRANSFER_JOURNAL))
+        manifest = ChecksumManifest(self.dst)
         copy_func = BIDSCopy(overwrite=self.force_override.get(),
                              verify=self.verify.get(),
-                             file_name_tracker=self.curr_file,
-                             file_num_tracker=self.transferred_count,
-                             file_prog_tracker=self.curr_file_progress)
-        self.curr_file.set('Mapping destination BIDS structure...')
+                             file_name_tracker=self.file_name_progress,
+                             file_num_tracker=self.file_num_progress,
+                             file_prog_tracker=self.file_progress,
+                             workers=max(self.workers.get(), 1),
+                             algorithm=self.algorithm.get(),
+                             journal=journal,
+                             checksum=self.checksum.get(),
+                             manifest=manifest,
+                             verify_window=VERIFY_WINDOW,
+                             stats=self.src_stats)
+        t_start = perf_counter()
+        self.file_name_progress.set('Mapping destination BIDS structure...')
         dst_folder = BIDSTree(self.dst)
+        src_paths = [src.path for src in self.srcs]
         for src in self.srcs:
             dst_folder.add(src, copier=copy_func.copy_files)
             if self.set_copied:
                 self._rename_complete(src)
-        self.transferred_count.set(self.file_count)
-        self.curr_file.set('Complete!')
+        # everything has been copied so there is nothing left to resume
+        journal.clear(self.dst)
+        # the scan will almost always have finished before the copy
+        self.scan_done.wait()
+        self.file_num_progress.set(self.file_count)
+        if copy_func.skipped:
+            self.file_name_progress.set(
+                'Complete! {0} unchanged files ({1}) were skipped.'.format(
+                    len(copy_func.skipped),
+                    get_fsize(copy_func.skipped_bytes)))
+        else:
+            self.file_name_progress.set('Complete!')
+        # record how the data was transferred
+        write_log([{'files': self.file_count,
+                    'bytes': self.total_bytes,
+                    'time': perf_counter() - t_start,
+                    'verified': copy_func.verify,
+                    'algorithm': (copy_func.algorithm if copy_func.verify else
+                                  None),
+                    'workers': copy_func.workers,
+                    'skipped': len(copy_func.skipped),
+                    'skipped_bytes': copy_func.skipped_bytes}],
+                  log_name=TRANSFER_LOG, srcs=src_paths, dst=self.dst)
+
+    @threaded
+    def _scan(self):
+        """Count the files to be transferred and their total size."""
+        try:
+            for src in self.srcs:
+                for entry in scandir_files(src.path):
+                    if self._closing:
+                        return
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    self.src_stats[entry.path] = stat
+                    self.file_count += 1
+                    self.total_bytes += stat.st_size
+                    self._publish_scan(scanning=True)
+            self._publish_scan()
+            self.file_num_progress.max = self.file_count
+        finally:
+            self.scan_done.set()
+
+    def _publish_scan(self, scanning=False):
+        """Publish the current results of the scan to be shown."""
+        suffix = ' (scanning...)' if scanning else ''
+        self.file_count_progress.set(
+            "Number of files: {0}{1}".format(self.file_count, suffix))
+        self.total_size_progress.set(
+            "Total file size: {0}{1}".format(get_fsize(self.total_bytes),
+                                             suffix))
+
+    @threaded
+    def _check_archive(self):
+        """Check the data at the destination against the checksum manifest
+        written when it was transferred."""
+        manifest = ChecksumManifest(self.dst)
+        # don't let the scan change the progress bar while checking
+        self.scan_done.wait()
+        if not manifest.entries:
+            self.file_name_progress.set('No checksums have been recorded '
+                                        'for the destination.')
+            return
+        self.file_num_progress.set(0)
+        self.file_num_progress.max = len(manifest.entries)
+        results = manifest.verify(workers=max(self.workers.get(), 1),
+                                  file_name_tracker=self.file_name_progress,
+                                  file_num_tracker=self.file_num_progress)
+        for fpath in results['missing']:
+            logging.warning("{0} is missing from {1}".format(fpath, self.dst))
+        for fpath in results['changed']:
+            logging.warning("{0} in {1} doesn't match its recorded "
+                            "checksum".format(fpath, self.dst))
+        self.file_name_progress.set(
+            '{0} files ok, {1} missing, {2} changed.'.format(
+                results['ok'], len(results['missing']),
+                len(results['changed'])))
 
     def _rename_complete(self, src):
         """Rename the folder to have `_copied` appended to the name.
@@ -157,25 +319,24 @@ class SendFilesWindow(Toplevel):
         ----------
         src : Instance of bidshandler.(BIDSTree, Project, Subject, Setting)"""
         if not src.path.endswith('_copied'):
-            fname = op.basename(src.path)
             new_path = "{0}_copied".format(src.path)
+            # find the branch in the filetree before the folder is moved
+            try:
+                sid = self.master.file_treeview.sid_from_filepath(src.path)
+            except KeyError:
+                sid = None
             os.rename(src.path, new_path)
             # fix the path in the BIDSTree object also
             if isinstance(src, BIDSTree):
                 src.path = new_path
-            # also rename the branch in the filetree
-            sid = self.master.file_treeview.sid_from_text(fname)
-            self.master.file_treeview.item(sid[0],
-                                           text="{0}_copied".format(fname))
-            # the hidden filepath value also needs to be updated
-            new_vals = list(self.master.file_treeview.item(sid[0])['values'])
-            new_vals[1] = new_path
-            self.master.file_treeview.item(sid[0], values=new_vals)
-
-    def _update_file_progress(self):
-        self.file_prog.config(maximum=self.curr_file_progress.max)
+            # also rename the branch (and the paths of its contents) in the
+            # filetree
+            if sid is not None:
+                self.master.file_treeview.rename(sid, new_path)
 
     def _exit(self):
+        self._closing = True
+        self.sampler.stop()
         self.withdraw()
         self.update_idletasks()
         self.master.focus_set()
@@ -1,11 +1,12 @@
 from tkinter import Toplevel, StringVar, BooleanVar, IntVar, DISABLED, NORMAL
 from tkinter import Button as tkButton
-from tkinter.ttk import Frame, Label, Button, Checkbutton, Entry
+from tkinter.ttk import Frame, Label, Button, Checkbutton, Entry, Combobox
 import os.path as op
 import pickle
 from PIL import Image, ImageTk
 
 from Biscuit.utils.constants import OSCONST
+from Biscuit.utils.copyutils import STRATEGIES
 from Biscuit.CustomWidgets.InfoEntries import ValidatedEntry
 from Biscuit.Management.wckToolTips import ToolTipManager
 
@@ -43,6 +44,16 @@ class SettingsWindow(Toplevel):
         self.archive_path = StringVar(
             value=self.settings.get('ARCHIVE_PATH', None))
         self.chunk_freq = IntVar(value=self.settings.get('CHUNK_FREQ', 14))
+        self.convert_workers = IntVar(
+            value=self.settings.get('CONVERT_WORKERS', 1))
+        self.convert_memory = IntVar(
+            value=self.settings.get('CONVERT_MEMORY', 0))
+        self.output_strategy = StringVar(
+            value=self.settings.get('OUTPUT_STRATEGY', 'auto'))
+        self.convert_concurrent = IntVar(
+            value=self.settings.get('CONVERT_CONCURRENT', 1))
+        self.lazy_tree = BooleanVar(
+            value=self.settings.get('LAZY_TREE', False))
 
         self._create_widgets()
 
@@ -122,9 +133,75 @@ class SettingsWindow(Toplevel):
         unlock_archive_btn.grid(column=3, row=2, rowspan=2, padx=2,
                                 sticky='nsew')
 
+        workers_lbl = Label(frame, text='Conversion processes:')
+        workers_lbl.grid(column=0, row=4, sticky='ew')
+        ttm.register(workers_lbl,
+                     'The number of processes used to write the files of a '
+                     'session to BIDS format at the same time.\nA value of 1 '
+                     'will write each file one after the other.')
+        self.workers_entry = ValidatedEntry(
+            frame,
+            textvariable=self.convert_workers,
+            force_dtype='int',
+            highlightbackground=OSCONST.ENTRY_HLBG)
+        self.workers_entry.grid(column=1, row=4, columnspan=2, sticky='ew',
+                                padx=2)
+
+        memory_lbl = Label(frame, text='Conversion memory limit:')
+        memory_lbl.grid(column=0, row=5, sticky='ew')
+        ttm.register(memory_lbl,
+                     'The maximum amount of memory to be used by the files '
+                     'being written at the same time.\nIf this is set the '
+                     'data of each file is also released as soon as it has '
+                     'been written.\nA value of 0 means there is no limit.')
+        self.memory_entry = ValidatedEntry(
+            frame,
+            textvariable=self.convert_memory,
+            force_dtype='int',
+            highlightbackground=OSCONST.ENTRY_HLBG)
+        self.memory_entry.grid(column=1, row=5, padx=2, sticky='ew')
+        mb_lbl = Label(frame, text='(MB)')
+        mb_lbl.grid(column=2, row=5, sticky='e')
+
+        strategy_lbl = Label(frame, text='File copy method:')
+        strategy_lbl.grid(column=0, row=6, sticky='ew')
+        ttm.register(strategy_lbl,
+                     'The method used to copy files when converting data.\n'
+                     '"auto" tries a copy-on-write reflink, then copying '
+                     'within the\noperating system, and finally a normal '
+                     'copy.')
+        strategy_box = Combobox(frame, textvariable=self.output_strategy,
+                                values=['auto'] + STRATEGIES,
+                                state='readonly')
+        strategy_box.grid(column=1, row=6, columnspan=2, sticky='ew', padx=2)
+
+        concurrent_lbl = Label(frame, text='Simultaneous conversions:')
+        concurrent_lbl.grid(column=0, row=7, sticky='ew')
+        ttm.register(concurrent_lbl,
+                     'The number of sessions in the conversion queue which '
+                     'can be converted at the same time.\nSessions in the '
+                     'same project are always converted one at a time.')
+        self.concurrent_entry = ValidatedEntry(
+            frame,
+            textvariable=self.convert_concurrent,
+            force_dtype='int',
+            highlightbackground=OSCONST.ENTRY_HLBG)
+        self.concurrent_entry.grid(column=1, row=7, columnspan=2,
+                                   sticky='ew', padx=2)
+
+        lazy_lbl = Label(frame, text='Load folders when opened:')
+        lazy_lbl.grid(column=0, row=8, sticky='ew')
+        ttm.register(lazy_lbl,
+                     'Only list the contents of each folder in the file '
+                     'tree when it is opened.\nThis makes Biscuit start much '
+                     'faster when the data folder contains many files.\n'
+                     'Biscuit needs to be restarted for this to take effect.')
+        lazy_chk = Checkbutton(frame, variable=self.lazy_tree)
+        lazy_chk.grid(column=1, row=8, columnspan=2, sticky='w', padx=2)
+
         exit_btn = Button(frame, text='Save and Exit',
                           command=self.save_and_exit)
-        exit_btn.grid(column=0, row=4)
+        exit_btn.grid(column=0, row=9)
 
         frame.grid_columnconfigure(0, weight=0)
         frame.grid_columnconfigure(1, weight=1)
@@ -154,5 +231,11 @@ class SettingsWindow(Toplevel):
         self.settings['ARCHIVE_PATH'] = self.archive_path.get()
         self.settings['CHUNK_FREQ'] = self.chunk_freq.get()
         self.settings['PROJ_ROWS'] = self.proj_lines.get()
+        self.settings['CONVERT_WORKERS'] = max(self.convert_workers.get(), 1)
+        self.settings['CONVERT_MEMORY'] = max(self.convert_memory.get(), 0)
+        self.settings['OUTPUT_STRATEGY'] = self.output_strategy.get()
+        self.settings['CONVERT_CONCURRENT'] = max(
+            self.convert_concurrent.get(), 1)
+        self.settings['LAZY_TREE'] = self.lazy_tree.get()
         with open(self.settings_file, 'wb') as settings:
             pickle.dump(self.settings, settings)
@@ -6,4 +6,5 @@ from .CreditsPopup import CreditsPopup  # noqa
 from .SettingsWindow import SettingsWindow  # noqa
 from .SendFilesWindow import SendFilesWindow  # noqa
 from .AuthPopup import AuthPopup  # noqa
+from .QueueWindow import QueueWindow  # noqa
 from .MainWindow import MainWindow  # noqa
\ No newline at end of file
@@ -0,0 +1,10 @@
+import sys
+
+from Biscuit import run
+
+if len(sys.argv) > 1 and sys.argv[1] == 'convert':
+    # headless batch conversion
+    from Biscuit.Management.BatchConvert import main
+    sys.exit(main(sys.argv[2:]))
+else:
+    run()
@@ -0,0 +1,194 @@
+import os
+import os.path as op
+
+import pytest
+
+from Biscuit.utils.BIDSCopy import BIDSCopy, batch_files, SMALL_FILE_SIZE
+from Biscuit.utils.transferjournal import TransferJournal
+
+
+class Tracker():
+    def __init__(self, value=0):
+        self.value = value
+        self.max = 0
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def _make_files(folder, sizes):
+    fnames = []
+    for i, size in enumerate(sizes):
+        fname = op.join(folder, 'sub-1', 'file{0}.dat'.format(i))
+        os.makedirs(op.dirname(fname), exist_ok=True)
+        with open(fname, 'wb') as f:
+            f.write(os.urandom(size))
+        fnames.append(fname)
+    return fnames
+
+
+def test_batch_files(tmpdir):
+    sizes = [10] * 5 + [SMALL_FILE_SIZE + 1] + [10] * 2
+    srcs = _make_files(str(tmpdir), sizes)
+    batches = batch_files(srcs, srcs, max_files=3)
+    assert [len(batch) for batch in batches] == [3, 1, 3, 1]
+    assert batches[1] == [(srcs[5], srcs[5])]
+
+
+def test_copy_files_parallel(tmpdir):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    sizes = [100] * 20 + [2 * SMALL_FILE_SIZE] * 3
+    srcs = _make_files(src_folder, sizes)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    count = Tracker()
+    copier = BIDSCopy(verify=True, file_name_tracker=Tracker(''),
+                      file_num_tracker=count, file_prog_tracker=Tracker(),
+                      workers=4)
+    copier.copy_files(srcs, dsts)
+    assert count.get() == len(srcs)
+    for src, dst in zip(srcs, dsts):
+        with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+            assert fsrc.read() == fdst.read()
+
+
+def test_copy_files_journal(tmpdir):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs = _make_files(src_folder, [100] * 4)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    journal = TransferJournal(op.join(str(tmpdir), 'journal.json'))
+    BIDSCopy(verify=True, journal=journal).copy_files(srcs[:2], dsts[:2])
+    # files in the journal aren't copied again
+    mtime = os.stat(dsts[0]).st_mtime_ns
+    count = Tracker()
+    journal = TransferJournal(op.join(str(tmpdir), 'journal.json'))
+    BIDSCopy(verify=True, file_num_tracker=count,
+             journal=journal).copy_files(srcs, dsts)
+    assert count.get() == 4
+    assert os.stat(dsts[0]).st_mtime_ns == mtime
+    for src, dst in zip(srcs, dsts):
+        with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+            assert fsrc.read() == fdst.read()
+    # even when overwriting, only the files which aren't complete in the
+    # journal are copied
+    journal.discard(dsts[3])
+    copier = BIDSCopy(overwrite=True, verify=True, journal=journal)
+    copier.copy_files(srcs, dsts)
+    assert copier.skipped == srcs[:3]
+    assert os.stat(dsts[0]).st_mtime_ns == mtime
+    assert journal.is_complete(srcs[3], dsts[3])
+
+
+def test_copy_files_sync(tmpdir):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs = _make_files(src_folder, [100] * 3)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    BIDSCopy(verify=False).copy_files(srcs[:2], dsts[:2])
+    # change the size of one file and the contents of another
+    with open(srcs[0], 'ab') as f:
+        f.write(b'new data')
+    with open(dsts[1], 'r+b') as f:
+        f.write(b'corrupt')
+    copier = BIDSCopy(verify=False)
+    copier.copy_files(srcs, dsts)
+    assert copier.skipped == [srcs[1]]
+    assert copier.skipped_bytes == 100
+    # comparing checksums finds the changed contents
+    copier = BIDSCopy(verify=False, checksum=True)
+    copier.copy_files(srcs, dsts)
+    assert sorted(copier.skipped) == [srcs[0], srcs[2]]
+    for src, dst in zip(srcs, dsts):
+        with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+            assert fsrc.read() == fdst.read()
+    # forcing copies everything
+    copier = BIDSCopy(overwrite=True, verify=False)
+    copier.copy_files(srcs, dsts)
+    assert copier.skipped == []
+
+
+class CorruptingCopy(BIDSCopy):
+    """Copier which corrupts the first `corrupt` copies of each file."""
+    def __init__(self, corrupt, **kwargs):
+        super(CorruptingCopy, self).__init__(**kwargs)
+        self.corrupt = corrupt
+        self.copies = dict()
+
+    def _copy_data(self, src, dst, tracker):
+        file_hash = super(CorruptingCopy, self)._copy_data(src, dst, tracker)
+        self.copies[src] = self.copies.get(src, 0) + 1
+        if self.copies[src] <= self.corrupt:
+            with open(dst, 'r+b') as f:
+                f.write(b'corrupt')
+        return file_hash
+
+
+@pytest.mark.parametrize('verify_window', [0, 2])
+def test_copy_files_retry(tmpdir, verify_window):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs = _make_files(src_folder, [100] * 5)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    count = Tracker()
+    copier = CorruptingCopy(1, file_num_tracker=count,
+                            verify_window=verify_window)
+    copier.copy_files(srcs, dsts)
+    assert count.get() == len(srcs)
+    assert all(num == 2 for num in copier.copies.values())
+    for src, dst in zip(srcs, dsts):
+        with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+            assert fsrc.read() == fdst.read()
+    # files which fail twice raise an error
+    copier = CorruptingCopy(2, overwrite=True, verify_window=verify_window)
+    with pytest.raises(ValueError):
+        copier.copy_files(srcs, dsts)
+
+
+@pytest.mark.parametrize('checkpoint_size', [1000, 10 ** 9])
+def test_copy_files_journal_retry(tmpdir, monkeypatch, checkpoint_size):
+    # files larger than the checkpoint size are copied resumably
+    monkeypatch.setattr('Biscuit.utils.BIDSCopy.CHECKPOINT_SIZE',
+                        checkpoint_size)
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs = _make_files(src_folder, [2000] * 2)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    fname = op.join(str(tmpdir), 'journal.json')
+    # files which haven't been verified yet aren't complete
+    copier = BIDSCopy(verify=True, journal=TransferJournal(fname))
+    os.makedirs(op.dirname(dsts[0]))
+    copier._copy_data(srcs[0], dsts[0], None)
+    assert not copier.journal.is_complete(srcs[0], dsts[0])
+    # files which fail twice aren't recorded as copied
+    copier = CorruptingCopy(2, overwrite=True, journal=TransferJournal(fname))
+    with pytest.raises(ValueError):
+        copier.copy_files(srcs, dsts)
+    journal = TransferJournal(fname)
+    assert not any(journal.is_complete(src, dst) for src, dst in
+                   zip(srcs, dsts))
+    copier = BIDSCopy(verify=True, checksum=True, journal=journal)
+    copier.copy_files(srcs, dsts)
+    assert copier.skipped == []
+    for src, dst in zip(srcs, dsts):
+        with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+            assert fsrc.read() == fdst.read()
+        assert journal.is_complete(src, dst)
+
+
+def test_copy_files_stats(tmpdir):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs = _make_files(src_folder, [100] * 2)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    # the stats are shared with a scan which may not have found any files
+    # when the copier is created
+    stats = dict()
+    copier = BIDSCopy(verify=False, stats=stats)
+    assert copier.stats is stats
+    stats.update((src, os.stat(src)) for src in srcs)
+    copier.copy_files(srcs, dsts)
+    assert copier._src_stat(srcs[0]) is stats[srcs[0]]
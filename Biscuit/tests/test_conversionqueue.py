@@ -0,0 +1,65 @@
+import os.path as op
+from threading import Event
+import time
+
+from Biscuit.Management.ConversionQueue import (ConversionQueue, EntryStatus,
+                                                QUEUED, RUNNING, DONE, FAILED,
+                                                CANCELLED)
+
+
+def _wait_for(queue, status, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        if all(entry['status'] in status for entry in queue.snapshot()):
+            return
+        time.sleep(0.01)
+    raise TimeoutError
+
+
+def test_ConversionQueue(tmpdir):
+    fname = op.join(str(tmpdir), 'queue.pkl')
+    release = Event()
+    started = []
+
+    def runner(entry, status):
+        started.append(entry['path'])
+        status.set('converting')
+        EntryStatus(status.queue, entry, key='timings').set('stage: 1s')
+        release.wait(5)
+        if entry['path'] == 'bad':
+            raise ValueError('bad data')
+
+    queue = ConversionQueue(fname, runner, max_running=2)
+    a = queue.submit('a', 'proj1', 'A')
+    b = queue.submit('b', 'proj1', 'B')
+    c = queue.submit('c', 'proj2', 'C')
+    d = queue.submit('bad', 'proj3', 'D')
+    # submitting a queued container again doesn't add it twice
+    assert queue.submit('a', 'proj1', 'A') == a
+    # nothing is run until the queue is started
+    assert [e['status'] for e in queue.snapshot()] == [QUEUED] * 4
+    queue.move(d, -3)
+    assert [e['id'] for e in queue.snapshot()] == [d, a, b, c]
+    assert queue.cancel(c)
+    assert queue.snapshot()[-1]['status'] == CANCELLED
+
+    # the saved queue is resumed
+    queue = ConversionQueue(fname, runner, max_running=2)
+    queue.load()
+    assert [e['id'] for e in queue.snapshot()] == [d, a, b]
+    queue.start()
+    time.sleep(0.1)
+    statuses = {e['id']: e['status'] for e in queue.snapshot()}
+    # 'b' has the same target as 'a' so has to wait
+    assert statuses == {d: RUNNING, a: RUNNING, b: QUEUED}
+    assert not queue.cancel(a)
+    release.set()
+    _wait_for(queue, (DONE, FAILED))
+    statuses = {e['id']: e for e in queue.snapshot()}
+    assert statuses[d]['status'] == FAILED
+    assert statuses[d]['message'] == 'bad data'
+    assert statuses[b]['status'] == DONE
+    assert statuses[b]['timings'] == 'stage: 1s'
+    assert sorted(started) == ['a', 'b', 'bad']
+    queue.clear_finished()
+    assert queue.snapshot() == []
@@ -0,0 +1,105 @@
+import os
+import os.path as op
+
+import pytest
+
+from Biscuit.utils.copyutils import clone, copy, copydata, STRATEGIES
+from Biscuit.utils.hashing import ALGORITHMS, hash_file
+
+
+@pytest.mark.parametrize('strategy', ['auto'] + STRATEGIES)
+def test_copy_strategy(tmpdir, strategy):
+    src = op.join(str(tmpdir), 'src.bin')
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    with open(src, 'wb') as f:
+        f.write(data)
+    methods = []
+    dst, file_hash = copy(src, op.join(str(tmpdir), 'dst.bin'),
+                          strategy=strategy, verify=True,
+                          report=lambda s, d, method: methods.append(method))
+    with open(dst, 'rb') as f:
+        assert f.read() == data
+    # unsupported methods fall back to a buffered copy
+    assert methods[0] in STRATEGIES
+    if strategy == 'buffered':
+        assert methods == ['buffered']
+    assert len(file_hash.hexdigest()) == 32
+
+
+@pytest.mark.parametrize('algorithm', list(ALGORITHMS))
+def test_copy_algorithm(tmpdir, algorithm):
+    src = op.join(str(tmpdir), 'src.bin')
+    with open(src, 'wb') as f:
+        f.write(os.urandom(2 * 1024 * 1024 + 3))
+    dst, file_hash = copy(src, op.join(str(tmpdir), 'dst.bin'), verify=True,
+                          algorithm=algorithm)
+    assert file_hash.hexdigest() == hash_file(dst, algorithm).hexdigest()
+    assert file_hash.hexdigest() == hash_file(src, algorithm).hexdigest()
+
+
+def test_copydata_progress(tmpdir):
+    src = op.join(str(tmpdir), 'src.bin')
+    with open(src, 'wb') as f:
+        f.write(os.urandom(3 * 1024 * 1024))
+    values = []
+
+    class Tracker():
+        max = 3 * 1024 * 1024
+
+        def set(self, value):
+            values.append(value)
+
+    with open(src, 'rb') as fsrc:
+        with open(op.join(str(tmpdir), 'dst.bin'), 'wb') as fdst:
+            method = copydata(fsrc, fdst, strategy='copy_file_range',
+                              tracker=Tracker(), kernel_length=1024 * 1024)
+    # progress is reported for each chunk whichever method was used
+    assert method in ('copy_file_range', 'buffered')
+    assert len(values) >= 4
+    assert values[-1] == Tracker.max
+
+
+@pytest.mark.parametrize('strategy', ['copy_file_range', 'sendfile'])
+def test_copydata_short(tmpdir, monkeypatch, strategy):
+    src = op.join(str(tmpdir), 'src.bin')
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    with open(src, 'wb') as f:
+        f.write(data)
+    calls = []
+
+    def copy_file_range(in_fd, out_fd, count):
+        # stop (without an error) after the first chunk, as some file
+        # systems do
+        calls.append(count)
+        if len(calls) > 1:
+            return 0
+        return os.write(out_fd, os.read(in_fd, count))
+
+    def sendfile(out_fd, in_fd, offset, count):
+        return copy_file_range(in_fd, out_fd, count)
+    monkeypatch.setattr(os, 'copy_file_range', copy_file_range,
+                        raising=False)
+    monkeypatch.setattr(os, 'sendfile', sendfile, raising=False)
+    dst = op.join(str(tmpdir), 'dst.bin')
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            method = copydata(fsrc, fdst, strategy=strategy,
+                              kernel_length=1024 * 1024)
+    assert method == strategy
+    assert len(calls) == 2
+    with open(dst, 'rb') as f:
+        assert f.read() == data
+
+
+def test_clone(tmpdir):
+    src = op.join(str(tmpdir), 'src.bin')
+    dst = op.join(str(tmpdir), 'dst.bin')
+    with open(src, 'wb') as f:
+        f.write(os.urandom(1024 * 1024))
+    with open(dst, 'wb') as f:
+        f.write(b'\x00' * 10)
+    cloned = clone(src, dst)
+    # if reflinks aren't supported the destination isn't touched
+    with open(src, 'rb') as f_src, open(dst, 'rb') as f_dst:
+        assert (f_src.read() == f_dst.read()) == cloned
+    assert not op.exists(dst + '_temp')
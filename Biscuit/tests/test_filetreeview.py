@@ -0,0 +1,230 @@
+import os
+import os.path as op
+from tkinter import Tk, TclError
+
+import pytest
+
+from Biscuit.CustomWidgets.FileTreeview import FileTreeview
+
+
+@pytest.fixture
+def master():
+    try:
+        master = Tk()
+    except TclError:
+        pytest.skip('No display available')
+    master.withdraw()
+    yield master
+    master.destroy()
+
+
+def _make_files(root, fnames):
+    for fname in fnames:
+        fpath = op.join(root, fname)
+        os.makedirs(op.dirname(fpath), exist_ok=True)
+        with open(fpath, 'w'):
+            pass
+
+
+def _make_tree(master, root, **kwargs):
+    tree = FileTreeview(master, root, columns=['dtype', 'filepath'],
+                        **kwargs)
+    tree.generate('', root)
+    tree.index()
+    return tree
+
+
+def test_sid_from_filepath_lazy(master, tmpdir):
+    root = str(tmpdir)
+    _make_files(root, [op.join('sub-1', 'ses-1', 'meg', 'run-1_meg.con'),
+                       op.join('sub-2', 'a.txt')])
+    tree = _make_tree(master, root, lazy=True, watch=False)
+    folder = op.join(root, 'sub-1', 'ses-1')
+    fpath = op.join(folder, 'meg', 'run-1_meg.con')
+    # only the contents of the root have been listed
+    assert op.join(root, 'sub-1') in tree.index_cache
+    assert folder not in tree.index_cache
+    # the folders containing the file are loaded to find it
+    sid = tree.sid_from_filepath(fpath)
+    assert tree.get_filepath(sid) == fpath
+    assert tree.get_text(sid) == 'run-1_meg'
+    assert tree.parent(sid) == tree.sid_from_filepath(op.dirname(fpath))
+    # the folders which weren't needed are still unloaded
+    assert op.join(root, 'sub-2', 'a.txt') not in tree.index_cache
+    with pytest.raises(KeyError):
+        tree.sid_from_filepath(op.join(folder, 'missing.fif'))
+    tree.destroy()
+
+
+def _child_texts(tree, parent=''):
+    return [tree.get_text(sid) for sid in tree.get_children(parent)]
+
+
+def test_ordered_insert(master, tmpdir):
+    root = str(tmpdir)
+    _make_files(root, [op.join('beta', 'x.txt'), op.join('Delta', 'x.txt'),
+                       'b.txt', 'C.json'])
+    tree = _make_tree(master, root, watch=False)
+    # folders are above the files and each are sorted ignoring case
+    assert _child_texts(tree) == ['beta', 'Delta', 'b', 'C']
+    for name, folder in [('alpha', True), ('Charlie', True),
+                         ('epsilon', True), ('a', False), ('B', False),
+                         ('d', False), ('A.b', False)]:
+        fpath = op.join(root, name)
+        if folder:
+            text, ext = name, ''
+        else:
+            text, ext = op.splitext(name)
+        # the folder argument means the path doesn't need to exist
+        sid = tree.ordered_insert('', values=[ext, fpath], text=text,
+                                  open=False, folder=folder)
+        assert tree.sid_from_filepath(fpath) == sid
+    assert _child_texts(tree) == ['alpha', 'beta', 'Charlie', 'Delta',
+                                  'epsilon', 'a', 'A', 'b', 'B', 'C', 'd']
+    # items can also be inserted into a folder
+    folder = tree.sid_from_filepath(op.join(root, 'beta'))
+    tree.ordered_insert(folder, values=['.txt', op.join(root, 'beta', 'a')],
+                        text='a', open=False, folder=False)
+    assert _child_texts(tree, folder) == ['a', 'x']
+    with pytest.raises(ValueError):
+        tree.ordered_insert('', values=['', op.join(root, 'z')])
+    tree.destroy()
+
+
+def _indexed_paths(tree):
+    """Return the paths of the items in the tree, checking that every index
+    agrees with the treeview."""
+    paths = set()
+    sids = [sid for sid in tree.all_children() if sid != '']
+    assert set(tree._items) == set(sids)
+    for sid in sids:
+        fpath, _, text = tree._items[sid]
+        assert tree.index_cache[fpath] == sid
+        assert sid in tree._text_index[text]
+        assert tree._parents[sid] == tree.parent(sid)
+        assert sid in tree._children[tree.parent(sid)]
+        paths.add(fpath)
+    assert set(tree.index_cache) == paths | {tree.root_path}
+    assert sum(len(sids) for sids in tree._text_index.values()) == len(sids)
+    return paths
+
+
+def test_rename(master, tmpdir):
+    root = str(tmpdir)
+    _make_files(root, [op.join('sub-1', 'meg', 'run-1_meg.con'),
+                       op.join('sub-1', 'sub-1_scans.tsv'),
+                       op.join('sub-2', 'a.txt')])
+    tree = _make_tree(master, root, watch=False)
+    old_folder = op.join(root, 'sub-1')
+    new_folder = op.join(root, 'sub-3')
+    os.rename(old_folder, new_folder)
+    sid = tree.sid_from_filepath(old_folder)
+    tree.rename(sid, new_folder)
+    assert tree.get_text(sid) == 'sub-3'
+    assert tree.sid_from_text('sub-3') == [sid]
+    assert tree.sid_from_text('sub-1') == []
+    # the folder is moved to keep the children sorted
+    assert _child_texts(tree) == ['sub-2', 'sub-3']
+    fpath = op.join(new_folder, 'meg', 'run-1_meg.con')
+    assert tree.get_filepath(tree.sid_from_filepath(fpath)) == fpath
+    assert not any(path.startswith(old_folder) for path in
+                   tree.index_cache)
+    # renaming a file changes its text and extension
+    new_fpath = op.join(new_folder, 'meg', 'run-2_meg.fif')
+    os.rename(fpath, new_fpath)
+    file_sid = tree.sid_from_filepath(fpath)
+    tree.rename(file_sid, new_fpath)
+    assert tree.sid_from_text('run-2_meg') == [file_sid]
+    assert tree.sid_from_text('run-1_meg') == []
+    assert tree.item(file_sid)['values'][0] == '.fif'
+    fresh = _make_tree(master, root, watch=False)
+    assert _indexed_paths(tree) == _indexed_paths(fresh)
+    fresh.destroy()
+    tree.destroy()
+
+
+def test_delete(master, tmpdir):
+    root = str(tmpdir)
+    _make_files(root, [op.join('sub-1', 'meg', 'run-1_meg.con'),
+                       op.join('sub-1', 'meg', 'run-2_meg.con'),
+                       op.join('sub-2', 'meg', 'run-1_meg.con')])
+    tree = _make_tree(master, root, watch=False)
+    folder = op.join(root, 'sub-1')
+    sid = tree.sid_from_filepath(folder)
+    removed = list(tree.all_children(sid))
+    tree.delete(sid)
+    for removed_sid in removed:
+        assert removed_sid not in tree._items
+        assert removed_sid not in tree._parents
+        assert removed_sid not in tree._children
+        assert all(removed_sid not in sids for sids in
+                   tree._text_index.values())
+    assert not any(path.startswith(folder) for path in tree.index_cache)
+    # the item with the same text in the other folder is still found
+    assert len(tree.sid_from_text('run-1_meg', _all=True)) == 1
+    assert tree.sid_from_text('run-2_meg') == []
+    assert _child_texts(tree) == ['sub-2']
+    _indexed_paths(tree)
+    # new items are still inserted in order
+    tree.ordered_insert('', values=['', folder], text='sub-1', open=False,
+                        folder=True)
+    assert _child_texts(tree) == ['sub-1', 'sub-2']
+    tree.destroy()
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.parametrize('watch', [False, True])
+def test_refresh(master, tmpdir, lazy, watch):
+    root = str(tmpdir)
+    _make_files(root, [op.join('sub-1', 'meg', 'run-1_meg.con'),
+                       op.join('sub-1', 'meg', 'run-2_meg.con'),
+                       op.join('sub-2', 'a.txt')])
+    tree = _make_tree(master, root, lazy=lazy, watch=watch)
+    meg = op.join(root, 'sub-1', 'meg')
+    # load the folder in lazy mode
+    tree.sid_from_filepath(op.join(meg, 'run-1_meg.con'))
+    assert tree.refresh() == []
+    _make_files(root, [op.join(meg, 'run-3_meg.con'), 'b.txt'])
+    os.remove(op.join(meg, 'run-1_meg.con'))
+    added = tree.refresh()
+    assert sorted(tree.get_filepath(sid) for sid in added) == [
+        op.join(root, 'b.txt'), op.join(meg, 'run-3_meg.con')]
+    assert op.join(meg, 'run-1_meg.con') not in tree.index_cache
+    assert _child_texts(tree, tree.sid_from_filepath(meg)) == [
+        'run-2_meg', 'run-3_meg']
+    assert _child_texts(tree) == ['sub-1', 'sub-2', 'b']
+    if not lazy:
+        fresh = _make_tree(master, root, watch=False)
+        assert _indexed_paths(tree) == _indexed_paths(fresh)
+        fresh.destroy()
+    else:
+        _indexed_paths(tree)
+    tree.destroy()
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.parametrize('watch', [False, True])
+def test_refresh_new_folder(master, tmpdir, lazy, watch):
+    root = str(tmpdir)
+    _make_files(root, [op.join('sub-1', 'a.txt')])
+    tree = _make_tree(master, root, lazy=lazy, watch=watch)
+    folder = op.join(root, 'sub-1', 'ses-1')
+    tree.sid_from_filepath(op.join(root, 'sub-1', 'a.txt'))
+    fnames = [op.join(folder, 'meg', 'run-1_meg.con'),
+              op.join(folder, 'sub-1_scans.tsv')]
+    _make_files(root, fnames)
+    added = tree.refresh()
+    sid = tree.sid_from_filepath(folder)
+    assert sid in added
+    assert tree.parent(sid) == tree.sid_from_filepath(op.dirname(folder))
+    # the contents are found straight away, or once loaded if lazy
+    for fname in fnames:
+        assert tree.get_filepath(tree.sid_from_filepath(fname)) == fname
+    assert _child_texts(tree, sid) == ['meg', 'sub-1_scans']
+    # files added to the new folders later are also found
+    new_fname = op.join(folder, 'meg', 'run-2_meg.con')
+    _make_files(root, [new_fname])
+    added = tree.refresh()
+    assert [tree.get_filepath(sid) for sid in added] == [new_fname]
+    _indexed_paths(tree)
+    tree.destroy()
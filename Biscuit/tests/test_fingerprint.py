@@ -0,0 +1,88 @@
+import os.path as op
+
+from Biscuit.utils.fingerprint import (ConversionManifest, file_signature,
+                                      job_fingerprint)
+
+
+def test_file_signature(tmp_path):
+    fname = str(tmp_path / 'data.con')
+    with open(fname, 'wb') as f:
+        f.write(b'\x00' * 100)
+    sig = file_signature(fname)
+    assert sig[1] == 100
+    assert file_signature(fname) == sig
+    with open(fname, 'wb') as f:
+        f.write(b'\x01' * 100)
+    assert file_signature(fname) != sig
+
+
+def test_ConversionManifest(tmp_path):
+    folder = str(tmp_path)
+    with open(op.join(folder, 'sub-1_meg.json'), 'w') as f:
+        f.write('{}')
+    manifest = ConversionManifest(folder)
+    assert not manifest.is_current('sub-1', 'abc')
+    manifest.update('sub-1', 'abc', ['sub-1_meg.json'])
+    manifest.save()
+
+    manifest = ConversionManifest(folder)
+    assert manifest.is_current('sub-1', 'abc')
+    assert not manifest.is_current('sub-1', 'def')
+    # missing output files mean the job needs to be converted again
+    manifest.update('sub-1', 'abc', ['sub-1_meg.json', 'sub-1_meg.con'])
+    assert not manifest.is_current('sub-1', 'abc')
+
+
+class Var():
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeFIFData():
+    """The parts of a FIFData used to fingerprint it. A FIFData is its own
+    container and has no marker coil files."""
+    def __init__(self, fname):
+        self.file = fname
+        self.hpi = None
+        self.run = Var('1')
+        self.task = Var('rest')
+        self.is_junk = Var(False)
+        self.is_empty_room = Var(False)
+        self.has_empty_room = Var(True)
+        self.extra_data = dict()
+        self.channel_info = {0: {'ch_name': Var('STI001'),
+                                 'ch_type': Var('stim')}}
+        self.event_info = [{'event': Var('1'), 'description': Var('start')}]
+        self.proj_name = Var('test')
+        self.session_ID = Var('1')
+        self.subject_ID = Var('01')
+        self.subject_age = [Var('01'), Var('01'), Var('1990')]
+        self.subject_gender = Var('F')
+        self.subject_group = Var('Participant')
+        self.extra_files = []
+        self.make_specific_data = dict()
+
+    def get_event_data(self):
+        return ([int(evt['event'].get()) for evt in self.event_info],
+                [evt['description'].get() for evt in self.event_info])
+
+
+def test_job_fingerprint_fif(tmp_path):
+    fname = str(tmp_path / 'data_raw.fif')
+    with open(fname, 'wb') as f:
+        f.write(b'\x00' * 100)
+    job = FakeFIFData(fname)
+    fingerprint = job_fingerprint(job, job)
+    assert job_fingerprint(job, job) == fingerprint
+    job.run.value = '2'
+    assert job_fingerprint(job, job) != fingerprint
+    job.run.value = '1'
+    job.channel_info[0]['ch_type'].value = 'misc'
+    assert job_fingerprint(job, job) != fingerprint
+    job.channel_info[0]['ch_type'].value = 'stim'
+    with open(fname, 'wb') as f:
+        f.write(b'\x01' * 100)
+    assert job_fingerprint(job, job) != fingerprint
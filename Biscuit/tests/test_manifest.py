@@ -0,0 +1,68 @@
+import os
+import os.path as op
+
+from Biscuit.utils import BIDSCopy as bidscopy
+from Biscuit.utils.BIDSCopy import BIDSCopy
+from Biscuit.utils.hashing import hash_file
+from Biscuit.utils.manifest import ChecksumManifest, MANIFEST_NAME
+
+
+def _make_files(src_folder, dst_folder):
+    srcs = []
+    for i in range(4):
+        fname = op.join(src_folder, 'sub-{0}'.format(i), 'data.dat')
+        os.makedirs(op.dirname(fname))
+        with open(fname, 'wb') as f:
+            f.write(os.urandom(1000))
+        srcs.append(fname)
+    dsts = [op.join(dst_folder, op.relpath(src, src_folder)) for src in srcs]
+    return srcs, dsts
+
+
+def test_manifest_verify(tmpdir):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs, dsts = _make_files(src_folder, dst_folder)
+    BIDSCopy(verify=False, algorithm='crc32',
+             manifest=ChecksumManifest(dst_folder)).copy_files(srcs, dsts)
+
+    manifest = ChecksumManifest(dst_folder)
+    assert sorted(manifest.entries) == ['sub-{0}/data.dat'.format(i) for i
+                                        in range(4)]
+    assert manifest.entries['sub-0/data.dat']['algorithm'] == 'crc32'
+    with open(op.join(dst_folder, '.bidsignore')) as f:
+        assert MANIFEST_NAME in f.read().splitlines()
+    assert manifest.verify(workers=2) == {'ok': 4, 'missing': [],
+                                          'changed': []}
+
+    os.remove(dsts[0])
+    with open(dsts[1], 'r+b') as f:
+        f.write(b'corrupt')
+    assert manifest.verify(workers=2) == {'ok': 2,
+                                          'missing': ['sub-0/data.dat'],
+                                          'changed': ['sub-1/data.dat']}
+
+
+def test_manifest_skipped(tmpdir, monkeypatch):
+    src_folder = op.join(str(tmpdir), 'src')
+    dst_folder = op.join(str(tmpdir), 'dst')
+    srcs, dsts = _make_files(src_folder, dst_folder)
+    BIDSCopy(verify=False).copy_files(srcs[:2], dsts[:2])
+    strategies = []
+    _copy = bidscopy.copy
+
+    def copy(*args, **kwargs):
+        strategies.append(kwargs['strategy'])
+        return _copy(*args, **kwargs)
+    monkeypatch.setattr(bidscopy, 'copy', copy)
+    copier = BIDSCopy(verify=False, strategy='sendfile',
+                      manifest=ChecksumManifest(dst_folder))
+    copier.copy_files(srcs, dsts)
+    # the files are hashed without having to be copied through python
+    assert strategies == ['sendfile'] * 2
+    # the skipped files are also recorded
+    assert copier.skipped == srcs[:2]
+    manifest = ChecksumManifest(dst_folder)
+    for dst in dsts:
+        assert (manifest.get_digest(dst, copier.algorithm) ==
+                hash_file(dst, copier.algorithm).hexdigest())
@@ -0,0 +1,56 @@
+from threading import Thread
+
+from Biscuit.utils.progress import ProgressSampler, ProgressValue
+
+
+class Variable():
+    """Stand-in for a tkinter Variable counting the updates."""
+    def __init__(self):
+        self.values = []
+
+    def set(self, value):
+        self.values.append(value)
+
+
+class Widget():
+    """Stand-in for a widget which records the scheduled callbacks."""
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+        return len(self.scheduled)
+
+    def after_cancel(self, id_):
+        self.scheduled[id_ - 1] = None
+
+
+def test_progress_sampler():
+    progress = ProgressValue(0)
+    variable = Variable()
+    maxes = []
+    widget = Widget()
+    sampler = ProgressSampler(widget)
+    sampler.bind(progress, variable, maxes.append)
+    sampler.start()
+    assert variable.values == [0]
+
+    # many updates from a worker only reach the variable when sampled
+    def _work():
+        progress.max = 1000
+        for i in range(1001):
+            progress.set(i)
+    worker = Thread(target=_work)
+    worker.start()
+    worker.join()
+    widget.scheduled[-1]()
+    assert variable.values == [0, 1000]
+    assert maxes == [0, 1000]
+    # unchanged values aren't set again
+    widget.scheduled[-1]()
+    assert variable.values == [0, 1000]
+
+    progress.set(5)
+    sampler.stop()
+    assert widget.scheduled[-1] is None
+    assert variable.values == [0, 1000, 5]
@@ -0,0 +1,32 @@
+from Biscuit.utils.rawcache import RawCache, estimate_raw_size, CHANNEL_SIZE
+
+
+class FakeRaw():
+    def __init__(self, n_chs):
+        self.info = {'chs': [dict() for _ in range(n_chs)], 'dig': None}
+
+    def copy(self):
+        return FakeRaw(len(self.info['chs']))
+
+
+def test_RawCache():
+    cache = RawCache(max_memory=10 * CHANNEL_SIZE)
+    raw = FakeRaw(4)
+    assert estimate_raw_size(raw) == 4 * CHANNEL_SIZE
+    cache.put('a', raw)
+    # copies are returned
+    assert cache.get('a') is not raw
+    assert len(cache.get('a').info['chs']) == 4
+    assert cache.get('b') is None
+    cache.put('b', FakeRaw(4))
+    # access 'a' so that 'b' is the least recently used
+    cache.get('a')
+    cache.put('c', FakeRaw(4))
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.memory == 8 * CHANNEL_SIZE
+    # too large to be cached at all
+    cache.put('d', FakeRaw(11))
+    assert 'd' not in cache
+    cache.clear()
+    assert len(cache) == 0 and cache.memory == 0
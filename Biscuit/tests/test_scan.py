@@ -0,0 +1,23 @@
+import os
+import os.path as op
+
+from Biscuit.utils.scan import scandir_files
+
+
+def test_scandir_files(tmpdir):
+    root = str(tmpdir)
+    for fname in ['a.txt', op.join('sub-1', 'b.json'),
+                  op.join('sub-1', 'meg', 'c.fif'),
+                  op.join('sub-2', 'meg', 'd.fif')]:
+        fpath = op.join(root, fname)
+        os.makedirs(op.dirname(fpath), exist_ok=True)
+        with open(fpath, 'w') as f:
+            f.write(fname)
+    os.makedirs(op.join(root, 'empty'))
+    found = {entry.path: entry.stat().st_size for entry in
+             scandir_files(root)}
+    expected = {op.join(dirpath, fname):
+                os.stat(op.join(dirpath, fname)).st_size for
+                dirpath, _, fnames in os.walk(root) for fname in fnames}
+    assert found == expected
+    assert len(found) == 4
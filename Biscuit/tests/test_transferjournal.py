@@ -0,0 +1,69 @@
+import os
+import os.path as op
+
+import pytest
+
+from Biscuit.utils.copyutils import copyfile_resumable, PARTIAL_SUFFIX
+from Biscuit.utils.hashing import hash_file
+from Biscuit.utils.transferjournal import TransferJournal
+
+MB = 1024 * 1024
+
+
+class InterruptingTracker():
+    """Tracker which raises once a certain number of bytes are copied."""
+    def __init__(self, stop_at=None):
+        self.stop_at = stop_at
+        self.max = 0
+        self.values = []
+
+    def set(self, value):
+        self.values.append(value)
+        if self.stop_at is not None and value >= self.stop_at:
+            raise KeyboardInterrupt
+
+
+def test_resume_copy(tmpdir):
+    src = op.join(str(tmpdir), 'src.bin')
+    dst = op.join(str(tmpdir), 'dst.bin')
+    data = os.urandom(5 * MB + 7)
+    with open(src, 'wb') as f:
+        f.write(data)
+    journal = TransferJournal(op.join(str(tmpdir), 'journal.json'))
+
+    # interrupt the copy part way through the third checkpoint range
+    with pytest.raises(KeyboardInterrupt):
+        copyfile_resumable(src, dst, journal, checkpoint_size=2 * MB,
+                           tracker=InterruptingTracker(5 * MB))
+    assert not op.exists(dst)
+    assert op.exists(dst + PARTIAL_SUFFIX)
+    journal.save()
+
+    # a new journal (ie. after a restart) continues from the last checkpoint
+    journal = TransferJournal(op.join(str(tmpdir), 'journal.json'))
+    assert [end for end, _ in journal.get_checkpoints(src, dst, 'md5')] == \
+        [2 * MB, 4 * MB]
+    tracker = InterruptingTracker()
+    _, file_hash = copyfile_resumable(src, dst, journal, verify=True,
+                                      checkpoint_size=2 * MB, tracker=tracker)
+    assert tracker.values[0] == 4 * MB
+    with open(dst, 'rb') as f:
+        assert f.read() == data
+    assert file_hash.hexdigest() == hash_file(src).hexdigest()
+    assert journal.is_complete(src, dst)
+
+    # corrupt data in the temporary file is copied again
+    os.remove(dst)
+    journal.discard(dst)
+    with pytest.raises(KeyboardInterrupt):
+        copyfile_resumable(src, dst, journal, checkpoint_size=2 * MB,
+                           tracker=InterruptingTracker(5 * MB))
+    with open(dst + PARTIAL_SUFFIX, 'r+b') as f:
+        f.seek(3 * MB)
+        f.write(b'corrupt')
+    tracker = InterruptingTracker()
+    copyfile_resumable(src, dst, journal, checkpoint_size=2 * MB,
+                       tracker=tracker)
+    assert tracker.values[0] == 2 * MB
+    with open(dst, 'rb') as f:
+        assert f.read() == data
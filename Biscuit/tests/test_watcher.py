@@ -0,0 +1,43 @@
+import os
+import os.path as op
+from platform import system as os_name
+import shutil
+
+import pytest
+
+from Biscuit.utils.watcher import InotifyWatcher, PollingWatcher
+
+
+def _get_watchers():
+    watchers = [PollingWatcher]
+    if os_name() == 'Linux':
+        watchers.append(InotifyWatcher)
+    return watchers
+
+
+@pytest.mark.parametrize('watcher_cls', _get_watchers())
+def test_watcher(tmpdir, watcher_cls):
+    root = str(tmpdir)
+    folders = [op.join(root, 'sub-1'), op.join(root, 'sub-1', 'meg'),
+               op.join(root, 'sub-2')]
+    for folder in folders:
+        os.makedirs(folder)
+    # changes made just after the modification time of a folder can't be
+    # trusted so make the folders look older
+    for folder in [root] + folders:
+        os.utime(folder, (0, 0))
+    watcher = watcher_cls()
+    for folder in [root] + folders:
+        watcher.add(folder)
+    assert not watcher.changes()
+    with open(op.join(folders[1], 'a.fif'), 'w'):
+        pass
+    shutil.rmtree(folders[2])
+    changed = watcher.changes()
+    assert folders[1] in changed
+    assert root in changed
+    assert folders[0] not in changed
+    watcher.remove(folders[1])
+    os.remove(op.join(folders[1], 'a.fif'))
+    assert folders[1] not in watcher.changes()
+    watcher.close()
@@ -2,14 +2,21 @@
 Custom copying function for copying and tracking the progress of BIDS data
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import os.path as op
-from hashlib import md5
 import logging
+from threading import BoundedSemaphore, Lock
 
-from Biscuit.utils.copyutils import copy
+from Biscuit.utils.copyutils import copy, copyfile_resumable, CHECKPOINT_SIZE
+from Biscuit.utils.hashing import hash_file, DEFAULT_ALGORITHM
 
 BUFFER_SIZE = 1024 * 1024     # 1Mb
+# Files no larger than this are copied in batches when copying concurrently.
+SMALL_FILE_SIZE = 1024 * 1024
+# Maximum number of files and total size of each batch of small files.
+BATCH_FILES = 64
+BATCH_SIZE = 16 * 1024 * 1024
 
 
 class BIDSCopy():
@@ -19,7 +26,11 @@ class BIDSCopy():
     ----------
     overwrite : bool
         Whether or not to overwrite the currently existing data
-        Defaults to False.
+        Defaults to False. If False, only new or changed files are copied.
+        A file is considered unchanged if the destination file has the same
+        size as the source and was modified after it. Files which the journal
+        records as having been copied from the unchanged source are skipped
+        even when overwriting.
     verify : bool
         Whether or not to verify the data as it is transferred.
         Verification is slow so should only be used when peace-of-mind is
@@ -38,63 +49,339 @@ class BIDSCopy():
         function from shutil to track  the rate at whic the indiviual files
         themselves are being transferred. This is for tracking purposes in the
         Windows.SendFilesWindow window.)
+        Any of the trackers can instead be a
+        `Biscuit.utils.progress.ProgressValue` so that the copying threads
+        don't update the UI directly.
+    workers : int
+        Number of files to be copied at the same time. If this is greater than
+        1, files smaller than `SMALL_FILE_SIZE` are copied in batches so that
+        folders containing many small files aren't slowed down by the
+        overhead of each copy. When copying files concurrently the
+        `file_prog_tracker` shows the progress of one large file at a time.
+    algorithm : str
+        The hash algorithm used to verify the data. See
+        `Biscuit.utils.hashing.ALGORITHMS`.
+    strategy : str
+        The method used to copy the data. See
+        `Biscuit.utils.copyutils.copydata`. When the data needs to be hashed
+        it is hashed as it is copied if it is copied through python,
+        otherwise the source file is read again once it has been copied.
+        Files larger than `CHECKPOINT_SIZE` are always copied through python
+        when a journal is used.
+    journal : instance of Biscuit.utils.transferjournal.TransferJournal
+        If provided, files which the journal records as having already been
+        copied are skipped, and files larger than `CHECKPOINT_SIZE` are
+        copied so that an interrupted copy can be resumed from the last
+        checkpoint.
+    checksum : bool
+        Whether to also compare the digest of the source file with that of
+        the destination before skipping an unchanged file. The digest stored
+        in the manifest or journal is used if there is one, otherwise the
+        destination file is hashed.
+    manifest : instance of Biscuit.utils.manifest.ChecksumManifest
+        If provided, the digest of each file copied is recorded in the
+        manifest, even if it isn't being verified. Files which are skipped
+        are also recorded, using the digest in the manifest or journal if
+        there is one, otherwise by hashing the destination file.
+    stats : dict
+        The os.stat_result of each source file, keyed by path, from a
+        previous scan of the sources (eg. by
+        `Biscuit.utils.scan.scandir_files`). These are used instead of
+        stat'ing the source files again. Any file not in `stats` is stat'ed
+        as usual.
+    verify_window : int
+        Maximum number of copied files which can be waiting to be verified
+        (or being verified) while the following files are copied. If 0 each
+        file is verified before the next one is copied. Verification failures
+        are retried once in the same way in either case.
+
+    Attributes
+    ----------
+    skipped : list of str
+        The source files which were not copied because they were unchanged.
+    skipped_bytes : int
+        The total size of the skipped files.
     """
     def __init__(self, overwrite=False, verify=True, file_name_tracker=None,
-                 file_num_tracker=None, file_prog_tracker=None):
+                 file_num_tracker=None, file_prog_tracker=None, workers=1,
+                 algorithm=DEFAULT_ALGORITHM, strategy='auto', journal=None,
+                 checksum=False, manifest=None, verify_window=0,
+                 stats=None):
         self.overwrite = overwrite
         self.verify = verify
         self.file_name_tracker = file_name_tracker
         self.file_num_tracker = file_num_tracker
         self.file_prog_tracker = file_prog_tracker
+        self.workers = workers
+        self.algorithm = algorithm
+        self.strategy = strategy
+        self.journal = journal
+        self.checksum = checksum
+        self.manifest = manifest
+        self.verify_window = verify_window
+        self.stats = stats if stats is not None else dict()
+        self._verifier = None
+        self._in_flight = None
+        self._verify_errors = []
+        self.skipped = []
+        self.skipped_bytes = 0
+        self._lock = Lock()
+        # whether a file is currently using the file_prog_tracker
+        self._prog_tracker_used = False
 
     def copy_files(self, src_files, dst_files):
         """Copy the src_files to the corresponding location in dst_files."""
         assert len(src_files) == len(dst_files)
-        for fnum in range(len(src_files)):
-            src = src_files[fnum]
-            dst = dst_files[fnum]
-            # Make any folders that don't exist
-            if not op.exists(op.dirname(dst_files[fnum])):
-                os.makedirs(op.dirname(dst_files[fnum]), exist_ok=True)
-            # assign the name
-            if self.file_name_tracker is not None:
-                self.file_name_tracker.set(op.basename(src))
-            if self.verify:
-                _, file_hash = copy(src, dst, tracker=self.file_prog_tracker,
-                                    verify=True)
+        self._verify_errors = []
+        if self.verify and self.verify_window > 0:
+            self._verifier = ThreadPoolExecutor(max_workers=self.verify_window)
+            self._in_flight = BoundedSemaphore(self.verify_window)
+        try:
+            self._copy_all(src_files, dst_files)
+        finally:
+            if self._verifier is not None:
+                # wait for the files already copied to be verified
+                self._verifier.shutdown(wait=True)
+                self._verifier = None
+            # Always save the journal so that the progress made before any
+            # error is kept.
+            if self.journal is not None:
+                self.journal.save()
+            if self.manifest is not None:
+                self.manifest.save()
+        if self._verify_errors:
+            raise self._verify_errors[0]
+
+    def _copy_all(self, src_files, dst_files):
+        """Copy all the files, serially or concurrently."""
+        if self.workers <= 1:
+            for src, dst in zip(src_files, dst_files):
+                self._copy_file(src, dst, self.file_prog_tracker)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._copy_batch, batch) for batch
+                       in batch_files(src_files, dst_files,
+                                      stats=self.stats)]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                # don't start copying any more files
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _copy_batch(self, batch):
+        """Copy a batch of files one after the other."""
+        for src, dst in batch:
+            tracker = None
+            if (self.file_prog_tracker is not None and
+                    self._src_stat(src).st_size > SMALL_FILE_SIZE):
+                # Only one file can use the progress tracker at a time.
+                with self._lock:
+                    if not self._prog_tracker_used:
+                        self._prog_tracker_used = True
+                        tracker = self.file_prog_tracker
+            try:
+                self._copy_file(src, dst, tracker)
+            finally:
+                if tracker is not None:
+                    with self._lock:
+                        self._prog_tracker_used = False
+
+    def _copy_file(self, src, dst, tracker=None):
+        """Copy (and verify) a single file."""
+        if self._verify_errors:
+            # a file has failed to be verified so stop copying
+            raise self._verify_errors[0]
+        # Make any folders that don't exist
+        if not op.exists(op.dirname(dst)):
+            os.makedirs(op.dirname(dst), exist_ok=True)
+        # assign the name
+        if self.file_name_tracker is not None:
+            self.file_name_tracker.set(op.basename(src))
+        if self.journal is not None and self.journal.is_complete(src, dst):
+            # already copied by a previous (interrupted) transfer
+            unchanged = True
+        else:
+            unchanged = not self.overwrite and self._is_unchanged(src, dst)
+        if unchanged:
+            with self._lock:
+                self.skipped.append(src)
+                self.skipped_bytes += self._src_stat(src).st_size
+            if self.manifest is not None:
+                self._add_skipped(dst)
+            self._increment_num()
+            return
+        file_hash = self._copy_data(src, dst, tracker)
+        if self._verifier is not None:
+            # verify while the next file is copied
+            self._in_flight.acquire()
+            future = self._verifier.submit(self._verify_file, src, dst,
+                                           file_hash)
+            future.add_done_callback(self._verified)
+        else:
+            self._verify_file(src, dst, file_hash, tracker)
+
+    def _verify_file(self, src, dst, file_hash, tracker=None):
+        """Verify a copied file, copying it again if it doesn't match."""
+        if (self.file_name_tracker is not None and
+                self._src_stat(src).st_size > BUFFER_SIZE):
+            # change the file name to indiciate that it is being verified.
+            # Only do for files bigger than 1Mb as it isn't worth it for
+            # small files since they will be done instantly.
+            self.file_name_tracker.set(op.basename(src) + ' (verifying)')
+        if self.verify:
+            if (file_hash.hexdigest() !=
+                    hash_file(dst, self.algorithm).hexdigest()):
+                # log a warning
+                logging.warning(
+                    "{0} was not copied correctly, "
+                    "retrying...".format(src))
+                if self.journal is not None:
+                    self.journal.discard(dst)
+                file_hash = self._copy_data(src, dst, tracker)
+                if (file_hash.hexdigest() !=
+                        hash_file(dst, self.algorithm).hexdigest()):
+                    # in this case it has failed *twice* which should be
+                    # *very* unlikely. Raise an error.
+                    if self.journal is not None:
+                        self.journal.discard(dst)
+                    raise ValueError("{0} wasn't copied over correctly. "
+                                     "Please ensure there is no issue with"
+                                     " the file".format(src))
+        if self.journal is not None:
+            # Only now can the copy be skipped by a later transfer.
+            self.journal.complete(
+                dst, file_hash.hexdigest() if file_hash is not None else None)
+        if self.manifest is not None:
+            self.manifest.add(dst, file_hash.hexdigest(), self.algorithm)
+        self._increment_num()
+
+    def _verified(self, future):
+        """Called when the verification of a file has finished."""
+        self._in_flight.release()
+        exc = future.exception()
+        if exc is not None:
+            with self._lock:
+                self._verify_errors.append(exc)
+
+    def _copy_data(self, src, dst, tracker):
+        """Copy the data of the file.
+
+        If verifying (or recording the digests in the manifest), the hash of
+        the data copied is returned. The copy is recorded in the journal but
+        isn't marked as complete until it has been verified.
+        """
+        hashing = self.verify or self.manifest is not None
+        file_hash = None
+        if self.journal is None:
+            if hashing:
+                _, file_hash = copy(src, dst, tracker=tracker, verify=True,
+                                    strategy=self.strategy,
+                                    algorithm=self.algorithm)
+            else:
+                copy(src, dst, tracker=tracker, strategy=self.strategy)
+        elif self._src_stat(src).st_size > CHECKPOINT_SIZE:
+            ret = copyfile_resumable(src, dst, self.journal, tracker=tracker,
+                                     verify=hashing, algorithm=self.algorithm,
+                                     complete=False)
+            if hashing:
+                _, file_hash = ret
+        else:
+            # Small files are quicker to copy again than to checkpoint, so
+            # are copied without any checkpoints.
+            self.journal.start(src, dst, self.algorithm)
+            if hashing:
+                _, file_hash = copy(src, dst, tracker=tracker, verify=True,
+                                    strategy=self.strategy,
+                                    algorithm=self.algorithm)
             else:
-                copy(src, dst, tracker=self.file_prog_tracker)
-            if os.stat(src).st_size > BUFFER_SIZE:
-                # change the file name to indiciate that it is being verified.
-                # Only do for files bigger than 1Mb as it isn't worth it for
-                # small files since they will be done instantly.
-                self.file_name_tracker.set(self.file_name_tracker.get() +
-                                           ' (verifying)')
-            if self.verify:
-                if file_hash.hexdigest() != md5hash(dst).hexdigest():
-                    # log a warning
-                    logging.warning(
-                        "{0} was not copied correctly, "
-                        "retrying...".format(src))
-                    _, file_hash = copy(
-                        src, dst, tracker=self.file_prog_tracker, verify=True)
-                    if file_hash.hexdigest() != md5hash(dst).hexdigest():
-                        # in this case it has failed *twice* which should be
-                        # *very* unlikely. Raise an error.
-                        raise ValueError("{0} wasn't copied over correctly. "
-                                         "Please ensure there is no issue with"
-                                         " the file".format(src))
-            if self.file_num_tracker is not None:
+                copy(src, dst, tracker=tracker, strategy=self.strategy)
+        return file_hash
+
+    def _add_skipped(self, dst):
+        """Record the digest of a skipped file in the manifest."""
+        if self.manifest.get_digest(dst, self.algorithm) is not None:
+            return
+        digest = None
+        if self.journal is not None:
+            digest = self.journal.get_digest(dst, self.algorithm)
+        if digest is None:
+            digest = hash_file(dst, self.algorithm).hexdigest()
+        self.manifest.add(dst, digest, self.algorithm)
+
+    def _is_unchanged(self, src, dst):
+        """Whether the destination file is already a copy of the source."""
+        try:
+            src_stat = self._src_stat(src)
+            dst_stat = os.stat(dst)
+        except OSError:
+            return False
+        if (src_stat.st_size != dst_stat.st_size or
+                dst_stat.st_mtime_ns < src_stat.st_mtime_ns):
+            return False
+        if self.checksum:
+            digest = None
+            if self.manifest is not None:
+                digest = self.manifest.get_digest(dst, self.algorithm)
+            if digest is None and self.journal is not None:
+                digest = self.journal.get_digest(dst, self.algorithm)
+            if digest is None:
+                digest = hash_file(dst, self.algorithm).hexdigest()
+            return hash_file(src, self.algorithm).hexdigest() == digest
+        return True
+
+    def _src_stat(self, src):
+        """Return the stat of a source file, from the scan if possible."""
+        src_stat = self.stats.get(src, None)
+        if src_stat is None:
+            src_stat = os.stat(src)
+        return src_stat
+
+    def _increment_num(self):
+        if self.file_num_tracker is not None:
+            with self._lock:
                 self.file_num_tracker.set(self.file_num_tracker.get() + 1)
 
 
+def batch_files(src_files, dst_files, max_files=BATCH_FILES,
+                max_size=BATCH_SIZE, stats=None):
+    """Group the files to be copied into batches.
+
+    Each file larger than `SMALL_FILE_SIZE` is in a batch of its own, and
+    the small files are grouped together into batches of at most `max_files`
+    files and `max_size` bytes. The sizes are taken from `stats` (a dict of
+    os.stat_result keyed by path) if the file is in it.
+
+    Returns
+    -------
+    batches : list of list of tuple
+        The (src, dst) pairs of each batch.
+    """
+    batches = []
+    small_batch = []
+    small_size = 0
+    for src, dst in zip(src_files, dst_files):
+        if stats and src in stats:
+            size = stats[src].st_size
+        else:
+            size = os.stat(src).st_size
+        if size > SMALL_FILE_SIZE:
+            batches.append([(src, dst)])
+            continue
+        if small_batch and (len(small_batch) >= max_files or
+                            small_size + size > max_size):
+            batches.append(small_batch)
+            small_batch = []
+            small_size = 0
+        small_batch.append((src, dst))
+        small_size += size
+    if small_batch:
+        batches.append(small_batch)
+    return batches
+
+
 def md5hash(src):
     """ Gets the md5 hash of a file in chunks """
-    contents_hash = md5()
-    with open(src, 'rb') as fsrc:
-        while True:
-            data = fsrc.read(BUFFER_SIZE)
-            if not data:
-                break
-            contents_hash.update(data)
-    return contents_hash
+    return hash_file(src, 'md5')
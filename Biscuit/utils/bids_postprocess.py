@@ -4,10 +4,10 @@ from collections import OrderedDict as odict
 import json
 import os
 import os.path as op
-import shutil
 
 
 from Biscuit.utils.utils import get_mrk_meas_date
+from Biscuit.utils.copyutils import clone, copy
 from bidshandler.utils import _get_bids_params, _bids_params_are_subsets
 from mne_bids import make_bids_basename
 
@@ -25,20 +25,132 @@ def clean_emptyroom(fpath):
             os.remove(op.join(fpath, fname))
 
 
+def clone_raw_data(src, fpath, bids_name):
+    """Replace the copy of some KIT data written by mne-bids with a reflink
+    clone of the original file.
+
+    mne-bids copies the .con/.sqd file unchanged, so on file systems which
+    support reflinks (btrfs, XFS etc.) the copy can share its data with the
+    original rather than taking up as much space again.
+
+    Parameters
+    ----------
+    src : str
+        Path to the original .con/.sqd file.
+    fpath : str
+        Path to the folder containing the BIDS data for the file.
+    bids_name : str
+        BIDS basename of the file.
+
+    Returns
+    -------
+    method : str | None
+        'reflink' if the copy was replaced, otherwise None.
+    """
+    ext = op.splitext(src)[1]
+    size = os.stat(src).st_size
+    prefix = bids_name + '_'
+    for root, _, fnames in os.walk(fpath):
+        if root != fpath and not op.basename(root).startswith(prefix):
+            continue
+        for fname in fnames:
+            dst = op.join(root, fname)
+            if (fname.startswith(prefix) and fname.endswith(ext) and
+                    os.stat(dst).st_size == size):
+                if clone(src, dst):
+                    return 'reflink'
+                return None
+    return None
+
+
+class DatasetUpdater():
+    """Collect the changes to the dataset-level files of a BIDS project folder
+    so that each file only needs to be read and written once.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the BIDS project folder.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.groups = odict()
+        self.name = None
+        self.readme = None
+
+    def add_participant(self, participant_id, group):
+        """Set the group of a participant."""
+        self.groups[participant_id] = group
+
+    def flush(self):
+        """Write all the changes to disk."""
+        self.flush_participants()
+        self.flush_description()
+
+    def flush_description(self):
+        """Write the README and dataset_description.json files."""
+        if self.readme is not None:
+            write_readme(op.join(self.folder, 'README.txt'), self.readme)
+        if self.name is not None:
+            modify_dataset_description(
+                op.join(self.folder, 'dataset_description.json'), self.name)
+
+    def flush_participants(self):
+        """Write the participant groups to the participants.tsv file."""
+        fname = op.join(self.folder, 'participants.tsv')
+        if self.groups and op.exists(fname):
+            update_participants(fname, self.groups)
+
+
+def merge_tsv(srcs, dst):
+    """Merge the rows of a number of BIDS .tsv files into another.
+
+    Rows are matched on the first column (eg. `participant_id` or
+    `filename`). Rows from `srcs` replace any matching rows in `dst` and any
+    new rows are appended. The merged file is written once.
+    """
+    frames = [pd.read_csv(fname, sep='\t') for fname in srcs]
+    if op.exists(dst):
+        frames.insert(0, pd.read_csv(dst, sep='\t'))
+    key = frames[0].columns[0]
+    df = pd.concat(frames, sort=False, ignore_index=True)
+    df = df.drop_duplicates(subset=key, keep='last')
+    _write_atomic(dst, df.to_csv(sep='\t', index=False, na_rep='n/a'))
+    for fname in srcs:
+        os.remove(fname)
+
+
 def modify_dataset_description(fname, name):
     with open(fname, 'r') as file:
         data = json.load(file, object_hook=odict)
     data['Name'] = name
     json_output = json.dumps(data, indent=4)
-    with open(fname, 'w') as file:
-        file.write(json_output)
-        file.write('\n')
+    _write_atomic(fname, json_output + '\n')
 
 
-def update_markers(confile, fpath, bids_name):
+def update_markers(hpi, fpath, bids_name, strategy='buffered'):
     # TODO: shouldn't be needed once PR goes through on github
     """Update the markers provided and ensure that the BIDS output contains
-    all the markers."""
+    all the markers.
+
+    Parameters
+    ----------
+    hpi : list of str
+        Paths to the marker files associated with the con file. The first
+        entry is the one that was converted by mne-bids.
+    fpath : str
+        Path to the folder containing the BIDS data for the con file.
+    bids_name : str
+        BIDS basename of the con file.
+    strategy : str
+        Method used to copy the marker which wasn't converted. See
+        `Biscuit.utils.copyutils.copydata`.
+
+    Returns
+    -------
+    method : str | None
+        The method used to copy the marker, or None if nothing was copied.
+    """
 
     bids_params = _get_bids_params(bids_name)
     folder = None
@@ -50,7 +162,7 @@ def update_markers(confile, fpath, bids_name):
                 break
     if folder is None:
         # In this case it is broken. Do nothing I guess...
-        return
+        return None
     fnames = list(os.listdir(folder))   # cache for safety
     # do a check for any existing marker files with acq in their title
     for fname in fnames:
@@ -60,21 +172,21 @@ def update_markers(confile, fpath, bids_name):
                 os.remove(op.join(folder, fname))
                 continue
 
-    if len(confile.hpi) != 2:
+    if len(hpi) != 2:
         # If there is only one marker for the con file we don't need to do
         # anything.
-        return
+        return None
 
     # First entry in the list will always be the one that gets converted.
-    converted = confile.hpi[0]
-    not_converted = confile.hpi[1]
+    converted = hpi[0]
+    not_converted = hpi[1]
 
     # determine which marker is pre and which is post
-    confile.hpi.sort(key=get_mrk_meas_date)
     order = ['pre', 'post']
-    if confile.hpi.index(converted) != 0:
+    if sorted(hpi, key=get_mrk_meas_date).index(converted) != 0:
         order = ['post', 'pre']
 
+    method = None
     fnames = list(os.listdir(folder))   # recache for safety
     for fname in fnames:
         params = _get_bids_params(fname)
@@ -89,24 +201,29 @@ def update_markers(confile, fpath, bids_name):
             os.rename(op.join(folder, fname), op.join(folder, bname))
             bname = bname.replace('acq-{0}'.format(order[0]),
                                   'acq-{0}'.format(order[1]))
-            shutil.copy(not_converted.file,
-                        op.join(folder, op.basename(not_converted.file)))
-            os.rename(op.join(folder, op.basename(not_converted.file)),
-                      op.join(folder, bname))
+            methods = []
+            copy(not_converted, op.join(folder, bname), strategy=strategy,
+                 report=lambda src, dst, used: methods.append(used))
+            method = methods[0]
+    return method
 
 
-def update_participants(fname, data):
-    # add/modify the groups property
+def update_participants(fname, groups):
+    """Add/modify the groups property of the participants.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the participants.tsv file.
+    groups : dict
+        Mapping of participant id (eg. 'sub-1') to their group.
+    """
     df = pd.read_csv(fname, sep='\t')
-    participant_id = data[0]
-    group = data[1]
     if 'group' not in df:
-        df = df.assign(group=[group])
-    else:
-        for i in range(len(df)):
-            if df.ix[i, 'participant_id'] == participant_id:
-                df.ix[i, 'group'] = group
-    df.to_csv(fname, sep='\t', index=False, na_rep='n/a')
+        df = df.assign(group='n/a')
+    for participant_id, group in groups.items():
+        df.loc[df['participant_id'] == participant_id, 'group'] = group
+    _write_atomic(fname, df.to_csv(sep='\t', index=False, na_rep='n/a'))
 
 
 def update_sidecar(fname, data):
@@ -140,5 +257,13 @@ def update_sidecar(fname, data):
 
 def write_readme(fname, readme_text):
     # Write the readme to the file.
-    with open(fname, 'w') as file:
-        file.write(readme_text)
+    _write_atomic(fname, readme_text)
+
+
+def _write_atomic(fname, text):
+    """Write the text to a temporary file and then move it into place so that
+    the file is never left partially written."""
+    temp_fname = fname + '_temp'
+    with open(temp_fname, 'w') as file:
+        file.write(text)
+    os.replace(temp_fname, fname)
@@ -2,9 +2,35 @@
 of file transfer
 """
 
+import errno
 import os
+import os.path as op
 import stat
-from hashlib import md5
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+from Biscuit.utils.hashing import new_hash, DEFAULT_ALGORITHM
+
+# The methods which can be used to copy the data of a file, in the order they
+# are tried when the strategy is 'auto'.
+STRATEGIES = ['reflink', 'copy_file_range', 'sendfile', 'buffered']
+# Size of the chunks copied by each copy_file_range/sendfile call. This is
+# much larger than the buffered copy since no data passes through python,
+# but small enough for the progress to be updated regularly.
+KERNEL_CHUNK_SIZE = 32 * 1024 * 1024
+# Number of bytes copied between each checkpoint of a resumable copy.
+CHECKPOINT_SIZE = 64 * 1024 * 1024
+# Suffix of the temporary file written to by a resumable copy.
+PARTIAL_SUFFIX = '.part'
+# ioctl request to clone a file on Linux (btrfs, XFS etc.)
+FICLONE = 0x40049409
+# Errors raised when a copy method isn't supported for the files involved.
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.ENOTSUP,
+                errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM,
+                errno.ENOTSOCK}
 
 
 class SameFileError(OSError):
@@ -24,7 +50,8 @@ def _samefile(src, dst):
             os.path.normcase(os.path.abspath(dst)))
 
 
-def copyfileobj(fsrc, fdst, length=1024 * 1024, tracker=None, verify=False):
+def copyfileobj(fsrc, fdst, length=1024 * 1024, tracker=None, verify=False,
+                algorithm=DEFAULT_ALGORITHM):
     """ copy data from the file-like object fsrc to the file-like object fdst
 
     Parameters
@@ -39,14 +66,17 @@ def copyfileobj(fsrc, fdst, length=1024 * 1024, tracker=None, verify=False):
         A Variable which is used to track the transfer progress
     verify : bool
         Whether or not to verify the data is copied correctly.
-        If True this returns the hash object (md5)
+        If True this returns the hash object
+    algorithm : str
+        The hash algorithm used to verify the data. See
+        `Biscuit.utils.hashing.ALGORITHMS`.
 
     """
     if tracker is not None:
         tracker.set(0)
         curr_block = 0
     if verify:
-        contents_hash = md5()
+        contents_hash = new_hash(algorithm)
     while 1:
         buf = fsrc.read(length)
         if not buf:
@@ -63,12 +93,131 @@ def copyfileobj(fsrc, fdst, length=1024 * 1024, tracker=None, verify=False):
         return contents_hash
 
 
-def copyfile(src, dst, *, follow_symlinks=True, tracker=None, verify=False):
+def _reflink(fsrc, fdst, length, tracker):
+    """Clone the file so that the data is shared until either is modified."""
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, 'reflink is not supported')
+    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    if tracker is not None:
+        tracker.set(tracker.max)
+
+
+def _copy_file_range(fsrc, fdst, length, tracker):
+    """Copy the data within the kernel using copy_file_range."""
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range is not supported')
+    _kernel_copy(os.copy_file_range, fsrc, fdst, length, tracker)
+
+
+def _sendfile(fsrc, fdst, length, tracker):
+    """Copy the data within the kernel using sendfile."""
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, 'sendfile is not supported')
+
+    def sendfile(in_fd, out_fd, count):
+        return os.sendfile(out_fd, in_fd, None, count)
+    _kernel_copy(sendfile, fsrc, fdst, length, tracker)
+
+
+def _kernel_copy(func, fsrc, fdst, length, tracker):
+    # call func(in_fd, out_fd, count) until all the data is copied
+    if tracker is not None:
+        tracker.set(0)
+    size = os.fstat(fsrc.fileno()).st_size
+    copied = 0
+    while True:
+        sent = func(fsrc.fileno(), fdst.fileno(), length)
+        if sent == 0:
+            break
+        copied += sent
+        if tracker is not None:
+            tracker.set(copied)
+    if copied < size:
+        # Some file systems (eg. FUSE and some network shares) return 0
+        # before the end of the file rather than an error, so copy the rest
+        # through python.
+        fsrc.seek(copied)
+        fdst.seek(copied)
+        copyfileobj(fsrc, fdst)
+    if tracker is not None:
+        tracker.set(tracker.max)
+
+
+def _buffered(fsrc, fdst, length, tracker):
+    copyfileobj(fsrc, fdst, length=length, tracker=tracker)
+
+
+_COPY_FUNCS = {'reflink': _reflink,
+               'copy_file_range': _copy_file_range,
+               'sendfile': _sendfile,
+               'buffered': _buffered}
+
+
+def copydata(fsrc, fdst, strategy='auto', length=1024 * 1024, tracker=None,
+             kernel_length=KERNEL_CHUNK_SIZE):
+    """Copy the data from one open file to another.
+
+    Parameters
+    ----------
+    fsrc : file-like object
+        The source file, opened for binary reading.
+    fdst : file-like object
+        The destination file, opened for binary writing.
+    strategy : str
+        The method used to copy the data. One of 'auto', 'reflink',
+        'copy_file_range', 'sendfile' or 'buffered'. If 'auto' each method is
+        tried in turn until one is supported by the files.
+        If the method isn't supported a buffered copy is done.
+    length : int
+        Size of the chunks to copy at a time for a buffered copy.
+    tracker : Instance of tkinter.IntVar
+        A Variable which is used to track the transfer progress. This is
+        updated after each chunk is copied.
+    kernel_length : int
+        Size of the chunks to copy at a time when the copy is done by the
+        kernel ('copy_file_range' or 'sendfile').
+
+    Returns
+    -------
+    method : str
+        The method which was actually used to copy the data.
+    """
+    if strategy == 'auto':
+        methods = STRATEGIES
+    elif strategy in _COPY_FUNCS:
+        methods = [strategy, 'buffered']
+    else:
+        raise ValueError("Invalid copy strategy: {0!r}".format(strategy))
+    for method in methods:
+        try:
+            if method in ('copy_file_range', 'sendfile'):
+                _COPY_FUNCS[method](fsrc, fdst, kernel_length, tracker)
+            else:
+                _COPY_FUNCS[method](fsrc, fdst, length, tracker)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED or method == 'buffered':
+                raise
+            # Nothing is written if the method isn't supported, but make sure
+            # the next method starts from the beginning of both files.
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            continue
+        return method
+
+
+def copyfile(src, dst, *, follow_symlinks=True, tracker=None, verify=False,
+             strategy='buffered', report=None, algorithm=DEFAULT_ALGORITHM):
     # Copy data from src to dst.
 
     # If follow_symlinks is not set and src is a symbolic link, a new
     # symlink will be created instead of copying the file it points to.
 
+    # `strategy` is the method used to copy the data (see `copydata`). If
+    # `report` is provided it is called with the source, destination and the
+    # method actually used once the file has been copied.
+    # `algorithm` is the hash algorithm used if `verify` is True.
+
     if _samefile(src, dst):
         raise SameFileError("{!r} and {!r} are the same file".format(src, dst))
 
@@ -81,19 +230,152 @@ def copyfile(src, dst, *, follow_symlinks=True, tracker=None, verify=False):
 
     if not follow_symlinks and os.path.islink(src):
         os.symlink(os.readlink(src), dst)
+        method = 'symlink'
     else:
         with open(src, 'rb') as fsrc:
             with open(dst, 'wb') as fdst:
                 if tracker is not None:
                     tracker.max = os.stat(src).st_size
-                file_hash = copyfileobj(fsrc, fdst, tracker=tracker,
-                                        verify=verify)
+                if strategy == 'buffered':
+                    # hash the data as it is copied
+                    file_hash = copyfileobj(fsrc, fdst, tracker=tracker,
+                                            verify=verify,
+                                            algorithm=algorithm)
+                    method = 'buffered'
+                else:
+                    method = copydata(fsrc, fdst, strategy=strategy,
+                                      tracker=tracker)
+                    if verify:
+                        # The data never passed through python so the
+                        # source needs to be read to get its hash.
+                        fsrc.seek(0)
+                        file_hash = new_hash(algorithm)
+                        for buf in iter(lambda: fsrc.read(1024 * 1024), b''):
+                            file_hash.update(buf)
+    if report is not None:
+        report(src, dst, method)
     if verify:
         return dst, file_hash
     else:
         return dst
 
 
+def copyfile_resumable(src, dst, journal, *, tracker=None, verify=False,
+                       algorithm=DEFAULT_ALGORITHM,
+                       checkpoint_size=CHECKPOINT_SIZE, complete=True):
+    """Copy a file so that the copy can be resumed if it is interrupted.
+
+    The data is written to a temporary file (`dst` + PARTIAL_SUFFIX) which is
+    renamed to `dst` once complete. After every `checkpoint_size` bytes the
+    data is flushed to disk and the range and its digest are recorded in the
+    journal. If a previous copy of the same source was interrupted, the copy
+    continues from the end of the last range whose data in the temporary
+    file still matches its digest.
+
+    Parameters
+    ----------
+    src : str
+        Source file.
+    dst : str
+        Destination file.
+    journal : instance of Biscuit.utils.transferjournal.TransferJournal
+        The journal the progress is recorded in.
+    tracker : Instance of tkinter.IntVar
+        A Variable which is used to track the transfer progress
+    verify : bool
+        Whether to return the hash of the whole file.
+    algorithm : str
+        Hash algorithm used for the digests. See
+        `Biscuit.utils.hashing.ALGORITHMS`.
+    checkpoint_size : int
+        Number of bytes copied between each checkpoint.
+    complete : bool
+        Whether to mark the file as complete in the journal once it has been
+        copied. If False this is left to the caller (eg. once the copy has
+        been verified).
+    """
+    temp_dst = dst + PARTIAL_SUFFIX
+    offset = 0
+    checkpoints = []
+    if op.exists(temp_dst):
+        checkpoints = journal.get_checkpoints(src, dst, algorithm)
+    # find the last range which was written correctly
+    temp_size = op.getsize(temp_dst) if checkpoints else 0
+    while checkpoints:
+        start = checkpoints[-2][0] if len(checkpoints) > 1 else 0
+        end, digest = checkpoints[-1]
+        if (temp_size >= end and
+                _range_digest(temp_dst, start, end, algorithm) == digest):
+            offset = end
+            break
+        checkpoints.pop()
+    if offset == 0:
+        journal.start(src, dst, algorithm)
+    else:
+        journal.truncate(dst, len(checkpoints))
+
+    file_hash = new_hash(algorithm) if verify else None
+    with open(src, 'rb') as fsrc:
+        if verify and offset != 0:
+            # the hash of the whole file needs the data already copied
+            remaining = offset
+            while remaining > 0:
+                buf = fsrc.read(min(1024 * 1024, remaining))
+                file_hash.update(buf)
+                remaining -= len(buf)
+        fsrc.seek(offset)
+        with open(temp_dst, 'r+b' if offset else 'wb') as fdst:
+            fdst.seek(offset)
+            fdst.truncate()
+            if tracker is not None:
+                tracker.max = os.fstat(fsrc.fileno()).st_size
+                tracker.set(offset)
+            pos = offset
+            range_hash = new_hash(algorithm)
+            while True:
+                buf = fsrc.read(min(1024 * 1024,
+                                    checkpoint_size - pos % checkpoint_size))
+                if buf:
+                    fdst.write(buf)
+                    range_hash.update(buf)
+                    if verify:
+                        file_hash.update(buf)
+                    pos += len(buf)
+                    if tracker is not None:
+                        tracker.set(pos)
+                if (not buf or pos % checkpoint_size == 0) and pos != offset:
+                    # make sure the data is on disk before recording it
+                    fdst.flush()
+                    os.fsync(fdst.fileno())
+                    journal.checkpoint(dst, pos, range_hash.hexdigest())
+                    offset = pos
+                    range_hash = new_hash(algorithm)
+                if not buf:
+                    break
+    os.replace(temp_dst, dst)
+    copymode(src, dst)
+    if complete:
+        journal.complete(dst, file_hash.hexdigest() if verify else None)
+    if verify:
+        return dst, file_hash
+    return dst
+
+
+def _range_digest(fname, start, end, algorithm):
+    """Return the hex digest of the data in a range of a file."""
+    range_hash = new_hash(algorithm)
+    with open(fname, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            buf = f.read(min(1024 * 1024, remaining))
+            if not buf:
+                break
+            range_hash.update(buf)
+            remaining -= len(buf)
+    return range_hash.hexdigest()
+
+
 def copymode(src, dst, *, follow_symlinks=True):
     """Copy mode bits from src to dst.
 
@@ -116,7 +398,36 @@ def copymode(src, dst, *, follow_symlinks=True):
     chmod_func(dst, stat.S_IMODE(st.st_mode))
 
 
-def copy(src, dst, *, follow_symlinks=True, tracker=None, verify=False):
+def clone(src, dst):
+    """Replace `dst` with a reflink clone of `src`.
+
+    The clone shares its data with `src` until either is modified so takes no
+    extra space. `dst` is only replaced once the clone has been made.
+
+    Returns
+    -------
+    cloned : bool
+        Whether the clone could be made. If the file system doesn't support
+        reflinks `dst` is left unchanged.
+    """
+    temp_dst = dst + '_temp'
+    try:
+        with open(src, 'rb') as fsrc:
+            with open(temp_dst, 'wb') as fdst:
+                _reflink(fsrc, fdst, 0, None)
+    except OSError as e:
+        if op.exists(temp_dst):
+            os.remove(temp_dst)
+        if e.errno not in _UNSUPPORTED:
+            raise
+        return False
+    copymode(src, temp_dst)
+    os.replace(temp_dst, dst)
+    return True
+
+
+def copy(src, dst, *, follow_symlinks=True, tracker=None, verify=False,
+         strategy='buffered', report=None, algorithm=DEFAULT_ALGORITHM):
     """
     Copy data and mode bits ("cp src dst"). Return the file's destination.
 
@@ -127,15 +438,23 @@ def copy(src, dst, *, follow_symlinks=True, tracker=None, verify=False):
 
     If source and destination are the same file, a SameFileError will be
     raised.
+
+    `strategy` is the method used to copy the data (see `copydata`) and
+    `report` is called with the source, destination and method used once
+    the file has been copied. If `verify` is True the hash of the data,
+    computed with `algorithm`, is also returned.
     """
 
     if os.path.isdir(dst):
         dst = os.path.join(dst, os.path.basename(src))
     if verify:
         _, file_hash = copyfile(src, dst, follow_symlinks=follow_symlinks,
-                                tracker=tracker, verify=verify)
+                                tracker=tracker, verify=verify,
+                                strategy=strategy, report=report,
+                                algorithm=algorithm)
     else:
-        copyfile(src, dst, follow_symlinks=follow_symlinks, tracker=tracker)
+        copyfile(src, dst, follow_symlinks=follow_symlinks, tracker=tracker,
+                 strategy=strategy, report=report)
     copymode(src, dst, follow_symlinks=follow_symlinks)
     if verify:
         return dst, file_hash
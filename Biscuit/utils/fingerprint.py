@@ -0,0 +1,154 @@
+"""
+Fingerprinting of conversion jobs so that jobs which haven't changed since
+they were last converted don't need to be converted again.
+"""
+
+from hashlib import md5
+import json
+import os
+import os.path as op
+
+import Biscuit
+
+MANIFEST_NAME = '.biscuit_manifest.json'
+# Amount of data read from the start and end of each file to be hashed.
+SAMPLE_SIZE = 1024 * 1024
+
+
+def file_signature(fname):
+    """Return a cheap signature of a file.
+
+    This consists of the size, modification time and a hash of the first and
+    last megabyte of the file, which is enough to detect any change to the
+    file without having to read the whole thing.
+    """
+    stat = os.stat(fname)
+    contents_hash = md5()
+    with open(fname, 'rb') as f:
+        contents_hash.update(f.read(SAMPLE_SIZE))
+        if stat.st_size > 2 * SAMPLE_SIZE:
+            f.seek(-SAMPLE_SIZE, os.SEEK_END)
+            contents_hash.update(f.read(SAMPLE_SIZE))
+    return [op.normpath(fname), stat.st_size, stat.st_mtime_ns,
+            contents_hash.hexdigest()]
+
+
+def job_fingerprint(job, container):
+    """Return the fingerprint of a job.
+
+    The fingerprint covers the signatures of all the source files used to
+    create the job and all of the user-entered information for both the job
+    and its container.
+    For .fif data the job is also the container.
+    """
+    hpi = _hpi_files(job)
+    sources = [job.file] + hpi
+    sources.extend(container.make_specific_data.values())
+    trigger_channels, descriptions = job.get_event_data()
+    data = {'version': Biscuit.__version__,
+            'sources': [file_signature(fname) for fname in sources
+                        if isinstance(fname, str) and op.isfile(fname)],
+            'job': {'file': job.file,
+                    'run': _get(job, 'run'),
+                    'task': _get(job, 'task'),
+                    'is_junk': _get(job, 'is_junk'),
+                    'is_empty_room': _get(job, 'is_empty_room'),
+                    'has_empty_room': _get(job, 'has_empty_room'),
+                    'hpi': hpi,
+                    'events': [list(trigger_channels), list(descriptions)],
+                    'channels': _channel_info(job),
+                    'extra_data': job.extra_data},
+            'container': {'project': _get(container, 'proj_name'),
+                          'session': _get(container, 'session_ID'),
+                          'subject': _get(container, 'subject_ID'),
+                          'age': [var.get() for var in
+                                  container.subject_age],
+                          'gender': _get(container, 'subject_gender'),
+                          'group': _get(container, 'subject_group'),
+                          'dewar': _get(container, 'dewar_position'),
+                          'extra_data': container.extra_data,
+                          'extra_files': container.extra_files}}
+    data = json.dumps(data, sort_keys=True, default=str)
+    return md5(data.encode()).hexdigest()
+
+
+def _channel_info(job):
+    """Return the names and types of the channels entered for a job."""
+    channel_info = getattr(job, 'channel_info', None) or dict()
+    return dict((str(num), [ch_data['ch_name'].get(),
+                            ch_data['ch_type'].get()])
+                for num, ch_data in channel_info.items())
+
+
+def _get(obj, name):
+    """Return the value of a tkinter Variable of an object, or None if the
+    object doesn't have it."""
+    var = getattr(obj, name, None)
+    if var is None:
+        return None
+    return var.get()
+
+
+def _hpi_files(job):
+    """Return the paths of the marker coil files of a job.
+
+    .fif data has no marker coil files so its `hpi` is None, and jobs loaded
+    from a save file store just the paths.
+    """
+    return [getattr(mrk, 'file', mrk) for mrk in (job.hpi or [])]
+
+
+class ConversionManifest():
+    """A record of the files produced by each job converted into a BIDS
+    project folder.
+
+    Parameters
+    ----------
+    folder : str
+        Path to the BIDS project folder the manifest is stored in.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = op.join(folder, MANIFEST_NAME)
+        self.entries = dict()
+        if op.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                # A corrupt manifest just means everything is re-converted.
+                self.entries = dict()
+
+    def is_current(self, bids_name, fingerprint):
+        """Whether the job has already been converted with the same
+        fingerprint and all the files it produced still exist."""
+        entry = self.entries.get(bids_name, None)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return False
+        for fname in entry['files']:
+            if not op.exists(op.join(self.folder, fname)):
+                return False
+        return True
+
+    def save(self):
+        """Write the manifest to disk."""
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = self.path + '_temp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def update(self, bids_name, fingerprint, files):
+        """Set the fingerprint and the files produced for a job.
+
+        Parameters
+        ----------
+        bids_name : str
+            The BIDS basename of the job.
+        fingerprint : str
+            The fingerprint of the job when it was converted.
+        files : list of str
+            Paths of the files produced, relative to the project folder.
+        """
+        self.entries[bids_name] = {'fingerprint': fingerprint,
+                                   'files': sorted(files)}
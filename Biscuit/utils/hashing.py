@@ -0,0 +1,71 @@
+"""
+The hash algorithms which can be used to verify transferred data.
+"""
+
+import hashlib
+import zlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_ALGORITHM = 'md5'
+BUFFER_SIZE = 1024 * 1024     # 1Mb
+
+
+class crc32():
+    """A CRC-32 checksum with the same interface as the hashlib objects.
+
+    This is much cheaper to compute than a cryptographic hash and is enough
+    to detect data that has been corrupted while being copied.
+    """
+    name = 'crc32'
+
+    def __init__(self, data=b''):
+        self._value = zlib.crc32(data)
+
+    def update(self, data):
+        self._value = zlib.crc32(data, self._value)
+
+    def digest(self):
+        return self._value.to_bytes(4, 'big')
+
+    def hexdigest(self):
+        return '{0:08x}'.format(self._value)
+
+
+ALGORITHMS = {'md5': hashlib.md5,
+              'sha256': hashlib.sha256,
+              'blake2b': hashlib.blake2b,
+              'crc32': crc32}
+if xxhash is not None:
+    ALGORITHMS['xxh64'] = xxhash.xxh64
+
+
+def new_hash(algorithm=DEFAULT_ALGORITHM):
+    """Return a new hash object for the specified algorithm.
+
+    Parameters
+    ----------
+    algorithm : str
+        One of the keys of `ALGORITHMS`.
+    """
+    try:
+        return ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError("Unsupported hash algorithm: {0!r}. Available "
+                         "algorithms are: {1}".format(
+                             algorithm, ', '.join(ALGORITHMS)))
+
+
+def hash_file(fname, algorithm=DEFAULT_ALGORITHM):
+    """Return the hash object of the contents of a file, read in chunks."""
+    contents_hash = new_hash(algorithm)
+    with open(fname, 'rb') as f:
+        while True:
+            data = f.read(BUFFER_SIZE)
+            if not data:
+                break
+            contents_hash.update(data)
+    return contents_hash
@@ -0,0 +1,123 @@
+"""
+Tools to record how long each stage of the BIDS conversion takes, and how
+much data is read and written by each stage.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import os.path as op
+from time import perf_counter
+
+from Biscuit.utils.constants import OSCONST
+from Biscuit.utils.utils import get_fsize
+
+LOG_NAME = 'conversion_log.jsonl'
+
+
+class StageTimer():
+    """Record the wall time and amount of data read/written by each stage of
+    a conversion job.
+
+    Parameters
+    ----------
+    job : str
+        Name of the job the stages belong to.
+    """
+    def __init__(self, job=''):
+        self.job = job
+        self.records = []
+
+    def add(self, record):
+        """Add a record produced elsewhere (eg. by another StageTimer)."""
+        record = dict(record)
+        record['job'] = self.job
+        self.records.append(record)
+
+    @contextmanager
+    def stage(self, name, reads=(), writes=()):
+        """Time the code run within the context.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+        reads : list of str
+            Paths of the files (or folders) read during the stage.
+        writes : list of str | function
+            Paths of the files (or folders) written during the stage.
+            If this is a function it is called after the stage is completed
+            to get the list of paths.
+        """
+        record = {'job': self.job,
+                  'stage': name,
+                  'time': 0,
+                  'bytes_read': path_size(reads),
+                  'bytes_written': 0}
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            record['time'] = perf_counter() - start
+            if callable(writes):
+                writes = writes()
+            record['bytes_written'] = path_size(writes)
+            self.records.append(record)
+
+
+def format_records(records):
+    """Return a summary of the total time and data for each stage.
+
+    If any of the stages copied files the number of files copied with each
+    method is also given.
+    """
+    totals = dict()
+    methods = dict()
+    for record in records:
+        total = totals.setdefault(record['stage'], [0, 0, 0])
+        total[0] += record['time']
+        total[1] += record['bytes_read']
+        total[2] += record['bytes_written']
+        if 'method' in record:
+            methods[record['method']] = methods.get(record['method'], 0) + 1
+    lines = []
+    for stage, (time, read, written) in totals.items():
+        lines.append('{0}: {1:.2f}s (read {2}, wrote {3})'.format(
+            stage, time, get_fsize(read), get_fsize(written)))
+    if methods:
+        lines.append('files copied: ' + ', '.join(
+            '{0} ({1})'.format(method, count) for method, count in
+            sorted(methods.items())))
+    return '\n'.join(lines)
+
+
+def path_size(paths):
+    """Return the total size of the files (and folders) provided."""
+    size = 0
+    for path in paths:
+        if op.isdir(path):
+            for root, _, files in os.walk(path):
+                for fname in files:
+                    size += op.getsize(op.join(root, fname))
+        elif op.isfile(path):
+            size += op.getsize(path)
+    return size
+
+
+def write_log(records, log_name=LOG_NAME, **info):
+    """Append the stage records to the conversion log (or the log file in
+    the user folder named `log_name`).
+
+    Each record is written as one line of JSON along with the time and any
+    extra information provided (eg. the container path).
+    """
+    if not op.exists(OSCONST.USRDIR):
+        os.makedirs(OSCONST.USRDIR)
+    timestamp = datetime.now().isoformat()
+    with open(op.join(OSCONST.USRDIR, log_name), 'a') as log:
+        for record in records:
+            line = {'timestamp': timestamp}
+            line.update(info)
+            line.update(record)
+            log.write(json.dumps(line) + '\n')
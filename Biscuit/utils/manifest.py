@@ -0,0 +1,167 @@
+"""
+A manifest of the checksums of all the files transferred into a BIDS folder
+so that the integrity of the archived data can be checked without the
+source data.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from datetime import datetime, timezone
+import os
+import os.path as op
+from threading import Lock
+
+from Biscuit.utils.hashing import hash_file
+
+# Name of the manifest file in the root of the BIDS folder.
+MANIFEST_NAME = 'checksums.tsv'
+FIELDS = ['path', 'size', 'digest', 'algorithm', 'timestamp']
+
+
+class ChecksumManifest():
+    """The checksums of the files in a BIDS folder.
+
+    The manifest is stored as a tsv file in the root of the BIDS folder with
+    a row for each file containing its path (relative to the root), size,
+    digest, the algorithm used to produce the digest and the time it was
+    recorded.
+
+    Parameters
+    ----------
+    root : str
+        Path to the root of the BIDS folder.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.fname = op.join(root, MANIFEST_NAME)
+        self.entries = dict()
+        self._lock = Lock()
+        if op.exists(self.fname):
+            with open(self.fname, 'r', newline='') as f:
+                for row in csv.DictReader(f, delimiter='\t'):
+                    row['size'] = int(row['size'])
+                    self.entries[row['path']] = row
+
+#region public methods
+
+    def add(self, fpath, digest, algorithm, size=None):
+        """Record the digest of a file.
+
+        Parameters
+        ----------
+        fpath : str
+            Path to the file (which is within the BIDS folder).
+        digest : str
+            Hex digest of the contents of the file.
+        algorithm : str
+            The algorithm used to produce the digest.
+        size : int
+            Size of the file. If not provided the size of the file on disk is
+            used.
+        """
+        if size is None:
+            size = os.stat(fpath).st_size
+        path = self._relpath(fpath)
+        timestamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with self._lock:
+            self.entries[path] = {'path': path,
+                                  'size': size,
+                                  'digest': digest,
+                                  'algorithm': algorithm,
+                                  'timestamp': timestamp}
+
+    def get_digest(self, fpath, algorithm):
+        """Return the recorded digest of a file, or None if there isn't one
+        produced by the specified algorithm."""
+        with self._lock:
+            entry = self.entries.get(self._relpath(fpath), None)
+        if entry is None or entry['algorithm'] != algorithm:
+            return None
+        return entry['digest']
+
+    def save(self):
+        """Write the manifest to disk."""
+        with self._lock:
+            rows = [self.entries[path] for path in sorted(self.entries)]
+        temp_fname = self.fname + '_temp'
+        with open(temp_fname, 'w', newline='') as f:
+            writer = csv.DictWriter(f, FIELDS, delimiter='\t')
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(temp_fname, self.fname)
+        self._add_bidsignore()
+
+    def verify(self, workers=4, file_name_tracker=None,
+               file_num_tracker=None):
+        """Re-hash the files in the manifest and compare them to the
+        recorded digests.
+
+        Parameters
+        ----------
+        workers : int
+            Number of files to hash at the same time.
+        file_name_tracker : Instance of StringVar
+            Set to the name of each file as it is checked.
+        file_num_tracker : Instance of IntVar
+            Incremented after each file has been checked.
+
+        Returns
+        -------
+        results : dict
+            'ok' is the number of files which match the manifest, 'missing'
+            is a list of the files which no longer exist and 'changed' is a
+            list of the files whose size or digest don't match.
+        """
+        with self._lock:
+            entries = list(self.entries.values())
+        results = {'ok': 0, 'missing': [], 'changed': []}
+        count_lock = Lock()
+
+        def _check(entry):
+            fpath = op.join(self.root, *entry['path'].split('/'))
+            if file_name_tracker is not None:
+                file_name_tracker.set(entry['path'])
+            if not op.isfile(fpath):
+                result = 'missing'
+            elif (os.stat(fpath).st_size != entry['size'] or
+                    hash_file(fpath, entry['algorithm']).hexdigest() !=
+                    entry['digest']):
+                result = 'changed'
+            else:
+                result = 'ok'
+            with count_lock:
+                if result == 'ok':
+                    results['ok'] += 1
+                else:
+                    results[result].append(entry['path'])
+                if file_num_tracker is not None:
+                    file_num_tracker.set(file_num_tracker.get() + 1)
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for future in [executor.submit(_check, entry) for entry in
+                           entries]:
+                future.result()
+        results['missing'].sort()
+        results['changed'].sort()
+        return results
+
+#region private methods
+
+    def _add_bidsignore(self):
+        """Make sure the BIDS validator ignores the manifest."""
+        fname = op.join(self.root, '.bidsignore')
+        text = ''
+        if op.exists(fname):
+            with open(fname, 'r') as f:
+                text = f.read()
+        if MANIFEST_NAME not in text.splitlines():
+            with open(fname, 'a') as f:
+                if text and not text.endswith('\n'):
+                    f.write('\n')
+                f.write(MANIFEST_NAME + '\n')
+
+    def _relpath(self, fpath):
+        """Return the path relative to the root using '/' as the separator
+        so the manifest is the same on every platform."""
+        fpath = op.relpath(op.abspath(fpath), op.abspath(self.root))
+        return fpath.replace(os.sep, '/')
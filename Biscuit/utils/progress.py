@@ -0,0 +1,103 @@
+"""
+Reporting of progress from worker threads to the UI.
+
+Worker threads publish their progress to `ProgressValue` objects, which only
+store the latest value, and a `ProgressSampler` running on the UI thread
+copies the values to tkinter Variables at a fixed rate. This means that the
+speed of a copy doesn't depend on how quickly Tk can process the updates,
+and the tkinter Variables are only ever accessed from the UI thread.
+"""
+
+# Time (ms) between each update of the UI (20 frames per second).
+FRAME_INTERVAL = 50
+
+
+class ProgressValue():
+    """The latest value of some progress published by a worker thread.
+
+    This has the same `get` and `set` methods (and `max` attribute) as the
+    tkinter Variables used as trackers so it can be used in their place.
+    Setting the value is just an attribute assignment so is cheap and safe to
+    do from any thread.
+
+    Parameters
+    ----------
+    value : object
+        The initial value.
+    max : int
+        The initial maximum value.
+    """
+    def __init__(self, value=0, max=0):
+        self._value = value
+        self.max = max
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class ProgressSampler():
+    """Periodically copies the values of `ProgressValue`s to tkinter
+    Variables.
+
+    Parameters
+    ----------
+    widget : instance of tkinter.Widget
+        The widget whose `after` method is used to schedule the updates.
+    interval : int
+        Time (ms) between each update.
+    """
+    def __init__(self, widget, interval=FRAME_INTERVAL):
+        self.widget = widget
+        self.interval = interval
+        # list of [value, variable, max_callback, last value, last max]
+        self._bindings = []
+        self._after_id = None
+
+#region public methods
+
+    def bind(self, value, variable, max_callback=None):
+        """Update `variable` with the value of `value`.
+
+        Parameters
+        ----------
+        value : instance of ProgressValue
+            The value published by the worker threads.
+        variable : instance of tkinter.Variable
+            The Variable shown in the UI.
+        max_callback : callable
+            Called with the new maximum when the maximum of `value` changes.
+        """
+        self._bindings.append([value, variable, max_callback, None, None])
+
+    def sample(self):
+        """Update the variables whose values have changed."""
+        for binding in self._bindings:
+            value, variable, max_callback, last_value, last_max = binding
+            curr_value = value.get()
+            if curr_value != last_value:
+                variable.set(curr_value)
+                binding[3] = curr_value
+            if max_callback is not None and value.max != last_max:
+                max_callback(value.max)
+                binding[4] = value.max
+
+    def start(self):
+        """Start sampling the values."""
+        if self._after_id is None:
+            self._run()
+
+    def stop(self):
+        """Stop sampling the values, updating the variables one last time."""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self.sample()
+
+#region private methods
+
+    def _run(self):
+        self.sample()
+        self._after_id = self.widget.after(self.interval, self._run)
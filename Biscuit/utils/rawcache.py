@@ -0,0 +1,111 @@
+"""
+A cache of the mne Raw objects created from the KIT data so that preparing
+the same data for conversion more than once doesn't require the files to be
+read and parsed again.
+"""
+
+from collections import OrderedDict
+import os
+import os.path as op
+from threading import Lock
+
+# Default maximum estimated memory used by the cached Raw objects.
+DEFAULT_MAX_MEMORY = 512 * 1024 ** 2
+# Rough estimates of the memory used by the measurement info for each
+# channel and each digitisation point.
+CHANNEL_SIZE = 2048
+DIG_SIZE = 256
+
+
+class RawCache():
+    """A least-recently-used cache of Raw objects.
+
+    The least recently used entries are evicted once the estimated memory
+    used by all the cached Raw objects exceeds `max_memory`.
+
+    Parameters
+    ----------
+    max_memory : int
+        Maximum estimated memory in bytes used by the cached objects.
+    """
+    def __init__(self, max_memory=DEFAULT_MAX_MEMORY):
+        self.max_memory = max_memory
+        self.memory = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all the cached objects."""
+        with self._lock:
+            self._entries.clear()
+            self.memory = 0
+
+    def get(self, key):
+        """Return a copy of the Raw with the specified key.
+
+        A copy is returned so that any changes made to it (eg. setting the
+        bad channels or subject info) don't affect the cached object.
+        If there is no Raw with the key None is returned.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return entry[0].copy()
+
+    def put(self, key, raw):
+        """Add a Raw to the cache.
+
+        A copy of the Raw is stored so that any later changes made to `raw`
+        are not cached.
+        """
+        size = estimate_raw_size(raw)
+        if size > self.max_memory:
+            return
+        raw = raw.copy()
+        with self._lock:
+            if key in self._entries:
+                self.memory -= self._entries.pop(key)[1]
+            self._entries[key] = (raw, size)
+            self.memory += size
+            while self.memory > self.max_memory:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.memory -= old_size
+
+
+def estimate_raw_size(raw):
+    """Return the estimated memory used by a Raw object in bytes."""
+    size = 0
+    if getattr(raw, 'preload', False):
+        size += raw._data.nbytes
+    size += len(raw.info['chs']) * CHANNEL_SIZE
+    size += len(raw.info['dig'] or []) * DIG_SIZE
+    return size
+
+
+def kit_key(con, mrk, elp, hsp, stim, stim_code, slope):
+    """Return the cache key of the Raw created from some KIT data.
+
+    The key includes the modification time and size of each file so that a
+    file being changed means the Raw is created again.
+    """
+    files = []
+    for fname in [con, mrk, elp, hsp]:
+        if fname is None:
+            files.append(None)
+            continue
+        stat = os.stat(fname)
+        files.append((op.normpath(fname), stat.st_mtime_ns, stat.st_size))
+    if isinstance(stim, list):
+        stim = tuple(stim)
+    return tuple(files) + (stim, stim_code, slope)
+
+
+raw_cache = RawCache()
@@ -0,0 +1,177 @@
+"""
+A journal of the progress of file transfers so that an interrupted transfer
+can be resumed without copying everything again.
+"""
+
+import json
+import os
+import os.path as op
+from threading import Lock
+from time import monotonic
+
+# The journal is written to disk at most this often (seconds) unless it is
+# explicitly saved.
+SAVE_INTERVAL = 1
+
+
+class TransferJournal():
+    """A record of the files which have been copied and the byte ranges of
+    any partially copied files.
+
+    Each entry is keyed by the destination path and records the source file
+    (and its size and modification time, so that a changed source isn't
+    resumed), the end offset and digest of each range of data which has been
+    written, and once the copy is complete, the digest of the whole file.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file the journal is stored in.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self.entries = dict()
+        self._lock = Lock()
+        self._last_save = 0
+        if op.exists(fname):
+            try:
+                with open(fname, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                # A corrupt journal just means the files are copied again.
+                self.entries = dict()
+
+#region public methods
+
+    def checkpoint(self, dst, end, digest):
+        """Record that the data up to `end` has been written to the
+        temporary file.
+
+        Parameters
+        ----------
+        dst : str
+            Destination path of the file.
+        end : int
+            Offset of the end of the range of data written.
+        digest : str
+            Hex digest of the data in the range (from the end of the previous
+            checkpoint to `end`).
+        """
+        with self._lock:
+            self.entries[dst]['checkpoints'].append([end, digest])
+            self._maybe_save()
+
+    def clear(self, folder=None):
+        """Remove all the entries (or those whose destination is within
+        `folder`) from the journal."""
+        with self._lock:
+            if folder is None:
+                self.entries = dict()
+            else:
+                folder = op.join(op.normpath(folder), '')
+                self.entries = {dst: entry for dst, entry in
+                                self.entries.items() if
+                                not dst.startswith(folder)}
+            self._save()
+
+    def complete(self, dst, digest=None):
+        """Mark the file as completely copied."""
+        with self._lock:
+            entry = self.entries[dst]
+            entry['checkpoints'] = []
+            entry['done'] = True
+            entry['digest'] = digest
+            self._maybe_save()
+
+    def discard(self, dst):
+        """Remove the entry for a file so that it is copied from scratch."""
+        with self._lock:
+            self.entries.pop(dst, None)
+            self._maybe_save()
+
+    def get_checkpoints(self, src, dst, algorithm):
+        """Return the checkpoints of a partially copied file.
+
+        An empty list is returned if there is nothing to resume from (or if
+        the source has changed since the copy was started, or the digests
+        were produced with a different algorithm).
+        """
+        with self._lock:
+            entry = self.entries.get(dst, None)
+            if (entry is None or entry['done'] or
+                    entry['algorithm'] != algorithm or
+                    not self._matches(entry, src)):
+                return []
+            return [tuple(checkpoint) for checkpoint in entry['checkpoints']]
+
+    def get_digest(self, dst, algorithm):
+        """Return the digest of a completely copied file.
+
+        None is returned if the file hasn't been copied, wasn't verified when
+        it was copied, or was verified using a different algorithm.
+        """
+        with self._lock:
+            entry = self.entries.get(dst, None)
+            if (entry is None or not entry['done'] or
+                    entry['algorithm'] != algorithm):
+                return None
+            return entry['digest']
+
+    def is_complete(self, src, dst):
+        """Whether the file has already been completely copied from the
+        (unchanged) source."""
+        with self._lock:
+            entry = self.entries.get(dst, None)
+            if entry is None or not entry['done']:
+                return False
+            if not self._matches(entry, src):
+                return False
+        return op.isfile(dst) and op.getsize(dst) == entry['size']
+
+    def save(self):
+        """Write the journal to disk."""
+        with self._lock:
+            self._save()
+
+    def start(self, src, dst, algorithm):
+        """Start a new entry for a file being copied from the beginning."""
+        stat = os.stat(src)
+        with self._lock:
+            self.entries[dst] = {'src': src,
+                                 'size': stat.st_size,
+                                 'mtime_ns': stat.st_mtime_ns,
+                                 'algorithm': algorithm,
+                                 'checkpoints': [],
+                                 'done': False,
+                                 'digest': None}
+            self._maybe_save()
+
+    def truncate(self, dst, num):
+        """Only keep the first `num` checkpoints of a file."""
+        with self._lock:
+            del self.entries[dst]['checkpoints'][num:]
+
+#region private methods
+
+    def _matches(self, entry, src):
+        try:
+            stat = os.stat(src)
+        except OSError:
+            return False
+        return (entry['src'] == src and entry['size'] == stat.st_size and
+                entry['mtime_ns'] == stat.st_mtime_ns)
+
+    def _maybe_save(self):
+        # Saving after every change would be slow when copying many small
+        # files.
+        if monotonic() - self._last_save > SAVE_INTERVAL:
+            self._save()
+
+    def _save(self):
+        if not op.exists(op.dirname(self.fname)):
+            os.makedirs(op.dirname(self.fname))
+        temp_fname = self.fname + '_temp'
+        with open(temp_fname, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_fname, self.fname)
+        self._last_save = monotonic()
@@ -235,6 +235,8 @@ def get_fsize(size):
                 3: 'Gb',
                 4: 'Tb',
                 5: 'Yb'}    # shouldn't need more...
+    if size == 0:
+        return '0b'
     power = int(log(size, 1024))
     return '{0:.3f}{1}'.format(size / (1024 ** power), SUFFIXES[power])
 
@@ -244,10 +246,10 @@ def get_mrk_meas_date(mrk):
 
     Parameters
     ----------
-    mrk : instance of mrk_file
-        Marker file to find date of.
+    mrk : str
+        Path to the marker file to find date of.
     """
-    info = get_kit_info(mrk.file, False)[0]
+    info = get_kit_info(mrk, False)[0]
     meas_date = info.get('meas_date', None)
     if isinstance(meas_date, (tuple, list, np.ndarray)):
         meas_date = meas_date[0]
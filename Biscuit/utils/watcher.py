@@ -0,0 +1,215 @@
+"""
+Watching folders for added and removed files.
+
+A watcher is told which folders to watch and reports which of them have had
+files or folders added to or removed from them since it was last asked. Only
+these folders then need to be listed again to update a view of the folders,
+rather than walking the whole folder tree.
+
+On Linux inotify is used so the kernel reports the changes as they happen.
+inotify only sees the changes made by this machine, so for network shares
+(and other platforms) the modification time of each folder, which changes
+whenever an entry is added to or removed from it, is checked instead.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import os.path as op
+from platform import system as os_name
+import struct
+from time import time_ns
+
+# inotify constants from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_ONLYDIR)
+# struct inotify_event {int wd; uint32_t mask, cookie, len; char name[];}
+EVENT = struct.Struct('iIII')
+
+# File systems on which changes made by other machines aren't reported by
+# inotify.
+REMOTE_FS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p',
+             'ceph', 'glusterfs', 'gpfs', 'lustre', 'fuse.sshfs',
+             'fuse.rclone')
+
+# Folders modified within this many seconds of when their modification time
+# was read are checked again, as some file systems only store the time to the
+# nearest second (or two) so later changes may not change it.
+RACY_INTERVAL = 2
+
+
+class InotifyWatcher():
+    """Watch folders using the Linux inotify API."""
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                 use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # watch descriptor of each folder and the reverse
+        self._wds = dict()
+        self._folders = dict()
+
+#region public methods
+
+    def add(self, folder):
+        """Start watching a folder.
+
+        An OSError is raised if the folder can't be watched, for example if
+        the limit on the number of watches has been reached.
+        """
+        if folder in self._wds:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder),
+                                          WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), folder)
+        self._wds[folder] = wd
+        self._folders[wd] = folder
+
+    def changes(self):
+        """Return the set of watched folders whose contents have changed.
+
+        None is returned if some changes were lost, in which case all the
+        folders should be checked.
+        """
+        changed = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                folder = self._folders.get(wd)
+                if folder is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # the folder has been deleted and is no longer watched
+                    del self._folders[wd]
+                    del self._wds[folder]
+                changed.add(folder)
+        if overflow:
+            return None
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def remove(self, folder):
+        """Stop watching a folder."""
+        wd = self._wds.pop(folder, None)
+        if wd is not None:
+            del self._folders[wd]
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+
+class PollingWatcher():
+    """Watch folders by checking whether their modification time has
+    changed."""
+    def __init__(self):
+        # modification time of each folder and when it was read
+        self._mtimes = dict()
+
+#region public methods
+
+    def add(self, folder):
+        """Start watching a folder."""
+        self._mtimes[folder] = self._get_mtime(folder)
+
+    def changes(self):
+        """Return the set of watched folders whose contents have changed."""
+        changed = set()
+        for folder, (mtime, read_at) in list(self._mtimes.items()):
+            curr_mtime, curr_read_at = self._get_mtime(folder)
+            if curr_mtime is None:
+                # the folder has been deleted
+                del self._mtimes[folder]
+                changed.add(folder)
+            elif (curr_mtime != mtime or
+                    read_at - mtime < RACY_INTERVAL * 1e9):
+                self._mtimes[folder] = (curr_mtime, curr_read_at)
+                changed.add(folder)
+        return changed
+
+    def close(self):
+        self._mtimes.clear()
+
+    def remove(self, folder):
+        """Stop watching a folder."""
+        self._mtimes.pop(folder, None)
+
+#region private methods
+
+    @staticmethod
+    def _get_mtime(folder):
+        read_at = time_ns()
+        try:
+            return os.stat(folder).st_mtime_ns, read_at
+        except OSError:
+            return None, read_at
+
+
+def get_watcher(folder):
+    """Return the best watcher for the folders within `folder`.
+
+    Parameters
+    ----------
+    folder : str
+        The root folder of the folders which will be watched.
+    """
+    if os_name() == 'Linux' and not is_remote(folder):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError, TypeError):
+            # inotify isn't available
+            pass
+    return PollingWatcher()
+
+
+def is_remote(folder):
+    """Whether a folder is on a network file system.
+
+    This is found from the type of the file system mounted on the closest
+    parent of the folder in /proc/mounts so is only possible on Linux. False
+    is returned if it can't be found.
+    """
+    folder = op.realpath(folder)
+    fs_type = None
+    mount_len = -1
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # spaces in mount points are escaped as \040
+                mount_point = fields[1].replace('\\040', ' ')
+                if (op.join(folder, '').startswith(op.join(mount_point, ''))
+                        and len(mount_point) > mount_len):
+                    fs_type = fields[2]
+                    mount_len = len(mount_point)
+    except OSError:
+        return False
+    return fs_type in REMOTE_FS
@@ -0,0 +1,94 @@
+"""
+Compare the speed of each of the methods copyutils can use to copy a file.
+
+A file of the given size is created in the source folder and copied into the
+destination folder with each method. To measure copying to another drive or
+a network share set `--dst` to a folder on it.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_copy --size 4096 --dst /mnt/archive/tmp
+"""
+
+import argparse
+import os
+import os.path as op
+import shutil
+import tempfile
+from time import perf_counter, process_time
+
+from Biscuit.utils.copyutils import copyfile, STRATEGIES
+
+# Size (MB) of a .fif file at the default 2GB split size.
+DEFAULT_SIZE = 2048
+
+
+class ChunkCounter():
+    """Stand-in for the RangeVar tracker counting the progress updates."""
+    def __init__(self):
+        self.max = 0
+        self.updates = 0
+
+    def set(self, value):
+        self.updates += 1
+
+
+def make_file(fname, size):
+    """Create a file of `size` MB of random data."""
+    chunk = os.urandom(1024 * 1024)
+    with open(fname, 'wb') as f:
+        for _ in range(size):
+            f.write(chunk)
+
+
+def bench_strategy(src, dst, strategy, verify=False):
+    """Copy the file and return the time, CPU time, method used and number
+    of progress updates."""
+    methods = []
+    tracker = ChunkCounter()
+    start, cpu_start = perf_counter(), process_time()
+    copyfile(src, dst, tracker=tracker, verify=verify, strategy=strategy,
+             report=lambda s, d, method: methods.append(method))
+    duration = perf_counter() - start
+    cpu = process_time() - cpu_start
+    os.remove(dst)
+    return duration, cpu, methods[0], tracker.updates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help='Size of the file to copy in MB.')
+    parser.add_argument('--src', default=None,
+                        help='Folder to create the file in. Defaults to a '
+                             'temporary folder.')
+    parser.add_argument('--dst', default=None,
+                        help='Folder to copy the file to. Defaults to the '
+                             'source folder.')
+    parser.add_argument('--verify', action='store_true',
+                        help='Also hash the data while copying.')
+    args = parser.parse_args(argv)
+
+    src_dir = tempfile.mkdtemp(dir=args.src)
+    dst_dir = tempfile.mkdtemp(dir=args.dst or src_dir)
+    src = op.join(src_dir, 'bench_raw.fif')
+    try:
+        make_file(src, args.size)
+        print('Copying {0}MB from {1} to {2}'.format(args.size, src_dir,
+                                                     dst_dir))
+        print('{0:>16}{1:>18}{2:>10}{3:>10}{4:>10}{5:>10}'.format(
+            'strategy', 'method used', 'time (s)', 'MB/s', 'CPU (s)',
+            'updates'))
+        for strategy in STRATEGIES:
+            duration, cpu, method, updates = bench_strategy(
+                src, op.join(dst_dir, 'copy.fif'), strategy, args.verify)
+            print('{0:>16}{1:>18}{2:>10.2f}{3:>10.1f}{4:>10.2f}{5:>10}'.format(
+                strategy, method, duration, args.size / duration, cpu,
+                updates))
+    finally:
+        shutil.rmtree(dst_dir, ignore_errors=True)
+        shutil.rmtree(src_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
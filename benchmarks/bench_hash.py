@@ -0,0 +1,62 @@
+"""
+Measure the throughput of each of the hash algorithms available to verify
+transferred data.
+
+The data is hashed in 1MB chunks (the same way it is when being copied) for
+a number of file sizes representative of .con and .fif files.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_hash --sizes 50 500 2000
+"""
+
+import argparse
+import os
+from time import perf_counter
+
+from Biscuit.utils.hashing import ALGORITHMS, BUFFER_SIZE, new_hash
+
+# Typical sizes (MB) of a short .con file, a long .con/.fif file and a .fif
+# file at the 2GB split size.
+DEFAULT_SIZES = [50, 500, 2000]
+
+
+def bench_algorithm(algorithm, size, repeats=3):
+    """Return the best throughput (MB/s) of hashing `size` MB of data."""
+    # Use a few different chunks so the data isn't identical every time.
+    chunks = [os.urandom(BUFFER_SIZE) for _ in range(4)]
+    best = None
+    for _ in range(repeats):
+        contents_hash = new_hash(algorithm)
+        start = perf_counter()
+        for i in range(size):
+            contents_hash.update(chunks[i % len(chunks)])
+        contents_hash.hexdigest()
+        duration = perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return size / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Sizes of the data to hash in MB.')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Number of times to repeat each measurement.')
+    args = parser.parse_args(argv)
+
+    header = '{0:>10}'.format('size') + ''.join(
+        '{0:>12}'.format(algorithm) for algorithm in ALGORITHMS)
+    print('Throughput (MB/s)')
+    print(header)
+    for size in args.sizes:
+        line = '{0:>8}MB'.format(size)
+        for algorithm in ALGORITHMS:
+            line += '{0:>12.1f}'.format(
+                bench_algorithm(algorithm, size, args.repeats))
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Measure the throughput of the transfer stack on a synthetic BIDS dataset.
+
+A BIDS dataset with many small sidecar files and a few large raw files is
+created, then copied with each copy strategy, a range of buffered chunk
+sizes, and `BIDSCopy` with and without verification. Each copy is made to a
+local folder and to a deliberately slowed stand-in for a network share.
+
+The stand-in adds a delay to every file opened on it, limits the bandwidth
+of the data written to or read from it, and (like most network shares)
+doesn't support the kernel copy methods, so copies to it fall back to a
+buffered copy.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench_transfer --raw-size 512 --bandwidth 100
+"""
+
+import argparse
+import builtins
+import errno
+import json
+import os
+import os.path as op
+import shutil
+import sys
+import tempfile
+from threading import Lock
+from time import perf_counter, process_time, sleep
+from unittest import mock
+
+from Biscuit.utils import copyutils, hashing
+from Biscuit.utils.BIDSCopy import BIDSCopy
+from Biscuit.utils.copyutils import copy, copyfileobj, STRATEGIES
+
+# Size (MB) of a .fif file at the default 2GB split size.
+DEFAULT_RAW_SIZE = 2048
+DEFAULT_CHUNK_SIZES = [64, 256, 1024, 4096, 16384]
+
+
+class SlowFS():
+    """Slow down access to the files within a folder.
+
+    While active, files within `root` opened by copyutils, hashing and this
+    module take `latency` seconds to open, share `bandwidth` bytes per second
+    between them and can't be used by the kernel copy methods.
+    """
+    def __init__(self, root, latency, bandwidth):
+        self.root = op.join(op.abspath(root), '')
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._lock = Lock()
+        self._free_at = 0
+        self._patches = [mock.patch.object(module, 'open', self._open,
+                                           create=True)
+                         for module in (copyutils, hashing,
+                                        sys.modules[__name__])]
+
+    def __enter__(self):
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *args):
+        for patch in self._patches:
+            patch.stop()
+
+    def throttle(self, num_bytes):
+        """Wait until `num_bytes` can be transferred."""
+        with self._lock:
+            now = perf_counter()
+            self._free_at = (max(now, self._free_at) +
+                             num_bytes / self.bandwidth)
+            delay = self._free_at - now
+        sleep(delay)
+
+    def _open(self, fname, *args, **kwargs):
+        f = builtins.open(fname, *args, **kwargs)
+        if not op.abspath(fname).startswith(self.root):
+            return f
+        sleep(self.latency)
+        return SlowFile(f, self)
+
+
+class SlowFile():
+    """A file on a SlowFS."""
+    def __init__(self, f, fs):
+        self._f = f
+        self._fs = fs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._f.close()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def fileno(self):
+        raise OSError(errno.EXDEV, 'kernel copies are not supported')
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        self._fs.throttle(len(data))
+        return data
+
+    def write(self, data):
+        self._fs.throttle(len(data))
+        return self._f.write(data)
+
+
+def make_dataset(root, subjects, sessions, sidecars, raw_files, raw_size):
+    """Create a synthetic BIDS dataset.
+
+    Each session of each subject has `sidecars` small json/tsv files and
+    `raw_files` files of `raw_size` MB are spread over the first sessions.
+
+    Returns
+    -------
+    fnames : list of str
+        Paths of all the files relative to `root`.
+    """
+    fnames = []
+
+    def _write(fname, data):
+        fpath = op.join(root, fname)
+        os.makedirs(op.dirname(fpath), exist_ok=True)
+        with open(fpath, 'wb') as f:
+            f.write(data)
+        fnames.append(fname)
+
+    _write('dataset_description.json',
+           json.dumps({'Name': 'benchmark', 'BIDSVersion': '1.4.0'}).encode())
+    _write('participants.tsv', '\n'.join(
+        ['participant_id\tage'] +
+        ['sub-{0:03}\tn/a'.format(i) for i in range(subjects)]).encode())
+    folders = []
+    for sub in range(subjects):
+        for ses in range(sessions):
+            folder = op.join('sub-{0:03}'.format(sub), 'ses-{0}'.format(ses),
+                             'meg')
+            folders.append(folder)
+            for i in range(sidecars):
+                ext = 'json' if i % 2 == 0 else 'tsv'
+                _write(op.join(folder, 'sidecar{0}.{1}'.format(i, ext)),
+                       os.urandom(1024 + 512 * (i % 6)))
+    chunk = os.urandom(1024 * 1024)
+    for i in range(raw_files):
+        fpath = op.join(root, folders[i % len(folders)],
+                        'run-{0}_meg.fif'.format(i))
+        with open(fpath, 'wb') as f:
+            for _ in range(raw_size):
+                f.write(chunk)
+        fnames.append(op.relpath(fpath, root))
+    return fnames
+
+
+def copy_strategy(srcs, dsts, strategy):
+    for src, dst in zip(srcs, dsts):
+        os.makedirs(op.dirname(dst), exist_ok=True)
+        copy(src, dst, strategy=strategy)
+
+
+def copy_chunks(srcs, dsts, length, verify):
+    for src, dst in zip(srcs, dsts):
+        os.makedirs(op.dirname(dst), exist_ok=True)
+        with open(src, 'rb') as fsrc:
+            with open(dst, 'wb') as fdst:
+                copyfileobj(fsrc, fdst, length=length, verify=verify)
+
+
+def copy_bidscopy(srcs, dsts, **kwargs):
+    BIDSCopy(overwrite=True, **kwargs).copy_files(srcs, dsts)
+
+
+def get_scenarios(chunk_sizes, algorithm):
+    """Return the name and function of each way of copying the files."""
+    scenarios = []
+    for strategy in ['auto'] + STRATEGIES:
+        scenarios.append(
+            ('copy {0}'.format(strategy),
+             lambda s, d, strategy=strategy: copy_strategy(s, d, strategy)))
+    for size in chunk_sizes:
+        for verify in (False, True):
+            scenarios.append(
+                ('copyfileobj {0}KB{1}'.format(size,
+                                               ' verify' if verify else ''),
+                 lambda s, d, size=size, verify=verify: copy_chunks(
+                     s, d, size * 1024, verify)))
+    for verify, workers, window in [(False, 1, 0), (False, 4, 0),
+                                    (True, 1, 0), (True, 1, 2),
+                                    (True, 4, 2)]:
+        name = 'BIDSCopy {0}x{1}{2}'.format(
+            workers, ' verify' if verify else '',
+            ' window {0}'.format(window) if window else '')
+        scenarios.append(
+            (name, lambda s, d, verify=verify, workers=workers,
+             window=window: copy_bidscopy(s, d, verify=verify,
+                                          workers=workers,
+                                          verify_window=window,
+                                          algorithm=algorithm)))
+    return scenarios
+
+
+def run_scenario(func, src_root, dst_root, fnames, total_size):
+    """Copy all the files and return the MB/s, files/s, time and CPU time."""
+    shutil.rmtree(dst_root, ignore_errors=True)
+    srcs = [op.join(src_root, fname) for fname in fnames]
+    dsts = [op.join(dst_root, fname) for fname in fnames]
+    start, cpu_start = perf_counter(), process_time()
+    func(srcs, dsts)
+    duration = perf_counter() - start
+    cpu = process_time() - cpu_start
+    return (total_size / (1024 * 1024) / duration, len(fnames) / duration,
+            duration, cpu)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--subjects', type=int, default=20,
+                        help='Number of subjects in the dataset.')
+    parser.add_argument('--sessions', type=int, default=2,
+                        help='Number of sessions per subject.')
+    parser.add_argument('--sidecars', type=int, default=10,
+                        help='Number of small files per session.')
+    parser.add_argument('--raw-files', type=int, default=2,
+                        help='Number of large raw files.')
+    parser.add_argument('--raw-size', type=int, default=DEFAULT_RAW_SIZE,
+                        help='Size of each raw file in MB.')
+    parser.add_argument('--chunk-sizes', type=int, nargs='+',
+                        default=DEFAULT_CHUNK_SIZES,
+                        help='Buffered copy chunk sizes to compare in KB.')
+    parser.add_argument('--algorithm', default=hashing.DEFAULT_ALGORITHM,
+                        choices=list(hashing.ALGORITHMS),
+                        help='Hash algorithm used by BIDSCopy to verify.')
+    parser.add_argument('--latency', type=float, default=5,
+                        help='Time to open a file on the slowed folder in ms.')
+    parser.add_argument('--bandwidth', type=float, default=200,
+                        help='Bandwidth of the slowed folder in MB/s.')
+    parser.add_argument('--no-slow', action='store_true',
+                        help="Don't copy to the slowed folder.")
+    parser.add_argument('--tmp', default=None,
+                        help='Folder to create the data in. Defaults to the '
+                             'system temporary folder.')
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(dir=args.tmp)
+    src_root = op.join(tmp_dir, 'src')
+    try:
+        fnames = make_dataset(src_root, args.subjects, args.sessions,
+                              args.sidecars, args.raw_files, args.raw_size)
+        total_size = sum(os.stat(op.join(src_root, fname)).st_size for
+                         fname in fnames)
+        print('Dataset: {0} files, {1:.1f}MB'.format(
+            len(fnames), total_size / (1024 * 1024)))
+        targets = [('local', op.join(tmp_dir, 'local'), None)]
+        if not args.no_slow:
+            slow_root = op.join(tmp_dir, 'slow')
+            targets.append(
+                ('slow', slow_root,
+                 SlowFS(slow_root, args.latency / 1000,
+                        args.bandwidth * 1024 * 1024)))
+        print('{0:<32}{1:>8}{2:>10}{3:>10}{4:>10}{5:>10}'.format(
+            'scenario', 'target', 'MB/s', 'files/s', 'time (s)', 'CPU (s)'))
+        for name, func in get_scenarios(args.chunk_sizes, args.algorithm):
+            for target, dst_root, slow_fs in targets:
+                if slow_fs is not None:
+                    with slow_fs:
+                        result = run_scenario(func, src_root, dst_root,
+                                              fnames, total_size)
+                else:
+                    result = run_scenario(func, src_root, dst_root, fnames,
+                                          total_size)
+                print('{0:<32}{1:>8}{2:>10.1f}{3:>10.1f}{4:>10.2f}'
+                      '{5:>10.2f}'.format(name, target, *result))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Compare the number of stat calls and the time taken to fill the file tree
+with the previous os.listdir/op.isdir based scan and the current os.scandir
+based scan, and to refresh it with the previous linear ordered_insert and
+the current binary search.
+
+A synthetic folder of BIDS-like data is created and loaded into a
+FileTreeview with each method. The number of calls to os.stat/os.lstat
+(which op.isdir uses) and to os.listdir/os.scandir is counted. Over a
+network share each of these is a round trip to the server.
+
+Many files are then added to a single folder (as happens when a session is
+converted) and the treeview is refreshed.
+
+This needs a display as a real Treeview is used. Run from the root of the
+repository:
+
+    python -m benchmarks.bench_tree --folders 200 --files 50 --insert 2000
+"""
+
+import argparse
+import os
+import os.path as op
+import shutil
+import tempfile
+from time import perf_counter
+from tkinter import Tk
+from unittest import mock
+
+from Biscuit.CustomWidgets.FileTreeview import FileTreeview
+
+
+class CallCounter():
+    """Count the calls made to some of the functions of the os module."""
+    NAMES = ['stat', 'lstat', 'listdir', 'scandir']
+
+    def __init__(self):
+        self.counts = dict((name, 0) for name in self.NAMES)
+        self._patches = [mock.patch.object(os, name, self._wrap(name))
+                         for name in self.NAMES]
+
+    def __enter__(self):
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *args):
+        for patch in self._patches:
+            patch.stop()
+
+    def _wrap(self, name):
+        func = getattr(os, name)
+
+        def wrapper(*args, **kwargs):
+            self.counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+
+def legacy_ordered_insert(tree, parent, *args, **kwargs):
+    """The previous implementation of FileTreeview.ordered_insert."""
+    sort_text = kwargs.get('text', None).lower()
+    child_folders = [i for i in tree.get_children(parent) if
+                     op.isdir(tree.item(i)['values'][1])]
+    child_files = [i for i in tree.get_children(parent) if
+                   not op.isdir(tree.item(i)['values'][1])]
+    if op.isdir(kwargs['values'][1]):
+        if len(child_folders) != 0:
+            for i, child in enumerate(child_folders):
+                if sort_text < tree.item(child)['text'].lower():
+                    index = i
+                    break
+            else:
+                index = i + 1
+        else:
+            index = 0
+    else:
+        folder_num = len(child_folders)
+        if len(child_files) != 0:
+            for i, child in enumerate(child_files):
+                if sort_text < tree.item(child)['text'].lower():
+                    index = i + folder_num
+                    break
+            else:
+                index = i + folder_num + 1
+        else:
+            index = folder_num
+    return tree.insert(parent, index, *args, **kwargs)
+
+
+def legacy_generate(tree, parent, directory):
+    """The previous implementation of FileTreeview.generate."""
+    curr_children = tree.get_children(parent)
+    file_list = dict(
+        zip([tree.item(child)['values'][1] for child in
+             curr_children], curr_children))
+    for file in os.listdir(directory):
+        try:
+            fullpath = op.normpath(op.join(directory, file))
+            exists_id = file_list.get(fullpath, None)
+            if op.isdir(fullpath):
+                if exists_id is None:
+                    exists_id = legacy_ordered_insert(
+                        tree, parent, values=['', fullpath], text=file,
+                        open=False)
+                legacy_generate(tree, exists_id, fullpath)
+            else:
+                fname, ext = op.splitext(file)
+                if exists_id is None:
+                    tree.insert(parent, 'end', values=[ext, fullpath],
+                                text=fname, open=False, tags=(ext))
+        except PermissionError:
+            pass
+
+
+def make_tree(root, folders, files):
+    """Create `folders` session folders of `files` files each, grouped into
+    projects and subjects, along with a few folders in each session."""
+    for i in range(folders):
+        folder = op.join(root, 'project{0}'.format(i % 5),
+                         'sub-{0:04}'.format(i), 'ses-1')
+        os.makedirs(op.join(folder, 'meg'))
+        os.makedirs(op.join(folder, 'anat'))
+        for j in range(files):
+            with open(op.join(folder, 'meg',
+                              'run-{0}_meg.con'.format(j)), 'w'):
+                pass
+
+
+def bench(master, root, method):
+    """Fill a new treeview and return the time taken, the call counts and the
+    number of items in the tree."""
+    tree = FileTreeview(master, root, columns=['dtype', 'filepath'])
+    with CallCounter() as counter:
+        start = perf_counter()
+        if method == 'legacy':
+            legacy_generate(tree, '', root)
+        else:
+            tree.generate('', root)
+        duration = perf_counter() - start
+    num_items = sum(1 for _ in tree.all_children()) - 1
+    tree.destroy()
+    return duration, counter.counts, num_items
+
+
+def bench_refresh(master, root, method, num_files):
+    """Add `num_files` files to a folder of a filled treeview and return the
+    time taken to refresh it and the call counts."""
+    tree = FileTreeview(master, root, columns=['dtype', 'filepath'])
+    tree.generate('', root)
+    tree.index()
+    if method == 'legacy':
+        tree.ordered_insert = (
+            lambda parent, *args, folder=None, **kwargs:
+                legacy_ordered_insert(tree, parent, *args, **kwargs))
+    folder = op.join(root, 'project0', 'sub-0000', 'ses-1', 'meg')
+    fnames = [op.join(folder, 'inserted{0}.json'.format(i)) for i in
+              range(num_files)]
+    for fname in fnames:
+        with open(fname, 'w'):
+            pass
+    with CallCounter() as counter:
+        start = perf_counter()
+        tree.refresh()
+        duration = perf_counter() - start
+    tree.destroy()
+    for fname in fnames:
+        os.remove(fname)
+    return duration, counter.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--folders', type=int, default=200,
+                        help='Number of session folders.')
+    parser.add_argument('--files', type=int, default=50,
+                        help='Number of files in each session folder.')
+    parser.add_argument('--insert', type=int, default=1000,
+                        help='Number of files added to a folder before the '
+                             'treeview is refreshed.')
+    parser.add_argument('--tmp', default=None,
+                        help='Folder to create the data in. Defaults to the '
+                             'system temporary folder.')
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(dir=args.tmp)
+    master = Tk()
+    master.withdraw()
+    try:
+        make_tree(root, args.folders, args.files)
+        print('{0:<10}{1:>10}{2:>10}{3:>10}{4:>10}{5:>10}{6:>10}'
+              '{7:>10}'.format('stage', 'method', 'items', 'time (s)',
+                               'stat', 'lstat', 'listdir', 'scandir'))
+        for method in ('legacy', 'scandir'):
+            duration, counts, num_items = bench(master, root, method)
+            print('{0:<10}{1:>10}{2:>10}{3:>10.2f}{4:>10}{5:>10}{6:>10}'
+                  '{7:>10}'.format('generate', method, num_items, duration,
+                                   *[counts[name] for name in
+                                     CallCounter.NAMES]))
+        for method in ('legacy', 'bisect'):
+            duration, counts = bench_refresh(master, root, method,
+                                             args.insert)
+            print('{0:<10}{1:>10}{2:>10}{3:>10.2f}{4:>10}{5:>10}{6:>10}'
+                  '{7:>10}'.format('refresh', method, args.insert,
+                                   duration, *[counts[name] for name in
+                                               CallCounter.NAMES]))
+    finally:
+        master.destroy()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()